@@ -1,38 +1,92 @@
 # -*- mode: python ; coding: utf-8 -*-
+# Startup-optimized by default: a onedir build starts straight from the install folder,
+# while a onefile EXE unpacks (and with UPX decompresses) the whole archive on every launch.
+# COFFEEJOURNAL_ONEFILE=1 pyinstaller CoffeeJournal.spec builds the single EXE instead; it
+# unpacks into a fixed runtime_tmpdir, and UPX stays off since it slows every start.
+import glob
+import os
 
+ONEFILE = os.environ.get("COFFEEJOURNAL_ONEFILE") == "1"
+ONEFILE_TMPDIR = os.environ.get("COFFEEJOURNAL_TMPDIR")  # e.g. %LOCALAPPDATA%\CoffeeJournal\runtime
+
+# nothing here imports these; PyInstaller's hooks would pull them in anyway
+EXCLUDES = [
+    # Qt modules beyond QtCore / QtGui / QtWidgets
+    "PyQt5.uic", "PyQt5.QtNetwork", "PyQt5.QtQml", "PyQt5.QtQuick", "PyQt5.QtQuickWidgets",
+    "PyQt5.QtWebEngine", "PyQt5.QtWebEngineCore", "PyQt5.QtWebEngineWidgets", "PyQt5.QtWebChannel",
+    "PyQt5.QtWebSockets", "PyQt5.QtMultimedia", "PyQt5.QtMultimediaWidgets", "PyQt5.QtSql",
+    "PyQt5.QtTest", "PyQt5.QtBluetooth", "PyQt5.QtNfc", "PyQt5.QtPositioning", "PyQt5.QtLocation",
+    "PyQt5.QtSensors", "PyQt5.QtSerialPort", "PyQt5.QtSvg", "PyQt5.QtXml", "PyQt5.QtXmlPatterns",
+    "PyQt5.QtOpenGL", "PyQt5.QtPrintSupport", "PyQt5.QtDesigner", "PyQt5.QtHelp", "PyQt5.Qt3DCore",
+    "PyQt5.QtDBus", "PyQt5.QtRemoteObjects",
+    # stdlib parts and Pillow bridges that are never used
+    "tkinter", "PIL.ImageTk", "PIL.ImageQt", "unittest", "doctest", "pydoc", "pdb", "lib2to3",
+    "xmlrpc", "ftplib", "imaplib", "smtplib", "mailbox", "test",
+]
+
+# the windows are built from ui/*_ui.py (plain modules); only an optional template DB ships as data
+DATAS = [(p, "ui") for p in glob.glob(os.path.join("ui", "*.sqlite"))]
 
 a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[('ui', 'ui'), ('images', 'images')],
+    datas=DATAS,
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=EXCLUDES,
     noarchive=False,
     optimize=0,
 )
 pyz = PYZ(a.pure)
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.datas,
-    [],
-    name='CoffeeJournal',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=False,
-    disable_windowed_traceback=False,
-    argv_emulation=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-)
+if ONEFILE:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.datas,
+        [],
+        name='CoffeeJournal',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        runtime_tmpdir=ONEFILE_TMPDIR,
+        console=False,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )
+else:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        [],
+        exclude_binaries=True,
+        name='CoffeeJournal',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=False,
+        console=False,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.datas,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        name='CoffeeJournal',
+    )
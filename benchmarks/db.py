@@ -0,0 +1,150 @@
+# benchmarks/db.py
+"""Time and memory of the data layer and the table models at several journal sizes.
+
+Each scale gets a generated journal (benchmarks/generate.py, cached between runs in
+--data-dir) and every case is run --repeat times for the timings plus once more under
+tracemalloc for the peak of Python allocations.
+
+    python benchmarks/db.py                                  # scales 1k and 100k
+    python benchmarks/db.py --scales 1k 100k 1m --json db.json
+    python benchmarks/db.py --json new.json --compare old.json
+    python benchmarks/db.py --cases 'search.*' 'stats.*'
+
+The model cases need PyQt5 (no display: the models are used without views) and are skipped
+without it.
+"""
+import argparse
+import fnmatch
+import os
+import shutil
+import sys
+import tempfile
+
+import harness
+from generate import SCALES, DATA_DIR, cached_journal
+
+from coffeejournal import DatabaseManager, exchange
+
+SEARCH_TERMS = ("эфиоп", "черника", "мытая")  # a prefix, a note word, a process
+PAGE_SIZE = 200
+MODEL_CASES = ("model.beans.update_data", "model.sessions.update_data")
+
+
+def db_cases(db, work):
+    """name -> (fn(arg), setup or None)"""
+    beans_file = os.path.join(work, "beans.jsonl")
+    sessions_file = os.path.join(work, "sessions.jsonl")
+    exchange.export_rows(db, "beans", beans_file)
+    exchange.export_rows(db, "sessions", sessions_file)
+
+    def fresh(with_beans):
+        # an empty journal (plus the beans, for a sessions import) per run
+        def setup():
+            path = os.path.join(work, "import.db")
+            for p in (path, path + "-wal", path + "-shm"):
+                if os.path.exists(p):
+                    os.remove(p)
+            target = DatabaseManager(path)
+            if with_beans:
+                exchange.import_rows(target, "beans", beans_file)
+            return target
+        return setup
+
+    def imported(table):
+        def run(target):
+            try:
+                res = exchange.import_rows(target, table, beans_file if table == "beans" else sessions_file)
+                return res.inserted
+            finally:
+                target.close()
+        return run
+
+    cases = {
+        "beans.all": (lambda _: db.get_all_coffee_beans(), None),
+        "sessions.all": (lambda _: db.get_all_brewing_sessions(), None),
+        "beans.page": (lambda _: db.get_coffee_beans_page(limit=PAGE_SIZE)[0], None),
+        "sessions.page": (lambda _: db.get_brewing_sessions_page(limit=PAGE_SIZE)[0], None),
+        "stats.recompute": (lambda _: db.recompute_stats(), None),
+        "stats.snapshot": (lambda _: db.stats.snapshot(), None),
+        "export.beans": (lambda _: exchange.export_rows(db, "beans", os.path.join(work, "out.jsonl")), None),
+        "export.sessions": (lambda _: exchange.export_rows(db, "sessions", os.path.join(work, "out.jsonl")), None),
+        "import.beans": (imported("beans"), fresh(False)),
+        "import.sessions": (imported("sessions"), fresh(True)),
+    }
+    for term in SEARCH_TERMS:
+        cases[f"search.beans.{term}"] = (lambda _, t=term: db.search_coffee_beans(t), None)
+        cases[f"search.sessions.{term}"] = (lambda _, t=term: db.search_brewing_sessions(t), None)
+    return cases
+
+
+def model_cases(db):
+    try:
+        from models import CoffeeBeansTableModel, BrewingSessionsTableModel
+    except ImportError as e:
+        print(f"model cases skipped: {e}")
+        return {}
+    beans = db.get_all_coffee_beans()
+    sessions = db.get_all_brewing_sessions()
+    beans_model = CoffeeBeansTableModel()
+    sessions_model = BrewingSessionsTableModel()
+
+    def load(model, rows):
+        model.update_data(rows)
+        return model.rowCount()
+    return dict(zip(MODEL_CASES, ((lambda _: load(beans_model, beans), None),
+                                  (lambda _: load(sessions_model, sessions), None))))
+
+
+def run_scale(path, repeat, patterns):
+    work = tempfile.mkdtemp(prefix="coffeejournal-bench-")
+    db = DatabaseManager(path)
+    try:
+        cases = db_cases(db, work)
+        if any(fnmatch.filter(MODEL_CASES, p) for p in patterns):  # loading every row only when asked
+            cases.update(model_cases(db))
+        results = {}
+        for name, (fn, setup) in cases.items():
+            if not any(fnmatch.fnmatch(name, p) for p in patterns):
+                continue
+            r = results[name] = harness.measure(fn, repeat, setup)
+            print(f"  {name:28} median {r['median_ms']:10.2f} ms  min {r['min_ms']:10.2f} ms  "
+                  f"peak {r['peak_kib']:10.0f} KiB  rows {r.get('rows', '-')}", flush=True)
+        return results
+    finally:
+        db.close()
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--scales", nargs="+", choices=list(SCALES), default=["1k", "100k"])
+    p.add_argument("--beans", type=int, help="override the scale's bean count")
+    p.add_argument("--sessions", type=int, help="override the scale's session count")
+    p.add_argument("--images", type=float, default=0.1, metavar="SHARE", help="share of beans with a photo")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("-n", "--repeat", type=int, default=5)
+    p.add_argument("--cases", nargs="+", default=["*"], metavar="GLOB", help="only the cases matching these")
+    p.add_argument("--data-dir", default=DATA_DIR,
+                   help="where generated journals are kept between runs (default: %(default)s)")
+    p.add_argument("--json", metavar="PATH", help="write the results here")
+    p.add_argument("--compare", metavar="PATH", help="an earlier --json file to compare against")
+    args = p.parse_args(argv)
+
+    results = {}
+    for scale in args.scales:
+        beans, sessions = SCALES[scale]
+        beans = args.beans or beans
+        sessions = args.sessions if args.sessions is not None else sessions
+        path = cached_journal(args.data_dir, scale, beans, sessions, args.images, args.seed)
+        print(f"{scale}: {beans} beans, {sessions} sessions, {os.path.getsize(path) / 2 ** 20:.1f} MiB")
+        results[scale] = {"beans": beans, "sessions": sessions, "image_share": args.images, "seed": args.seed,
+                          "cases": run_scale(path, args.repeat, args.cases)}
+    if args.json:
+        harness.write_json(args.json, results)
+    if args.compare:
+        harness.compare(args.compare, results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+# benchmarks/generate.py
+"""Deterministic synthetic journals for the benchmarks.
+
+The same arguments always give the same rows (names, notes, ratings, dates and photo bytes),
+so timings from different commits are measured on identical data. Rows go in through the
+bulk API, the same path as a file import.
+
+    python benchmarks/generate.py journal.db --beans 5000 --sessions 100000 --images 0.1
+"""
+import argparse
+import datetime
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+from harness import ROOT  # noqa: F401 - puts the repo on sys.path
+
+from coffeejournal import DatabaseManager
+
+ORIGINS = ("Эфиопия", "Кения", "Колумбия", "Бразилия", "Гватемала", "Коста-Рика", "Руанда", "Индонезия",
+           "Гондурас", "Перу")
+ROASTERS = ("Tasty Coffee", "Ёжик", "Cofix Lab", "Double B", "Roastberry", "Torrefacto", "")
+ROAST_LEVELS = ("Light", "Medium", "Dark")
+PROCESSES = ("мытая", "натуральная", "хани", "анаэробная", "")
+NOTES = ("черника", "жасмин", "карамель", "шоколад", "цитрус", "персик", "орех", "бергамот", "мёд", "слива",
+         "вишня", "табак", "ваниль", "грейпфрут", "чай")
+METHODS = ("Эспрессо", "Воронка", "Аэропресс", "Френч-пресс", "Кемекс", "Пуровер")
+SESSION_NOTES = ("кисло", "сладко", "горчит", "сбалансировано", "водянисто", "плотное тело", "долгое послевкусие", "")
+GRINDS = ("мелкий", "средний", "крупный", "18 кликов", "24 клика", "")
+START = datetime.datetime(2020, 1, 1)
+# the benchmarks' journal sizes: scale -> (beans, sessions)
+SCALES = {
+    "1k": (100, 1_000),
+    "100k": (5_000, 100_000),
+    "1m": (20_000, 1_000_000),
+}
+DATA_DIR = os.path.join(tempfile.gettempdir(), "coffeejournal-bench")
+IMAGE_SIDE = 160  # generated photos are noise, so they barely compress: ~20-40 KiB each as JPEG
+
+
+def _photo(rng, side):
+    from PIL import Image  # only needed when photos are asked for
+    w, h = side, side * 3 // 4
+    buf = io.BytesIO()
+    Image.frombytes("RGB", (w, h), rng.randbytes(w * h * 3)).save(buf, "JPEG", quality=80)
+    return buf.getvalue()
+
+
+def _stamp(i, step_minutes):
+    return (START + datetime.timedelta(minutes=i * step_minutes)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def bean_rows(n, image_share=0.0, seed=0, image_side=IMAGE_SIDE):
+    rng = random.Random(seed)
+    for i in range(n):
+        origin = rng.choice(ORIGINS)
+        yield {
+            "name": f"{origin} {rng.choice(PROCESSES) or 'лот'} #{i}",
+            "roaster": rng.choice(ROASTERS),
+            "roast_level": rng.choice(ROAST_LEVELS),
+            "origin": origin,
+            "processing_method": rng.choice(PROCESSES),
+            "tasting_notes": ", ".join(rng.sample(NOTES, rng.randint(1, 4))),
+            "rating": round(rng.uniform(0, 5), 1),
+            "price": float(rng.randrange(300, 3000, 10)),
+            "purchase_date": _stamp(i, 60 * 24 * 365 * 4 // max(n, 1))[:10],
+            "image": _photo(rng, image_side) if rng.random() < image_share else None,
+            "created_at": _stamp(i, 60 * 24 * 365 * 4 // max(n, 1)),
+        }
+
+
+def session_rows(n, beans, seed=0):
+    rng = random.Random(seed + 1)
+    for i in range(n):
+        yield {
+            "coffee_bean_id": rng.randint(1, beans),
+            "brew_method": rng.choice(METHODS),
+            "grind_size": rng.choice(GRINDS),
+            "water_temp": rng.randint(85, 96),
+            "brew_time": rng.randint(20, 300),
+            "coffee_weight": float(rng.choice((15, 16, 18, 20, 22))),
+            "water_weight": float(rng.choice((36, 40, 250, 300, 350))),
+            "rating": round(rng.uniform(0, 5), 1),
+            "notes": rng.choice(SESSION_NOTES),
+            "created_at": _stamp(i, max(1, 60 * 24 * 365 * 4 // max(n, 1))),
+        }
+
+
+def generate(path, beans, sessions, image_share=0.0, seed=0, image_side=IMAGE_SIDE):
+    """Create a new journal at path (an existing file is replaced) and return its row counts."""
+    for p in (path, path + "-wal", path + "-shm"):
+        if os.path.exists(p):
+            os.remove(p)
+    db = DatabaseManager(path)
+    try:
+        res = db.add_coffee_beans_bulk(bean_rows(beans, image_share, seed, image_side))
+        if res.failed or res.inserted != beans:
+            raise RuntimeError(f"generator beans: {res}")
+        if sessions:
+            res = db.add_brewing_sessions_bulk(session_rows(sessions, beans, seed))
+            if res.failed:
+                raise RuntimeError(f"generator sessions: {res}")
+        db.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        db.conn.execute("PRAGMA optimize")
+        return {"beans": db.count_rows("beans"), "sessions": db.count_rows("sessions")}
+    finally:
+        db.close()
+
+
+def cached_journal(data_dir, scale, beans, sessions, image_share=0.0, seed=0):
+    """Path of a generated journal with these parameters, generated on first use."""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"journal-{scale}-{beans}-{sessions}-{image_share:g}-{seed}.db")
+    if not os.path.exists(path):
+        print(f"generating {scale}: {beans} beans, {sessions} sessions ...", flush=True)
+        part = path + ".part"
+        generate(part, beans, sessions, image_share, seed)
+        os.replace(part, path)
+    return path
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("path")
+    p.add_argument("--beans", type=int, default=1000)
+    p.add_argument("--sessions", type=int, default=10000)
+    p.add_argument("--images", type=float, default=0.0, metavar="SHARE", help="share of beans with a photo (0..1)")
+    p.add_argument("--image-side", type=int, default=IMAGE_SIDE, metavar="PX")
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args(argv)
+    t = time.perf_counter()
+    counts = generate(args.path, args.beans, args.sessions, args.images, args.seed, args.image_side)
+    print(f"{args.path}: {counts['beans']} beans, {counts['sessions']} sessions, "
+          f"{os.path.getsize(args.path) / 2 ** 20:.1f} MiB in {time.perf_counter() - t:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
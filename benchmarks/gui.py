@@ -0,0 +1,314 @@
+# benchmarks/gui.py
+"""Responsiveness of MainWindow as the user feels it, on the offscreen Qt platform.
+
+A real MainWindow over a generated journal (benchmarks/generate.py) is driven through
+startup, F5, sorting every column, typing in the bean search, scrolling both tables to the
+end and opening the details dialog. Each action is timed from the input to the next paint of
+the table it changes (or to the dialog being painted), and a 5 ms heartbeat timer records how
+long the event loop was stalled meanwhile.
+
+    python benchmarks/gui.py                               # scales 1k and 100k
+    python benchmarks/gui.py --scales 100k 1m --json gui.json --compare old.json
+    python benchmarks/gui.py --steps 'sort.*' 'scroll.*'
+
+Startup here is measured in-process (warm imports); benchmarks/startup.py times process starts.
+"""
+import argparse
+import fnmatch
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import harness
+from generate import SCALES, DATA_DIR, cached_journal
+
+from PyQt5.QtCore import QEvent, QEventLoop, QObject, QTimer, Qt
+from PyQt5.QtGui import QKeyEvent
+from PyQt5.QtWidgets import QApplication
+
+import main as app_main
+
+TICK_MS = 5
+STALL_MS = 50  # a gap the user notices: three frames at 60 Hz
+TIMEOUT_S = 120
+SEARCH_WORDS = ("эфиопия", "черника", "kenya")  # typed a key at a time; the last one finds nothing
+
+
+class LoopMonitor(QObject):
+    """Ticks every TICK_MS; a tick that comes late means the event loop was busy that long."""
+
+    def __init__(self):
+        super().__init__()
+        self.gaps = []
+        self._last = 0.0
+        self._timer = QTimer(self, interval=TICK_MS, timerType=Qt.PreciseTimer)
+        self._timer.timeout.connect(self._tick)
+
+    def _tick(self):
+        now = time.perf_counter()
+        self.gaps.append((now - self._last) * 1000 - TICK_MS)
+        self._last = now
+
+    def start(self):
+        self.gaps = []
+        self._last = time.perf_counter()
+        self._timer.start()
+
+    def stop(self):
+        self._tick()  # a stall still running at the end counts too
+        self._timer.stop()
+        return self.gaps
+
+
+class PaintProbe(QObject):
+    """Time of the latest paint of a widget (a table viewport, a dialog)."""
+
+    def __init__(self, widget):
+        super().__init__(widget)
+        self.last = 0.0
+        widget.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            self.last = time.perf_counter()
+        return False
+
+
+class SignalTime(QObject):
+    """Time of the latest emission of a signal."""
+
+    def __init__(self, signal):
+        super().__init__()
+        self.last = 0.0
+        signal.connect(self._hit)
+
+    def _hit(self, *args):
+        self.last = time.perf_counter()
+
+
+def wait_until(predicate, timeout=TIMEOUT_S):
+    # each pass sleeps until the next event; the monitor's ticks keep it at most TICK_MS
+    end = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > end:
+            raise TimeoutError("the window did not respond in time")
+        QApplication.processEvents(QEventLoop.AllEvents | QEventLoop.WaitForMoreEvents)
+
+
+def press(widget, key, text=""):
+    for kind in (QEvent.KeyPress, QEvent.KeyRelease):
+        QApplication.sendEvent(widget, QKeyEvent(kind, key, Qt.NoModifier, text))
+
+
+class UiBench:
+    def __init__(self, db_path, repeat, max_scroll_steps, patterns):
+        self.db_path = db_path
+        self.repeat = repeat
+        self.max_scroll_steps = max_scroll_steps
+        self.patterns = patterns
+        self.monitor = LoopMonitor()
+        self.results = {}
+        self.win = None
+
+    def wanted(self, *names):
+        return any(fnmatch.fnmatch(n, p) for n in names for p in self.patterns)
+
+    def record(self, name, samples, gaps):
+        if not samples or not self.wanted(name):
+            return
+        r = self.results[name] = harness.summarize(samples)
+        r["max_stall_ms"] = max(gaps, default=0)
+        r["stalls"] = sum(1 for g in gaps if g >= STALL_MS)
+        r["stalled_ms"] = sum(g for g in gaps if g >= STALL_MS)
+        print(f"  {name:20} p50 {r['median_ms']:8.1f}  p95 {r['p95_ms']:8.1f}  p99 {r['p99_ms']:8.1f}  "
+              f"max {r['max_ms']:8.1f} ms   stall max {r['max_stall_ms']:7.1f} ms, {r['stalls']} over {STALL_MS} ms "
+              f"({len(samples)} samples)", flush=True)
+
+    def open_window(self):
+        t = time.perf_counter()
+        win = app_main.MainWindow(db_path=self.db_path)
+        beans = SignalTime(win.coffee_model.modelReset)
+        paint = PaintProbe(win.coffeeTable.viewport())
+        win.show()
+        shown = time.perf_counter()
+        wait_until(lambda: beans.last and paint.last > beans.last)
+        return win, (shown - t) * 1000, (paint.last - t) * 1000
+
+    def close_window(self, win):
+        win.close()
+        win.db.close()
+        win.deleteLater()
+        QApplication.processEvents()
+
+    def reset_and_paint(self, model, view, action):
+        """Run action and return ms until the model reset and the view painted afterwards."""
+        reset = SignalTime(model.modelReset)
+        paint = PaintProbe(view.viewport())
+        t = time.perf_counter()
+        action()
+        wait_until(lambda: reset.last and paint.last > reset.last)
+        ms = (paint.last - t) * 1000
+        paint.deleteLater(); reset.deleteLater()
+        return ms
+
+    def show_tab(self, tab):
+        self.win.tabWidget.setCurrentWidget(tab)
+        QApplication.processEvents()
+
+    def run(self):
+        if self.wanted("startup.*"):
+            self.monitor.start()
+            shown, painted = [], []
+            for _ in range(self.repeat):
+                win, a, b = self.open_window()
+                shown.append(a); painted.append(b)
+                self.close_window(win)
+            gaps = self.monitor.stop()
+            self.record("startup.shown", shown, gaps)
+            self.record("startup.first_paint", painted, gaps)
+
+        self.win, _, _ = self.open_window()
+        try:
+            for name, step in (("refresh.*", self.refresh), ("sort.*", self.sort), ("search.*", self.search),
+                               ("scroll.*", self.scroll), ("details.*", self.details)):
+                if self.wanted(name):
+                    step()
+        finally:
+            self.close_window(self.win)
+        return self.results
+
+    def refresh(self):
+        w = self.win
+        self.show_tab(w.coffeeTab)
+        brewing = SignalTime(w.brewing_model.modelReset)
+        samples = []
+        self.monitor.start()
+        for _ in range(self.repeat):
+            t = time.perf_counter()
+            samples.append(self.reset_and_paint(w.coffee_model, w.coffeeTable, lambda: press(w, Qt.Key_F5)))
+            wait_until(lambda: brewing.last > t)
+        self.record("refresh.f5", samples, self.monitor.stop())
+
+    def sort(self):
+        w = self.win
+        for name, tab, view, model in (("sort.beans", w.coffeeTab, w.coffeeTable, w.coffee_model),
+                                       ("sort.sessions", w.brewingTab, w.brewingTable, w.brewing_model)):
+            if not self.wanted(name):
+                continue
+            self.show_tab(tab)
+            samples = []
+            self.monitor.start()
+            for col, key in enumerate(model.sort_keys):
+                if key is None:
+                    continue
+                for order in (Qt.AscendingOrder, Qt.DescendingOrder):
+                    samples.append(self.reset_and_paint(model, view, lambda: view.sortByColumn(col, order)))
+            self.record(name, samples, self.monitor.stop())
+
+    def search(self):
+        w = self.win
+        edit = w.coffeeSearchEdit
+        self.show_tab(w.coffeeTab)
+        keys, clears = [], []
+        self.monitor.start()
+        for word in SEARCH_WORDS:
+            for ch in word:
+                keys.append(self.reset_and_paint(w.coffee_model, w.coffeeTable,
+                                                 lambda: press(edit, Qt.Key_unknown, ch)))
+            clears.append(self.reset_and_paint(w.coffee_model, w.coffeeTable, w.coffeeClearBtn.click))
+        gaps = self.monitor.stop()
+        self.record("search.keystroke", keys, gaps)
+        self.record("search.clear", clears, gaps)
+
+    def scroll(self):
+        w = self.win
+        waits, gaps_all = [], []
+        for name, tab, view, model in (("scroll.beans", w.coffeeTab, w.coffeeTable, w.coffee_model),
+                                       ("scroll.sessions", w.brewingTab, w.brewingTable, w.brewing_model)):
+            if not self.wanted(name, "scroll.page_wait"):
+                continue
+            self.show_tab(tab)
+            bar = view.verticalScrollBar()
+            bar.setValue(0)
+            samples = []
+            self.monitor.start()
+            for _ in range(self.max_scroll_steps):
+                if bar.value() >= bar.maximum():
+                    # at the end of the rows that are in: the next page is what the user waits for
+                    n = model.rowCount()
+                    if model.canFetchMore():
+                        model.fetchMore()
+                    t = time.perf_counter()
+                    wait_until(lambda: model.rowCount() > n or not model.canFetchMore() and not model._loading)
+                    if model.rowCount() == n:
+                        break
+                    waits.append((time.perf_counter() - t) * 1000)
+                t = time.perf_counter()
+                bar.setValue(bar.value() + bar.pageStep())
+                view.viewport().repaint()
+                samples.append((time.perf_counter() - t) * 1000)
+                QApplication.processEvents()
+            gaps = self.monitor.stop()
+            gaps_all += gaps
+            self.record(name, samples, gaps)
+        self.record("scroll.page_wait", waits, gaps_all)
+
+    def details(self):
+        w = self.win
+        for name, tab, proxy, open_row in (("details.bean", w.coffeeTab, w.coffee_proxy, w.on_coffee_double_clicked),
+                                           ("details.session", w.brewingTab, w.brewing_proxy,
+                                            w.on_brewing_double_clicked)):
+            if not self.wanted(name):
+                continue
+            self.show_tab(tab)
+            samples = []
+            self.monitor.start()
+            for row in range(min(self.repeat * 4, proxy.rowCount())):
+                t = time.perf_counter()
+                def opened():
+                    # runs inside the dialog's exec_() once it is shown
+                    dlg = QApplication.activeModalWidget()
+                    dlg.repaint()
+                    samples.append((time.perf_counter() - t) * 1000)
+                    dlg.done(0)
+                QTimer.singleShot(0, opened)
+                open_row(proxy.index(row, 0))
+            self.record(name, samples, self.monitor.stop())
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--scales", nargs="+", choices=list(SCALES), default=["1k", "100k"])
+    p.add_argument("--images", type=float, default=0.1, metavar="SHARE", help="share of beans with a photo")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("-n", "--repeat", type=int, default=5, help="window starts and F5 presses per scale")
+    p.add_argument("--max-scroll-steps", type=int, default=2000, metavar="N", help="page-downs per table at most")
+    p.add_argument("--steps", nargs="+", default=["*"], metavar="GLOB", help="only the steps matching these")
+    p.add_argument("--data-dir", default=DATA_DIR, help="where generated journals are kept (default: %(default)s)")
+    p.add_argument("--json", metavar="PATH", help="write the results here")
+    p.add_argument("--compare", metavar="PATH", help="an earlier --json file to compare p95 against")
+    args = p.parse_args(argv)
+
+    # the hourly snapshot would land in the middle of a step; the window lives for minutes at most
+    app_main.SNAPSHOT_FIRST_CHECK_MS = app_main.SNAPSHOT_CHECK_MS = 24 * 3600 * 1000
+    app = QApplication(sys.argv[:1])
+    results = {}
+    for scale in args.scales:
+        beans, sessions = SCALES[scale]
+        path = cached_journal(args.data_dir, scale, beans, sessions, args.images, args.seed)
+        print(f"{scale}: {beans} beans, {sessions} sessions")
+        bench = UiBench(path, args.repeat, args.max_scroll_steps, args.steps)
+        results[scale] = {"beans": beans, "sessions": sessions, "image_share": args.images, "seed": args.seed,
+                          "cases": bench.run()}
+    if args.json:
+        harness.write_json(args.json, results)
+    if args.compare:
+        harness.compare(args.compare, results, key="p95_ms")
+    app.quit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
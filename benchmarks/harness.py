@@ -0,0 +1,87 @@
+# benchmarks/harness.py
+"""Timing, memory and result-file helpers shared by the benchmark scripts."""
+import gc
+import json
+import math
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of a non-empty list (p in 0..100)."""
+    s = sorted(values)
+    return s[max(0, math.ceil(p / 100 * len(s)) - 1)]
+
+
+def summarize(samples_ms):
+    return {"runs": len(samples_ms), "median_ms": statistics.median(samples_ms), "min_ms": min(samples_ms),
+            "p95_ms": percentile(samples_ms, 95), "p99_ms": percentile(samples_ms, 99), "max_ms": max(samples_ms)}
+
+
+def measure(fn, repeat=5, setup=None):
+    """Time fn(setup()) `repeat` times, then run it once more under tracemalloc for the peak of
+    Python allocations (SQLite's own page cache is not counted). fn's result may be sized."""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        gc.collect()
+        t = time.perf_counter()
+        result = fn(arg)
+        samples.append((time.perf_counter() - t) * 1000)
+        del result  # freed before the next run, so runs do not overlap in memory
+    arg = setup() if setup else None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = fn(arg)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    out = summarize(samples)
+    out["peak_kib"] = peak / 1024
+    if isinstance(result, int):
+        out["rows"] = result
+    elif isinstance(result, list):
+        out["rows"] = len(result)
+    return out
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"commit": commit, "date": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version, "platform": platform.platform(), "cpus": os.cpu_count()}
+
+
+def write_json(path, results):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2, ensure_ascii=False)
+
+
+def compare(old_path, results, key="median_ms"):
+    """Print every case next to the same case in an earlier result file, slowest change first."""
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    rows = []
+    for scale, cases in results.items():
+        for name, new in cases["cases"].items():
+            prev = old["results"].get(scale, {}).get("cases", {}).get(name)
+            if prev and prev.get(key):
+                rows.append((new[key] / prev[key], scale, name, prev[key], new[key]))
+    print(f"\nagainst {old_path} ({old['environment'].get('commit')}), {key}:")
+    for ratio, scale, name, a, b in sorted(rows, reverse=True):
+        print(f"  {scale:6} {name:28} {a:10.1f} -> {b:10.1f}  x{ratio:.2f}")
@@ -0,0 +1,83 @@
+# benchmarks/startup.py
+"""Cold- and warm-start times of the app, from source and from the PyInstaller builds.
+
+Each mode is launched with --profile-startup, which quits once the first page of beans is
+shown, and timed from spawn to exit. The first launch is reported as cold (for a onefile build
+it includes unpacking the archive; with --drop-caches on Linux as root the OS file cache is
+emptied before it), the median of the following launches as warm.
+
+    python benchmarks/startup.py                 # every mode that is present
+    python benchmarks/startup.py -n 10 --json startup.json
+    QT_QPA_PLATFORM=offscreen python benchmarks/startup.py --modes source
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXE = ".exe" if os.name == "nt" else ""
+MODES = {
+    "source": [sys.executable, os.path.join(ROOT, "main.py")],
+    "onedir": [os.path.join(ROOT, "dist", "CoffeeJournal", "CoffeeJournal" + EXE)],
+    "onefile": [os.path.join(ROOT, "dist", "CoffeeJournal" + EXE)],
+}
+
+
+def drop_caches():
+    # Linux only, needs root; elsewhere "cold" means the first launch since the build
+    try:
+        os.sync()
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3\n")
+        return True
+    except OSError:
+        return False
+
+
+def launch(cmd, timeout):
+    t = time.perf_counter()
+    proc = subprocess.run(cmd + ["--profile-startup"], capture_output=True, text=True, timeout=timeout)
+    elapsed = time.perf_counter() - t
+    if proc.returncode != 0:
+        raise RuntimeError(f"{cmd[0]} exited with {proc.returncode}: {proc.stderr.strip()[-500:]}")
+    return elapsed, proc.stdout
+
+
+def bench(cmd, runs, timeout, cold_drop):
+    dropped = cold_drop and drop_caches()
+    cold, report = launch(cmd, timeout)
+    warm = [launch(cmd, timeout)[0] for _ in range(runs)]
+    return {"cold_ms": cold * 1000, "cold_caches_dropped": dropped,
+            "warm_ms": statistics.median(warm) * 1000, "warm_min_ms": min(warm) * 1000,
+            "warm_runs": runs, "report": report.strip()}
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    p.add_argument("-n", "--runs", type=int, default=5, help="warm launches per mode")
+    p.add_argument("--timeout", type=float, default=60)
+    p.add_argument("--drop-caches", action="store_true", help="empty the OS file cache before each cold launch")
+    p.add_argument("--json", metavar="PATH", help="also write the results here")
+    args = p.parse_args(argv)
+
+    results = {}
+    for mode in args.modes:
+        cmd = MODES[mode]
+        if not os.path.exists(cmd[-1]):
+            print(f"{mode:8} skipped: {cmd[-1]} not built")
+            continue
+        r = results[mode] = bench(cmd, args.runs, args.timeout, args.drop_caches)
+        print(f"{mode:8} cold {r['cold_ms']:8.1f} ms   warm {r['warm_ms']:8.1f} ms (min {r['warm_min_ms']:.1f})")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    return 0 if results else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
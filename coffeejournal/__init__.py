@@ -0,0 +1,18 @@
+# coffeejournal/__init__.py
+"""The journal's data layer without Qt: schema and migrations, every SQL statement, the
+DatabaseManager and a bytes-in / bytes-out photo store. Imports, exports, backups and
+scripts use it directly; the GUI wraps it in database.DatabaseManager.
+
+Pillow (coffeejournal.images) and the import/export and backup modules load on first use.
+"""
+from .journal import DatabaseManager, BulkResult, chunked, default_db_path, get_user_db_path
+from .tracing import QueryLog
+from .queries import (
+    BEAN_ROW_FIELDS, SESSION_ROW_FIELDS, BEAN_EXPORT_FIELDS, SESSION_EXPORT_FIELDS, BULK_CHUNK_SIZE,
+)
+
+__all__ = [
+    "DatabaseManager", "BulkResult", "chunked", "default_db_path", "get_user_db_path", "QueryLog",
+    "BEAN_ROW_FIELDS", "SESSION_ROW_FIELDS", "BEAN_EXPORT_FIELDS", "SESSION_EXPORT_FIELDS",
+    "BULK_CHUNK_SIZE",
+]
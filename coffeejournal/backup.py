@@ -0,0 +1,58 @@
+# coffeejournal/backup.py
+"""Rolling snapshots of the journal in the app data dir.
+
+take_snapshot() copies the live database with DatabaseManager.backup_to (chunked, so it can
+report progress and be cancelled) into `<appdir>/backups` and keeps the newest SNAPSHOT_KEEP.
+"""
+import os
+import time
+import logging
+
+from .journal import get_user_db_path
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEEP = 5
+SNAPSHOT_INTERVAL = 24 * 3600  # seconds between scheduled snapshots
+SNAPSHOT_PREFIX = "coffee_journal-"
+SNAPSHOT_SUFFIX = ".db"
+
+
+def snapshot_dir() -> str:
+    return os.path.join(os.path.dirname(get_user_db_path()), "backups")
+
+
+def list_snapshots(directory=None):
+    """Snapshot paths, oldest first (the timestamped names sort chronologically)."""
+    directory = directory or snapshot_dir()
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(n for n in os.listdir(directory)
+                   if n.startswith(SNAPSHOT_PREFIX) and n.endswith(SNAPSHOT_SUFFIX))
+    return [os.path.join(directory, n) for n in names]
+
+
+def snapshot_due(directory=None, interval=SNAPSHOT_INTERVAL) -> bool:
+    snaps = list_snapshots(directory)
+    return not snaps or time.time() - os.path.getmtime(snaps[-1]) >= interval
+
+
+def prune_snapshots(directory=None, keep=SNAPSHOT_KEEP):
+    for path in list_snapshots(directory)[:-keep or None]:
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning("could not remove old snapshot %s: %s", path, e)
+
+
+def take_snapshot(db, directory=None, keep=SNAPSHOT_KEEP, progress=None) -> str:
+    """Back the database up into a new timestamped snapshot and drop all but the newest `keep`."""
+    directory = directory or snapshot_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{SNAPSHOT_PREFIX}{time.strftime('%Y%m%d-%H%M%S')}{SNAPSHOT_SUFFIX}")
+    # written under a temporary name so an interrupted copy never looks like a snapshot
+    part = path + ".part"
+    db.backup_to(part, progress=progress)
+    os.replace(part, path)
+    prune_snapshots(directory, keep)
+    return path
@@ -0,0 +1,211 @@
+# coffeejournal/cli.py
+"""Command-line access to the journal, for cron jobs and scripts; never imports Qt.
+
+    python -m coffeejournal stats [--json]
+    python -m coffeejournal export beans beans.csv           # "-" streams JSON Lines to stdout
+    python -m coffeejournal import sessions sessions.jsonl   # "-" reads stdin (--format csv)
+    python -m coffeejournal backup [PATH]                    # rolling snapshot, or a copy at PATH
+    python -m coffeejournal vacuum
+    python -m coffeejournal search "эфиопия" [--sessions] [--limit N] [--json]
+
+--db picks the journal file (default: the one the app opens). Exports and imports stream row
+by row, so they run in flat memory on any journal size.
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import sqlite3
+import sys
+
+from . import backup
+from .journal import DatabaseManager, default_db_path
+
+BEAN_TABLE_COLUMNS = ("id", "name", "roaster", "roast_level", "origin", "rating", "price")
+SESSION_TABLE_COLUMNS = ("id", "coffee_name", "brew_method", "grind_size", "brew_time", "rating", "created_at")
+CELL_WIDTH = 40  # longer text is cut in table output
+FAILED_SHOWN = 20  # failed import rows listed on stderr
+
+
+def _cell(v) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, float):
+        return f"{v:g}"
+    v = str(v).replace("\n", " ")
+    return v if len(v) <= CELL_WIDTH else v[:CELL_WIDTH - 1] + "…"
+
+
+def print_table(rows, columns, out=None):
+    out = out or sys.stdout
+    cells = [[_cell(r.get(c)) for c in columns] for r in rows]
+    widths = [max([len(c)] + [len(r[i]) for r in cells]) for i, c in enumerate(columns)]
+    for r in [list(columns)] + cells:
+        out.write("  ".join(v.ljust(w) for v, w in zip(r, widths)).rstrip() + "\n")
+
+
+def print_json(value, out=None):
+    out = out or sys.stdout
+    json.dump(value, out, ensure_ascii=False, indent=2)
+    out.write("\n")
+
+
+def _progress(label):
+    # a \r-updated line on an interactive stderr; silent under cron or in a pipe
+    if not sys.stderr.isatty():
+        return None
+    def report(done, total):
+        pct = f" ({done * 100 // total}%)" if total else ""
+        sys.stderr.write(f"\r{label}: {done}{pct}" + ("\n" if done >= total else ""))
+        sys.stderr.flush()
+    return report
+
+
+def _format(path, fmt):
+    from . import exchange
+    if fmt:
+        return fmt
+    if path == "-":
+        return "jsonl"
+    return exchange.file_format(path)
+
+
+def cmd_stats(db, args):
+    stats = db.get_detailed_statistics()
+    if args.json:
+        print_json(stats)
+        return 0
+    for key, value in stats.items():
+        if isinstance(value, list):
+            print(f"{key}:")
+            for name, n in value:
+                print(f"  {name or '-':24} {n}")
+        else:
+            print(f"{key:24} {_cell(round(value, 2) if isinstance(value, float) else value)}")
+    return 0
+
+
+def cmd_export(db, args):
+    from . import exchange
+    fmt = _format(args.path, args.format)
+    if args.path == "-":
+        n = exchange.write_rows(db, args.table, sys.stdout, fmt)
+    else:
+        with open(args.path, "w", encoding="utf-8", newline="") as f:
+            n = exchange.write_rows(db, args.table, f, fmt, _progress(f"export {args.table}"))
+    print(f"exported {n} rows", file=sys.stderr)
+    return 0
+
+
+def cmd_import(db, args):
+    from . import exchange
+    fmt = _format(args.path, args.format)
+    if args.path == "-":
+        src = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8-sig", newline="")
+        result = exchange.read_rows(db, args.table, src, fmt, args.upsert)
+    else:
+        result = exchange.import_rows(db, args.table, args.path, args.upsert,
+                                      progress=_progress(f"import {args.table}"))
+    if args.json:
+        print_json({"inserted": result.inserted, "updated": result.updated, "failed": result.failed})
+    else:
+        print(f"inserted {result.inserted}, updated {result.updated}, failed {len(result.failed)}",
+              file=sys.stderr)
+        for i, error in result.failed[:FAILED_SHOWN]:
+            print(f"  row {i + 1}: {error}", file=sys.stderr)
+        if len(result.failed) > FAILED_SHOWN:
+            print(f"  ... and {len(result.failed) - FAILED_SHOWN} more", file=sys.stderr)
+    return 1 if result.failed else 0
+
+
+def cmd_backup(db, args):
+    if args.path:
+        part = args.path + ".part"  # like snapshots: never leave a half-written copy under the name
+        db.backup_to(part, progress=_progress("backup"))
+        os.replace(part, args.path)
+        path = args.path
+    else:
+        path = backup.take_snapshot(db, keep=args.keep, progress=_progress("backup"))
+    print(path)
+    return 0
+
+
+def cmd_vacuum(db, args):
+    result = db.vacuum()
+    if args.json:
+        print_json(result)
+    else:
+        for key, value in result.items():
+            print(f"{key:24} {value}")
+    return 0
+
+
+def cmd_search(db, args):
+    search = db.search_brewing_sessions if args.sessions else db.search_coffee_beans
+    rows = search(args.query, args.limit or -1)  # the LIMIT is applied by SQLite
+    if args.json:  # JSON Lines, one match per line
+        for row in rows:
+            sys.stdout.write(json.dumps(row, ensure_ascii=False) + "\n")
+    else:
+        print_table(rows, SESSION_TABLE_COLUMNS if args.sessions else BEAN_TABLE_COLUMNS)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="coffeejournal", description="Coffee Journal without the GUI.")
+    p.add_argument("--db", metavar="PATH", help="journal file (default: the one the app opens)")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    s = sub.add_parser("stats", help="totals and averages from the statistics tab")
+    s.add_argument("--json", action="store_true")
+    s.set_defaults(func=cmd_stats)
+
+    for name, func, verb in (("export", cmd_export, "write"), ("import", cmd_import, "read")):
+        s = sub.add_parser(name, help=f"{verb} a table as CSV or JSON Lines")
+        s.add_argument("table", choices=("beans", "sessions"))
+        s.add_argument("path", help="file (.csv, .jsonl) or - for " + ("stdout" if name == "export" else "stdin"))
+        s.add_argument("--format", choices=("csv", "jsonl"), help="instead of guessing from the extension (- is jsonl)")
+        s.set_defaults(func=func)
+    s.add_argument("--upsert", action="store_true", help="update beans that match by name + roaster")
+    s.add_argument("--json", action="store_true", help="print the result as JSON")
+
+    s = sub.add_parser("backup", help="copy the journal while it stays usable")
+    s.add_argument("path", nargs="?", help="copy here instead of a rolling snapshot in the app data dir")
+    s.add_argument("--keep", type=int, default=backup.SNAPSHOT_KEEP, help="snapshots to keep (default: %(default)s)")
+    s.set_defaults(func=cmd_backup)
+
+    s = sub.add_parser("vacuum", help="drop unused photos, compact indexes and the file")
+    s.add_argument("--json", action="store_true")
+    s.set_defaults(func=cmd_vacuum)
+
+    s = sub.add_parser("search", help="full-text search over beans (or sessions)")
+    s.add_argument("query")
+    s.add_argument("--sessions", action="store_true", help="search brewing sessions")
+    s.add_argument("--limit", type=int, default=0, metavar="N", help="at most N best matches")
+    s.add_argument("--json", action="store_true", help="one JSON object per line")
+    s.set_defaults(func=cmd_search)
+    return p
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+    try:
+        db = DatabaseManager(args.db or default_db_path())
+    except sqlite3.Error as e:
+        print(f"coffeejournal: cannot open {args.db or default_db_path()}: {e}", file=sys.stderr)
+        return 1
+    try:
+        return args.func(db, args)
+    except BrokenPipeError:
+        # the reader (head, less) went away; keep the interpreter from failing on the final flush
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"coffeejournal: {args.command}: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        db.close()
@@ -0,0 +1,139 @@
+# coffeejournal/exchange.py
+"""Streaming CSV / JSON Lines export and import of beans and brewing sessions.
+
+Rows move one at a time between a cursor and the file, and imports go in through the
+bulk API one chunk (one transaction) at a time, so memory stays flat whatever the size.
+Sessions are written with their bean's name + roaster and matched back to a local bean on
+import; ids are never carried between journals.
+"""
+import base64
+import binascii
+import csv
+import io
+import json
+import os
+import sys
+
+from .journal import BulkResult, chunked
+from .queries import BEAN_EXPORT_FIELDS, SESSION_EXPORT_FIELDS, BULK_CHUNK_SIZE
+
+TABLES = {"beans": BEAN_EXPORT_FIELDS, "sessions": SESSION_EXPORT_FIELDS}
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+FILE_FILTER = "CSV (*.csv);;JSON Lines (*.jsonl *.ndjson)"
+
+# images travel base64-encoded, which outgrows csv's default field limit
+csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+
+
+def file_format(path) -> str:
+    fmt = FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"unsupported file type: {path} (use .csv or .jsonl)")
+    return fmt
+
+
+def _encode(row):
+    img = row.get("image")
+    if img is not None:
+        row["image"] = base64.b64encode(img).decode("ascii")
+    return row
+
+
+def _decode(row):
+    img = row.get("image")
+    if isinstance(img, str):
+        try:
+            row["image"] = base64.b64decode(img, validate=True) if img else None
+        except (binascii.Error, ValueError):
+            row["image"] = None
+    return row
+
+
+def export_rows(db, table, path, progress=None) -> int:
+    """Write every row of `table` ("beans" / "sessions") to path; returns the row count.
+    progress(done, total) is called once per chunk."""
+    fmt = file_format(path)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        return write_rows(db, table, f, fmt, progress)
+
+
+def write_rows(db, table, f, fmt, progress=None) -> int:
+    """export_rows() into an open text file (or stdout) in format `fmt` ("csv" / "jsonl")."""
+    fields = TABLES[table]
+    total = db.count_rows(table) if progress else 0
+    n = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        write = lambda row: f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    for row in db.iter_export_rows(table):
+        write(_encode(row))
+        n += 1
+        if progress and n % BULK_CHUNK_SIZE == 0:
+            progress(n, total)
+    if progress:
+        progress(n, total)
+    return n
+
+
+def _read_rows(f, fmt):
+    if fmt == "csv":
+        for row in csv.DictReader(f):
+            yield _decode(row)
+        return
+    for line in f:
+        line = line.strip()
+        if line:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None  # counted as a failed row by the bulk insert
+            yield _decode(row) if isinstance(row, dict) else {}
+
+
+def _resolve_beans(db, rows):
+    # bean name + roaster -> local id, looked up once per distinct bean
+    ids = {}
+    for row in rows:
+        if row.get("bean_name"):
+            k = (row["bean_name"], row.get("bean_roaster") or "")
+            if k not in ids:
+                ids[k] = db.find_coffee_bean_id(*k)
+            row["coffee_bean_id"] = ids[k]
+        yield row
+
+
+def import_rows(db, table, path, upsert=False, chunk_size=BULK_CHUNK_SIZE, progress=None) -> BulkResult:
+    """Read rows of `table` from path and insert them, one transaction per chunk.
+
+    With upsert=True beans that match an existing one by name + roaster update it.
+    Row indexes in the result's `failed` list count data rows from 0.
+    progress(bytes_read, file_size) is called once per chunk.
+    """
+    fmt = file_format(path)
+    size = os.path.getsize(path)
+    with open(path, "rb") as raw:
+        f = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+        report = (lambda: progress(min(raw.tell(), size), size)) if progress else None
+        return read_rows(db, table, f, fmt, upsert, chunk_size, report)
+
+
+def read_rows(db, table, f, fmt, upsert=False, chunk_size=BULK_CHUNK_SIZE, on_chunk=None) -> BulkResult:
+    """import_rows() from an open text file (or stdin); on_chunk() is called after each chunk."""
+    result = BulkResult()
+    rows = _read_rows(f, fmt)
+    if table == "sessions":
+        rows = _resolve_beans(db, rows)
+    offset = 0
+    for chunk in chunked(rows, chunk_size):
+        if table == "beans":
+            res = db.add_coffee_beans_bulk(chunk, chunk_size, upsert=upsert)
+        else:
+            res = db.add_brewing_sessions_bulk(chunk, chunk_size)
+        result.merge(res, offset)
+        offset += len(chunk)
+        if on_chunk:
+            on_chunk()
+    return result
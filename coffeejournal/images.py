@@ -0,0 +1,50 @@
+# coffeejournal/images.py
+"""Bean photo pipeline: originals are downscaled and re-encoded with a lossy codec once, on
+save, and the small sizes the dialogs show are rendered once and stored next to them."""
+import io
+
+from PIL import Image, ImageOps, features
+
+MAX_SIDE = 1600               # longest side of the stored original
+THUMB_SIZES = (320, 200)      # details dialog, edit dialog; largest first (each is cut from the previous)
+QUALITY = 82
+# WebP is smaller at the same quality; fall back to JPEG on Pillow builds without it
+CODEC = "WEBP" if features.check("webp") else "JPEG"
+
+
+def _open(source) -> Image.Image:
+    img = Image.open(io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source)
+    img = ImageOps.exif_transpose(img)  # phone photos carry their rotation in EXIF
+    keep_alpha = CODEC == "WEBP" and (img.mode in ("RGBA", "LA") or "transparency" in img.info)
+    return img.convert("RGBA" if keep_alpha else "RGB")
+
+
+def _encode(img) -> bytes:
+    buf = io.BytesIO()
+    if CODEC == "WEBP":
+        img.save(buf, CODEC, quality=QUALITY, method=4)
+    else:
+        img.save(buf, CODEC, quality=QUALITY, optimize=True, progressive=True)
+    return buf.getvalue()
+
+
+def _thumbnails(img):
+    thumbs = {}
+    for size in THUMB_SIZES:
+        img = img.copy()
+        img.thumbnail((size, size), Image.LANCZOS)
+        thumbs[size] = _encode(img)
+    return thumbs
+
+
+def process_image(source):
+    """Decode a file path or encoded bytes once; returns (original bytes, {size: thumbnail bytes}).
+    Raises OSError (PIL.UnidentifiedImageError) if the data is not an image."""
+    img = _open(source)
+    img.thumbnail((MAX_SIDE, MAX_SIDE), Image.LANCZOS)
+    return _encode(img), _thumbnails(img)
+
+
+def make_thumbnails(data):
+    """Thumbnails for an already stored original (rows saved before thumbnails existed)."""
+    return _thumbnails(_open(data))
@@ -0,0 +1,877 @@
+# coffeejournal/journal.py
+"""DatabaseManager: the journal's connections, reads, writes and statistics, without Qt.
+
+Photos go in as file paths or encoded bytes and come out as encoded bytes; the GUI's
+database.DatabaseManager adds QPixmap on top.
+"""
+import sqlite3
+import os, sys
+import math
+import logging
+import threading
+import functools
+import itertools
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+from .queries import (
+    BEANS_LIST_QUERY, BEAN_BY_ID_QUERY, SESSION_BY_ID_QUERY, BEAN_CHOICES_QUERY,
+    BEAN_IMAGE_QUERY, BEAN_THUMBNAIL_QUERY, BEAN_IMAGE_KEY_QUERY, BEANS_SEARCH_LIKE_QUERY,
+    SESSIONS_LIST_QUERY, SESSIONS_SEARCH_LIKE_QUERY, BEANS_SEARCH_QUERY, SESSIONS_SEARCH_QUERY,
+    BEAN_SORT_SQL, SESSION_SORT_SQL, BEANS_PAGE_BASE, sessions_page_base, BEAN_INSERT_DEFAULTS,
+    SESSION_INSERT_DEFAULTS, BEAN_REQUIRED, SESSION_REQUIRED, BEAN_INSERT_QUERY,
+    SESSION_INSERT_QUERY, BULK_CHUNK_SIZE, IMAGE_PUT_QUERY, THUMBNAIL_PUT_QUERY,
+    IMAGE_RELEASE_QUERY, IMAGE_GC_QUERY, BEAN_EXPORT_FIELDS, SESSION_EXPORT_FIELDS,
+    BEANS_EXPORT_QUERY, SESSIONS_EXPORT_QUERY, BEAN_BY_NATURAL_KEY_QUERY, MERGE_IMAGES, MERGE_STEPS,
+    MERGE_INSERT_BEANS, MERGE_FILL_BEANS, MERGE_MAP_BEANS, MERGE_LOCAL_HASHES,
+    MERGE_INSERT_SESSIONS, image_key, content_hash, page_query, fts_match_query, BEAN_SUM_FIELDS,
+    SESSION_SUM_FIELDS, BEAN_GROUPS_SQL, SESSION_GROUPS_SQL, PLANNED_QUERIES, FULL_SCAN_ALLOWED,
+    SORT_ALLOWED, FTS_TABLES, FTS_OPTIMIZE_QUERY,
+)
+from .schema import CONNECTION_PRAGMAS, CREATE_TABLES, MIGRATIONS
+from .tracing import QueryLog, TracedConnection
+
+logger = logging.getLogger(__name__)
+
+# helper for resources (works with PyInstaller)
+def resource_path(rel):
+    try:
+        base = sys._MEIPASS
+    except Exception:
+        base = os.path.abspath(".")
+    return os.path.join(base, rel)
+
+DB_FILENAME = "coffee_journal.db"
+# the directory main.py is in: the package sits next to it, in the sources and in the bundle
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def default_db_path():
+    """The journal the app opens when no other file is given; the CLI's default too."""
+    return os.path.join(APP_DIR, DB_FILENAME)
+
+def get_user_db_path(filename=DB_FILENAME):
+    # use local appdata for persistence on Windows; fallback to cwd
+    if os.name == "nt":
+        base = os.getenv("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.path.expanduser("~")
+    appdir = os.path.join(base, "CoffeeJournal")
+    os.makedirs(appdir, exist_ok=True)
+    return os.path.join(appdir, filename)
+
+def _coerce(v, default):
+    # text from CSV into the column's type; "" means "not given"
+    if isinstance(v, str) and isinstance(default, (int, float)):
+        v = v.strip()
+        if not v:
+            return default
+        return int(float(v)) if isinstance(default, int) else float(v)
+    return v
+
+
+def _insert_params(defaults, required, row) -> tuple:
+    missing = [k for k in required if row.get(k) in (None, "")]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    return tuple(d if row.get(k) is None else _coerce(row[k], d) for k, d in defaults)
+
+
+def chunked(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class StatsCache:
+    """Running counts, sums and histograms behind the statistics tab.
+
+    Filled once from a full recompute, then kept current by DatabaseManager applying
+    a delta for every row it inserts, updates or deletes.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.total_beans = 0
+        self.beans_with_images = 0
+        self.total_sessions = 0
+        self.roast_levels = Counter()
+        self.methods = Counter()
+        # field -> [sum, number of non-null values]
+        self.bean_sums = {f: [0.0, 0] for f in BEAN_SUM_FIELDS}
+        self.session_sums = {f: [0.0, 0] for f in SESSION_SUM_FIELDS}
+
+    @staticmethod
+    def _add(counter, key, n):
+        counter[key] += n
+        if counter[key] <= 0:
+            del counter[key]
+
+    def apply_bean_groups(self, groups, sign=1):
+        for key, n, with_images, *sums in groups:
+            self.total_beans += sign * n
+            self.beans_with_images += sign * with_images
+            self._add(self.roast_levels, key, sign * n)
+            for i, f in enumerate(BEAN_SUM_FIELDS):
+                acc = self.bean_sums[f]
+                acc[0] += sign * (sums[2 * i] or 0)
+                acc[1] += sign * sums[2 * i + 1]
+
+    def apply_session_groups(self, groups, sign=1):
+        for key, n, *sums in groups:
+            self.total_sessions += sign * n
+            self._add(self.methods, key, sign * n)
+            for i, f in enumerate(SESSION_SUM_FIELDS):
+                acc = self.session_sums[f]
+                acc[0] += sign * (sums[2 * i] or 0)
+                acc[1] += sign * sums[2 * i + 1]
+
+    def recompute(self, conn) -> "StatsCache":
+        self.reset()
+        self.apply_bean_groups(conn.execute(BEAN_GROUPS_SQL.format(where="")).fetchall())
+        self.apply_session_groups(conn.execute(SESSION_GROUPS_SQL.format(where="")).fetchall())
+        return self
+
+    @staticmethod
+    def _avg(acc):
+        return acc[0] / acc[1] if acc[1] else 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        by_count = lambda item: (-item[1], item[0])
+        return {
+            "total_beans": self.total_beans,
+            "beans_with_images": self.beans_with_images,
+            "avg_price": self._avg(self.bean_sums["price"]),
+            "avg_bean_rating": self._avg(self.bean_sums["rating"]),
+            "total_sessions": self.total_sessions,
+            "avg_session_rating": self._avg(self.session_sums["rating"]),
+            "avg_brew_time": self._avg(self.session_sums["brew_time"]),
+            "avg_coffee_weight": self._avg(self.session_sums["coffee_weight"]),
+            "avg_water_weight": self._avg(self.session_sums["water_weight"]),
+            "roast_levels": sorted(self.roast_levels.items(), key=by_count),
+            "top_methods": sorted(self.methods.items(), key=by_count)[:5],
+        }
+
+    def matches(self, other: "StatsCache") -> bool:
+        if (self.total_beans, self.beans_with_images, self.total_sessions, self.roast_levels, self.methods) != \
+                (other.total_beans, other.beans_with_images, other.total_sessions, other.roast_levels, other.methods):
+            return False
+        pairs = list(zip(self.bean_sums.values(), other.bean_sums.values())) + \
+            list(zip(self.session_sums.values(), other.session_sums.values()))
+        return all(a[1] == b[1] and math.isclose(a[0], b[0], rel_tol=1e-9, abs_tol=1e-6) for a, b in pairs)
+
+
+READER_POOL_SIZE = 3
+BACKUP_STEP_PAGES = 1024  # pages copied per backup step (4 MiB with the default page size)
+
+
+class BulkResult:
+    """Outcome of a bulk insert: rows inserted or upserted, and (row index, error) for each one that failed."""
+    __slots__ = ("inserted", "updated", "failed")
+
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.failed: List[Tuple[int, str]] = []
+
+    def merge(self, other, offset=0):
+        self.inserted += other.inserted
+        self.updated += other.updated
+        self.failed.extend((i + offset, e) for i, e in other.failed)
+
+    def __repr__(self):
+        return f"BulkResult(inserted={self.inserted}, updated={self.updated}, failed={len(self.failed)})"
+
+
+class ConnectionManager:
+    """One writer connection plus a pool of read-only connections over a WAL database.
+
+    In WAL mode readers keep seeing the last committed state while the writer commits, so
+    background reads (lists, search, statistics, export) neither wait for writes nor block
+    them. Writers take `write_lock`; readers borrow a connection with `with pool.reader()`.
+    """
+
+    def __init__(self, path, readers=READER_POOL_SIZE, query_log=None):
+        self.path = path
+        self.query_log = query_log or QueryLog()
+        self.writer = self._open(readonly=False)
+        self.writer.execute("PRAGMA journal_mode = WAL")
+        self.write_lock = threading.RLock()
+        self._size = readers
+        self._opened = 0
+        self._idle = []
+        self._busy = {}  # thread ident -> borrowed reader
+        self.tx_owner = None  # thread inside DatabaseManager.transaction(); its reads use the writer
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def _open(self, readonly):
+        if readonly:
+            uri = f"{Path(os.path.abspath(self.path)).as_uri()}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=None,
+                                   factory=TracedConnection)
+        else:
+            conn = sqlite3.connect(self.path, check_same_thread=False, factory=TracedConnection)
+        conn.query_log = self.query_log
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def reader(self):
+        ident = threading.get_ident()
+        if self.tx_owner == ident:  # see our own uncommitted rows
+            yield self.writer
+            return
+        conn = self._busy.get(ident)
+        if conn is not None:  # nested read on the same thread
+            yield conn
+            return
+        with self._cond:
+            while not self._idle and self._opened >= self._size:
+                self._cond.wait()
+            if self._idle:
+                conn = self._idle.pop()
+            else:
+                self._opened += 1
+        if conn is None:
+            conn = self._open(readonly=True)
+        self._busy[ident] = conn
+        try:
+            yield conn
+        finally:
+            del self._busy[ident]
+            if conn.in_transaction:
+                conn.rollback()
+            with self._cond:
+                if self._closed:
+                    conn.close()
+                else:
+                    self._idle.append(conn)
+                self._cond.notify()
+
+    def interrupt(self, ident):
+        """Abort the statement running on thread `ident`: on the reader it borrowed, or on the
+        writer while that thread is inside a transaction (a merge or a bulk import)."""
+        conn = self.writer if self.tx_owner == ident else self._busy.get(ident)
+        if conn is not None:
+            conn.interrupt()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            for conn in self._idle:
+                conn.close()
+            self._idle = []
+        with self.write_lock:
+            self.writer.close()
+
+
+def _writes(method):
+    """Serialize a DatabaseManager write on the pool's single writer connection."""
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.pool.write_lock:
+            return method(self, *args, **kwargs)
+    return locked
+
+
+class DatabaseManager:
+    def __init__(self, db_path: Optional[str] = None, query_log: Optional[QueryLog] = None):
+        self.template_db = resource_path(os.path.join("ui", "db_template.sqlite"))  # optional template
+        self.db_path = db_path or default_db_path()
+        # if db not exists and template shipped — copy it
+        if not os.path.exists(self.db_path) and os.path.exists(self.template_db):
+            try:
+                import shutil
+                shutil.copyfile(self.template_db, self.db_path)
+            except Exception:
+                pass
+        self.pool = ConnectionManager(self.db_path, query_log=query_log)
+        # per-statement timings of every connection; collected once query_log.enabled is set
+        self.query_log = self.pool.query_log
+        self.conn = self.pool.writer  # schema, migrations and writes; reads go through the pool
+        self._create_tables()
+        self._migrate()
+        self.has_fts = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'beans_fts'").fetchone() is not None
+        self._stats: Optional[StatsCache] = None  # built on first use
+        self._tx_depth = 0
+
+    def close(self):
+        self.pool.close()
+
+    def backup_to(self, path, pages=BACKUP_STEP_PAGES, progress=None):
+        """Copy the whole database into `path` with the SQLite online backup API.
+
+        Copies `pages` pages per step and calls progress(pages_done, pages_total) after each;
+        the callback may raise to abort, and the partial copy is then removed.
+        """
+        report = (lambda status, remaining, total: progress(total - remaining, total)) if progress else None
+        dest = sqlite3.connect(path)
+        try:
+            with self.pool.reader() as conn:
+                # one read snapshot for all steps, or every commit in between restarts the copy
+                conn.execute("BEGIN")
+                conn.execute("SELECT 1 FROM sqlite_master LIMIT 1")
+                conn.backup(dest, pages=pages, progress=report)
+        except BaseException:
+            dest.close()
+            os.remove(path)
+            raise
+        dest.close()
+
+    def _file_size(self) -> int:
+        return sum(os.path.getsize(p) for p in (self.db_path, self.db_path + "-wal") if os.path.exists(p))
+
+    @_writes
+    def vacuum(self) -> Dict[str, int]:
+        """Drop photos no bean uses, compact the search indexes, rebuild the file without its
+        free pages and refresh the planner statistics. Returns the sizes before and after."""
+        before = self._file_size()
+        with self.transaction():
+            images = self.conn.execute(IMAGE_GC_QUERY).rowcount
+            if self.has_fts:
+                for table in FTS_TABLES:
+                    self.conn.execute(FTS_OPTIMIZE_QUERY.format(table=table))
+        self.conn.execute("VACUUM")  # not allowed inside a transaction
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.conn.execute("PRAGMA optimize")
+        return {"images_removed": images, "bytes_before": before, "bytes_after": self._file_size()}
+
+    def _create_tables(self):
+        for sql in CREATE_TABLES:
+            self.conn.execute(sql)
+        self.conn.commit()
+
+    def _migrate(self):
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        for target, steps in MIGRATIONS:
+            if version >= target:
+                continue
+            try:
+                self.conn.execute("BEGIN")
+                for step in steps:
+                    step(self.conn) if callable(step) else self.conn.execute(step)
+                self.conn.execute(f"PRAGMA user_version = {target}")
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+            version = target
+
+    def schema_version(self) -> int:
+        return self.conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def explain(self, sql, params=()) -> List[str]:
+        return [r[3] for r in self.conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+
+    def check_query_plans(self) -> List[Tuple[str, str]]:
+        """Return (label, plan step) for every registered query that walks a table or an index
+        from end to end (any SCAN, indexed or not) or sorts through a temp b-tree, unless it is
+        allow-listed. Empty list means all access paths are searches."""
+        problems = []
+        for label, sql, params in PLANNED_QUERIES:
+            if "_fts" in sql and not self.has_fts:
+                continue
+            plan = self.explain(sql, params)
+            # scans of CTEs / subqueries only walk already-filtered rows
+            derived = {d.split()[1] for d in plan if d.startswith(("MATERIALIZE ", "CO-ROUTINE "))}
+            for detail in plan:
+                full_scan = (detail.startswith("SCAN ") and "VIRTUAL TABLE" not in detail
+                             and detail.split()[1] not in derived | {"CONSTANT"})
+                sort = detail.startswith("USE TEMP B-TREE FOR") and detail.endswith("ORDER BY")
+                if (full_scan and label not in FULL_SCAN_ALLOWED) or (sort and label not in SORT_ALLOWED):
+                    problems.append((label, detail))
+        return problems
+
+    @contextmanager
+    def transaction(self):
+        """Run the writes inside the block as one transaction (one commit, one fsync).
+
+        Nested blocks join the outer one. On an exception everything is rolled back and the
+        statistics cache, which already took the deltas, is rebuilt.
+        """
+        with self.pool.write_lock:
+            if self._tx_depth:
+                self._tx_depth += 1
+                try:
+                    yield self
+                finally:
+                    self._tx_depth -= 1
+                return
+            self._tx_depth = 1
+            self.pool.tx_owner = threading.get_ident()
+            try:
+                self.conn.execute("BEGIN")
+                yield self
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                if self._stats is not None:
+                    self._stats = None
+                    self._stats = self.recompute_stats()
+                raise
+            finally:
+                self._tx_depth = 0
+                self.pool.tx_owner = None
+
+    def _insert_bulk(self, sql, defaults, required, rows, chunk_size, prepare=None,
+                     key=None, update=None) -> BulkResult:
+        # upsert: update(params) -> True when it changed an existing row instead; rows of the
+        # same chunk that share key(params) collapse into the last one before executemany
+        result = BulkResult()
+        with self.transaction():
+            for chunk in chunked(enumerate(rows), chunk_size):
+                params = []
+                pending = {}
+                for i, row in chunk:
+                    try:
+                        p = _insert_params(defaults, required, prepare(row) if prepare else row)
+                        if update is None:
+                            params.append((i, p))
+                        elif key(p) in pending:
+                            params[pending[key(p)]] = (i, p)
+                            result.updated += 1
+                        elif update(p):
+                            result.updated += 1
+                        else:
+                            pending[key(p)] = len(params)
+                            params.append((i, p))
+                    except (ValueError, TypeError, AttributeError, sqlite3.Error) as e:
+                        result.failed.append((i, str(e)))
+                self.conn.execute("SAVEPOINT bulk_chunk")
+                try:
+                    self.conn.executemany(sql, (p for _, p in params))
+                    result.inserted += len(params)
+                except sqlite3.Error:
+                    # some row was rejected: redo the chunk row by row to find out which
+                    self.conn.execute("ROLLBACK TO bulk_chunk")
+                    for i, p in params:
+                        try:
+                            self.conn.execute(sql, p)
+                            result.inserted += 1
+                        except sqlite3.Error as e:
+                            result.failed.append((i, str(e)))
+                self.conn.execute("RELEASE bulk_chunk")
+        result.failed.sort()
+        return result
+
+    def _max_id(self, table) -> int:
+        return self.conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+
+    @_writes
+    def add_coffee_beans_bulk(self, rows, chunk_size=BULK_CHUNK_SIZE, upsert=False) -> BulkResult:
+        """Insert beans from an iterable of dicts (add_coffee_bean's keyword names, plus an
+        optional created_at) in one transaction. Rows are consumed lazily in chunks.
+
+        With upsert=True a row whose name + roaster match an existing bean updates it instead.
+        """
+        def prepare(row):
+            # encoded bytes (file imports) are stored as they are; thumbnails follow on first view
+            img = row.get("image")
+            if img:
+                img, thumbs = (bytes(img), {}) if isinstance(img, (bytes, bytearray, memoryview)) else self._prepare_image(img)
+                row = dict(row, image_hash=self._put_image(img, thumbs))
+            return row
+
+        def update(p):
+            r = self.conn.execute(BEAN_BY_NATURAL_KEY_QUERY, (p[0], p[1])).fetchone()
+            if r is None:
+                return False
+            # created_at stays; the image only changes if the row brings one
+            cols = [k for k, _ in BEAN_INSERT_DEFAULTS[2:-1] if k != "image_hash" or p[-2] is not None]
+            vals = [v for (k, _), v in zip(BEAN_INSERT_DEFAULTS, p) if k in cols]
+            self.conn.execute(f"UPDATE coffee_beans SET {', '.join(f'{k} = ?' for k in cols)} WHERE id = ?",
+                              (*vals, r[0]))
+            return True
+
+        last = self._max_id("coffee_beans")
+        with self.transaction():
+            result = self._insert_bulk(BEAN_INSERT_QUERY, BEAN_INSERT_DEFAULTS, BEAN_REQUIRED, rows, chunk_size,
+                                       prepare, *((lambda p: (p[0], p[1] or ""), update) if upsert else ()))
+            # photos of rejected rows and the ones replaced by upserts
+            self.conn.execute(IMAGE_GC_QUERY)
+            if self._stats is not None:
+                if result.updated:
+                    self._stats = self.recompute_stats()
+                else:
+                    self._stats.apply_bean_groups(self._bean_groups("WHERE id > ?", (last,)), 1)
+        return result
+
+    def find_coffee_bean_id(self, name, roaster="") -> Optional[int]:
+        with self.pool.reader() as conn:
+            r = conn.execute(BEAN_BY_NATURAL_KEY_QUERY, (name, roaster)).fetchone()
+        return r[0] if r else None
+
+    def iter_export_rows(self, table):
+        """Yield dicts of BEAN_EXPORT_FIELDS / SESSION_EXPORT_FIELDS ("beans" or "sessions")
+        straight off a cursor, so exports run in constant memory."""
+        sql, fields = {"beans": (BEANS_EXPORT_QUERY, BEAN_EXPORT_FIELDS),
+                       "sessions": (SESSIONS_EXPORT_QUERY, SESSION_EXPORT_FIELDS)}[table]
+        with self.pool.reader() as conn:
+            for row in conn.execute(sql):
+                yield dict(zip(fields, row))
+
+    @_writes
+    def merge_from(self, path) -> Dict[str, int]:
+        """Merge another journal file into this one in a single transaction.
+
+        Beans missing here (by name + roaster) are added, and matched beans only get their
+        empty fields filled, so local edits survive. Sessions are remapped to the local bean
+        ids and added unless one with the same content already exists. Returns counts.
+        """
+        if not os.path.isfile(path):  # ATTACH would create an empty file
+            raise FileNotFoundError(path)
+        self.conn.create_function("content_hash", -1, content_hash, deterministic=True)
+        self.conn.create_function("image_key", 1, image_key, deterministic=True)
+        # ATTACH is not allowed inside a transaction
+        self.conn.execute("ATTACH DATABASE ? AS src", (path,))
+        try:
+            tables = {r[0] for r in self.conn.execute("SELECT name FROM src.sqlite_master WHERE type = 'table'")}
+            if not {"coffee_beans", "brewing_sessions"} <= tables:
+                raise ValueError(f"not a coffee journal: {path}")
+            image = "image_hash" if "images" in tables else "image_key(image)"
+            with self.transaction():
+                for sql in MERGE_STEPS:
+                    self.conn.execute(sql)
+                try:
+                    self.conn.execute(MERGE_IMAGES[image])
+                    counts = {"beans_added": self.conn.execute(MERGE_INSERT_BEANS.format(image=image)).rowcount,
+                              "beans_updated": self.conn.execute(MERGE_FILL_BEANS.format(image=image)).rowcount}
+                    self.conn.execute(IMAGE_GC_QUERY)  # source photos no bean took
+                    self.conn.execute(MERGE_MAP_BEANS)
+                    self.conn.execute(MERGE_LOCAL_HASHES)
+                    counts["sessions_added"] = self.conn.execute(MERGE_INSERT_SESSIONS).rowcount
+                    total = self.conn.execute("SELECT COUNT(*) FROM src.brewing_sessions").fetchone()[0]
+                    counts["sessions_skipped"] = total - counts["sessions_added"]
+                finally:
+                    self.conn.execute("DROP TABLE temp.merge_bean_map")
+                    self.conn.execute("DROP TABLE temp.merge_hashes")
+                if self._stats is not None:
+                    self._stats = self.recompute_stats()
+        finally:
+            self.conn.execute("DETACH DATABASE src")
+        return counts
+
+    def count_rows(self, table) -> int:
+        name = {"beans": "coffee_beans", "sessions": "brewing_sessions"}[table]
+        with self.pool.reader() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+
+    @_writes
+    def add_brewing_sessions_bulk(self, rows, chunk_size=BULK_CHUNK_SIZE) -> BulkResult:
+        """Insert sessions from an iterable of dicts (add_brewing_session's keyword names, plus
+        an optional created_at) in one transaction. Rows are consumed lazily in chunks."""
+        last = self._max_id("brewing_sessions")
+        with self.transaction():
+            result = self._insert_bulk(SESSION_INSERT_QUERY, SESSION_INSERT_DEFAULTS, SESSION_REQUIRED, rows, chunk_size)
+            new = self._session_groups("WHERE id > ?", (last,))
+            if new is not None:
+                self._stats.apply_session_groups(new, 1)
+        return result
+
+    def _prepare_image(self, image):
+        """(original, {size: thumbnail}) for a file path or encoded bytes; the original is
+        downscaled and re-encoded by the images pipeline. None gives (None, {})."""
+        if not image:
+            return None, {}
+        from . import images  # Pillow loads with the first photo, not at startup
+        return images.process_image(image)
+
+    def _put_image(self, data, thumbs) -> Optional[str]:
+        """Store an encoded photo and its thumbnails; returns the key for coffee_beans.image_hash
+        (None for no photo). A photo that is already stored is shared, not copied."""
+        if not data:
+            return None
+        key = image_key(data)
+        self.conn.execute(IMAGE_PUT_QUERY, (key, data))
+        self.conn.executemany(THUMBNAIL_PUT_QUERY, [(key, size, t) for size, t in thumbs.items()])
+        return key
+
+    def _release_image(self, key):
+        if key:
+            self.conn.execute(IMAGE_RELEASE_QUERY, (key, key))
+
+    @_writes
+    def add_coffee_bean(self, name, roaster="", roast_level="Medium", origin="", processing_method="",
+                        tasting_notes="", rating=0.0, price=0.0, purchase_date="", image=None) -> Optional[Dict[str, Any]]:
+        """Insert a bean; returns its list row, or None if the insert failed.
+        `image` may be a file path or encoded bytes."""
+        try:
+            img, thumbs = self._prepare_image(image)
+            with self.transaction():
+                c = self.conn.cursor()
+                c.execute(BEAN_INSERT_QUERY, (name, roaster, roast_level, origin, processing_method, tasting_notes,
+                                              rating, price, purchase_date, self._put_image(img, thumbs), None))
+            new = self._bean_groups("WHERE id = ?", (c.lastrowid,))
+            if new is not None:
+                self._stats.apply_bean_groups(new, 1)
+            return self.get_coffee_bean(c.lastrowid)
+        except Exception as e:
+            logger.warning("add_coffee_bean failed: %s", e)
+            return None
+
+    def _fetch_dicts(self, sql, params=()) -> List[Dict[str, Any]]:
+        with self.pool.reader() as conn:
+            c = conn.execute(sql, params)
+            cols = [d[0] for d in c.description]
+            return [dict(zip(cols, row)) for row in c.fetchall()]
+
+    def get_all_coffee_beans(self) -> List[Dict[str, Any]]:
+        return self._fetch_dicts(BEANS_LIST_QUERY)
+
+    def _fetch_page(self, base, sort_sql, id_sql, after, limit, sort_key, descending):
+        sql = page_query(base, sort_sql[sort_key], id_sql, descending, after is not None)
+        with self.pool.reader() as conn:
+            raw = conn.execute(sql, (*after, limit) if after is not None else (limit,)).fetchall()
+        if not raw:
+            return raw, after
+        # the trailing sort_key column only feeds the cursor
+        return [r[:-1] for r in raw], (raw[-1][-1], raw[-1][0])
+
+    def get_coffee_beans_page(self, after=None, limit=200, sort_key="created_at", descending=True):
+        """One page of row tuples (BEAN_ROW_FIELDS order) sorted by sort_key, and the cursor
+        to pass as `after` for the next page."""
+        return self._fetch_page(BEANS_PAGE_BASE, BEAN_SORT_SQL, "cb.id", after, limit, sort_key, descending)
+
+    def get_coffee_bean(self, bean_id) -> Optional[Dict[str, Any]]:
+        rows = self._fetch_dicts(BEAN_BY_ID_QUERY, (bean_id,))
+        return rows[0] if rows else None
+
+    def get_coffee_bean_choices(self) -> List[Dict[str, Any]]:
+        # id + name only, for combo boxes
+        return self._fetch_dicts(BEAN_CHOICES_QUERY)
+
+    def get_bean_image(self, bean_id) -> Optional[bytes]:
+        with self.pool.reader() as conn:
+            r = conn.execute(BEAN_IMAGE_QUERY, (bean_id,)).fetchone()
+        return r[0] if r else None
+
+    def get_bean_image_key(self, bean_id) -> Optional[str]:
+        """Hash of the bean's photo in the image store, None if it has none."""
+        with self.pool.reader() as conn:
+            r = conn.execute(BEAN_IMAGE_KEY_QUERY, (bean_id,)).fetchone()
+        return r[0] if r else None
+
+    def get_bean_thumbnail(self, bean_id, size) -> Optional[bytes]:
+        """The bean's photo at one of images.THUMB_SIZES. Photos stored before thumbnails
+        existed (or imported from files) get theirs rendered and saved on first request."""
+        with self.pool.reader() as conn:
+            r = conn.execute(BEAN_THUMBNAIL_QUERY, (bean_id, size)).fetchone()
+            if r:
+                return r[0]
+            r = conn.execute(BEAN_IMAGE_QUERY, (bean_id,)).fetchone()
+        if not r:
+            return None
+        original, key = r
+        from . import images
+        try:
+            thumbs = images.make_thumbnails(original)
+        except OSError as e:
+            logger.warning("bean %s: image could not be decoded: %s", bean_id, e)
+            return None
+        try:
+            with self.transaction():
+                self.conn.executemany(THUMBNAIL_PUT_QUERY, [(key, s, t) for s, t in thumbs.items()])
+        except sqlite3.Error as e:
+            logger.warning("bean %s: thumbnails not saved: %s", bean_id, e)
+        return thumbs.get(size)
+
+    @_writes
+    def update_coffee_bean(self, bean_id, **kwargs) -> Optional[Dict[str, Any]]:
+        """Update the given columns; returns the bean's list row afterwards, or None on failure.
+        A given `image` (file path, bytes or None to remove it) replaces the photo; the
+        old one leaves the image store unless another bean shares it."""
+        if not kwargs:
+            return self.get_coffee_bean(bean_id)
+        fields = []
+        vals = []
+        image = None
+        try:
+            for k, v in kwargs.items():
+                if k == "image":
+                    k, image = "image_hash", self._prepare_image(v)
+                fields.append(f"{k} = ?")
+                vals.append(v)
+            vals.append(bean_id)
+            old = self._bean_groups("WHERE id = ?", (bean_id,))
+            with self.transaction():
+                if image is not None:
+                    prev = self.conn.execute(BEAN_IMAGE_KEY_QUERY, (bean_id,)).fetchone()
+                    vals[fields.index("image_hash = ?")] = self._put_image(*image)
+                self.conn.cursor().execute(f"UPDATE coffee_beans SET {', '.join(fields)} WHERE id = ?", vals)
+                if image is not None and prev:
+                    self._release_image(prev[0])
+            if old is not None:
+                self._stats.apply_bean_groups(old, -1)
+                self._stats.apply_bean_groups(self._bean_groups("WHERE id = ?", (bean_id,)), 1)
+            return self.get_coffee_bean(bean_id)
+        except Exception as e:
+            logger.warning("update_coffee_bean failed: %s", e)
+            return None
+
+    @_writes
+    def delete_coffee_bean(self, bean_id) -> Optional[Dict[str, Any]]:
+        """Delete a bean and (by cascade) its sessions; returns the deleted list row or None."""
+        try:
+            row = self.get_coffee_bean(bean_id)
+            old = self._bean_groups("WHERE id = ?", (bean_id,))
+            # sessions removed by ON DELETE CASCADE leave the cache too
+            old_sessions = self._session_groups("WHERE coffee_bean_id = ?", (bean_id,))
+            with self.transaction():
+                prev = self.conn.execute(BEAN_IMAGE_KEY_QUERY, (bean_id,)).fetchone()
+                c = self.conn.cursor()
+                c.execute('DELETE FROM coffee_beans WHERE id = ?', (bean_id,))
+                if prev:
+                    self._release_image(prev[0])
+            if old is not None:
+                self._stats.apply_bean_groups(old, -1)
+                self._stats.apply_session_groups(old_sessions, -1)
+            return row if c.rowcount > 0 else None
+        except Exception as e:
+            logger.warning("delete_coffee_bean failed: %s", e)
+            return None
+
+    def search_coffee_beans(self, q: str, limit=-1):
+        """Ranked prefix search over name, roaster, origin and tasting notes; the best `limit`
+        matches (all of them for a negative limit)."""
+        if self.has_fts:
+            match = fts_match_query(q)
+            return self._fetch_dicts(BEANS_SEARCH_QUERY, (match, limit)) if match else []
+        pat = f"%{q}%"
+        return self._fetch_dicts(BEANS_SEARCH_LIKE_QUERY, (pat, pat, pat, pat, limit))
+
+    def get_coffee_with_images_count(self):
+        return self.stats.beans_with_images
+
+    # brewing sessions
+    @_writes
+    def add_brewing_session(self, coffee_bean_id, brew_method, grind_size="", water_temp=0, brew_time=0,
+                            coffee_weight=0.0, water_weight=0.0, rating=0.0, notes="") -> Optional[Dict[str, Any]]:
+        try:
+            with self.transaction():
+                c = self.conn.cursor()
+                c.execute(SESSION_INSERT_QUERY, (coffee_bean_id, brew_method, grind_size, water_temp, brew_time,
+                                                 coffee_weight, water_weight, rating, notes, None))
+            new = self._session_groups("WHERE id = ?", (c.lastrowid,))
+            if new is not None:
+                self._stats.apply_session_groups(new, 1)
+            return self.get_brewing_session(c.lastrowid)
+        except Exception as e:
+            logger.warning("add_brewing_session failed: %s", e)
+            return None
+
+    def get_all_brewing_sessions(self):
+        return self._fetch_dicts(SESSIONS_LIST_QUERY)
+
+    def get_brewing_session(self, session_id) -> Optional[Dict[str, Any]]:
+        rows = self._fetch_dicts(SESSION_BY_ID_QUERY, (session_id,))
+        return rows[0] if rows else None
+
+    def get_brewing_sessions_page(self, after=None, limit=200, sort_key="created_at", descending=True):
+        return self._fetch_page(sessions_page_base(sort_key), SESSION_SORT_SQL, "bs.id", after, limit, sort_key,
+                                descending)
+
+    @_writes
+    def update_brewing_session(self, session_id, **kwargs) -> Optional[Dict[str, Any]]:
+        if not kwargs:
+            return self.get_brewing_session(session_id)
+        fields = []; vals = []
+        for k, v in kwargs.items():
+            fields.append(f"{k} = ?"); vals.append(v)
+        vals.append(session_id)
+        try:
+            old = self._session_groups("WHERE id = ?", (session_id,))
+            with self.transaction():
+                self.conn.cursor().execute(f"UPDATE brewing_sessions SET {', '.join(fields)} WHERE id = ?", vals)
+            if old is not None:
+                self._stats.apply_session_groups(old, -1)
+                self._stats.apply_session_groups(self._session_groups("WHERE id = ?", (session_id,)), 1)
+            return self.get_brewing_session(session_id)
+        except Exception as e:
+            logger.warning("update_brewing_session failed: %s", e)
+            return None
+
+    @_writes
+    def delete_brewing_session(self, session_id) -> Optional[Dict[str, Any]]:
+        try:
+            row = self.get_brewing_session(session_id)
+            old = self._session_groups("WHERE id = ?", (session_id,))
+            with self.transaction():
+                c = self.conn.cursor()
+                c.execute('DELETE FROM brewing_sessions WHERE id = ?', (session_id,))
+            if old is not None:
+                self._stats.apply_session_groups(old, -1)
+            return row if c.rowcount > 0 else None
+        except Exception as e:
+            logger.warning("delete_brewing_session failed: %s", e)
+            return None
+
+    def search_brewing_sessions(self, q: str, limit=-1):
+        """Ranked prefix search over method, notes and the bean name; limit as for search_coffee_beans."""
+        if self.has_fts:
+            match = fts_match_query(q)
+            if not match:
+                return []
+            return self._fetch_dicts(SESSIONS_SEARCH_QUERY, (match, fts_match_query(q, ("name",)), limit))
+        pat = f"%{q}%"
+        return self._fetch_dicts(SESSIONS_SEARCH_LIKE_QUERY, (pat, pat, pat, limit))
+
+    # ---------- statistics cache ----------
+    @property
+    def stats(self) -> StatsCache:
+        if self._stats is None:
+            self._stats = self.recompute_stats()
+        return self._stats
+
+    @property
+    def stats_ready(self) -> bool:
+        return self._stats is not None
+
+    def reconcile_stats(self, fresh, changes) -> Optional[bool]:
+        """Check the cache against `fresh`, a full recompute, and replace it; False if it had drifted.
+
+        `fresh` is recomputed elsewhere (the background connection); it is only trusted if the
+        writer connection has written nothing since its total_changes was `changes`. A stale
+        recompute is dropped and None returned: the caller recomputes again, off this thread.
+        """
+        if changes != self.conn.total_changes:
+            return None
+        ok = self._stats is None or self._stats.matches(fresh)
+        if not ok:
+            logger.warning("statistics cache drifted from the database, rebuilt")
+        self._stats = fresh
+        return ok
+
+    def _bean_groups(self, where, params):
+        # None while the cache is not built yet: nothing to keep in step
+        if self._stats is None:
+            return None
+        return self.conn.execute(BEAN_GROUPS_SQL.format(where=where), params).fetchall()
+
+    def _session_groups(self, where, params):
+        if self._stats is None:
+            return None
+        return self.conn.execute(SESSION_GROUPS_SQL.format(where=where), params).fetchall()
+
+    def recompute_stats(self) -> StatsCache:
+        """A fresh cache read through the pool, without touching the one in use."""
+        with self.pool.reader() as conn:
+            if conn.in_transaction:  # the writer, inside transaction()
+                return StatsCache().recompute(conn)
+            conn.execute("BEGIN")  # both aggregates from one snapshot
+            try:
+                return StatsCache().recompute(conn)
+            finally:
+                conn.rollback()
+
+    def get_detailed_statistics(self) -> Dict[str, Any]:
+        """All numbers for the statistics tab, recomputed by SQLite (no rows are loaded)."""
+        return self.recompute_stats().snapshot()
@@ -0,0 +1,291 @@
+# coffeejournal/queries.py
+"""Every SQL statement the journal runs, built once at import.
+
+List queries use explicit projections (never the photo bytes), pages are keyset-paged on
+(sort key, id), and PLANNED_QUERIES lists them with sample parameters for
+DatabaseManager.check_query_plans() (tests/test_query_plans.py runs it).
+"""
+import re
+import hashlib
+from typing import Optional
+
+
+# explicit projections: list queries never touch the image BLOB
+BEAN_LIST_COLUMNS = ("id", "name", "roaster", "roast_level", "origin", "processing_method",
+                     "tasting_notes", "rating", "price", "purchase_date", "created_at")
+BEAN_LIST_SQL = ", ".join(f"cb.{c}" for c in BEAN_LIST_COLUMNS) + ", cb.image_hash IS NOT NULL AS has_image"
+BEAN_ROW_FIELDS = BEAN_LIST_COLUMNS + ("has_image",)
+
+SESSION_LIST_COLUMNS = ("id", "coffee_bean_id", "brew_method", "grind_size", "water_temp", "brew_time",
+                        "coffee_weight", "water_weight", "rating", "notes", "created_at")
+SESSION_LIST_SQL = ", ".join(f"bs.{c}" for c in SESSION_LIST_COLUMNS) + ", cb.name AS coffee_name"
+SESSION_ROW_FIELDS = SESSION_LIST_COLUMNS + ("coffee_name",)
+
+BEANS_LIST_QUERY = f"SELECT {BEAN_LIST_SQL} FROM coffee_beans cb ORDER BY cb.created_at DESC, cb.id DESC"
+BEAN_BY_ID_QUERY = f"SELECT {BEAN_LIST_SQL} FROM coffee_beans cb WHERE cb.id = ?"
+SESSION_BY_ID_QUERY = (f"SELECT {SESSION_LIST_SQL} FROM brewing_sessions bs "
+                       "JOIN coffee_beans cb ON bs.coffee_bean_id = cb.id WHERE bs.id = ?")
+BEAN_CHOICES_QUERY = "SELECT id, name FROM coffee_beans ORDER BY created_at DESC, id DESC"
+BEAN_IMAGE_QUERY = "SELECT i.data, i.hash FROM coffee_beans cb JOIN images i ON i.hash = cb.image_hash WHERE cb.id = ?"
+BEAN_THUMBNAIL_QUERY = ("SELECT t.data FROM coffee_beans cb JOIN image_thumbnails t ON t.hash = cb.image_hash "
+                        "WHERE cb.id = ? AND t.size = ?")
+BEAN_IMAGE_KEY_QUERY = "SELECT image_hash FROM coffee_beans WHERE id = ?"
+BEANS_SEARCH_LIKE_QUERY = (f"SELECT {BEAN_LIST_SQL} FROM coffee_beans cb "
+                      "WHERE cb.name LIKE ? OR cb.roaster LIKE ? OR cb.origin LIKE ? OR cb.tasting_notes LIKE ? "
+                      "ORDER BY cb.created_at DESC, cb.id DESC LIMIT ?")
+SESSIONS_LIST_QUERY = (f"SELECT {SESSION_LIST_SQL} FROM brewing_sessions bs "
+                       "JOIN coffee_beans cb ON bs.coffee_bean_id = cb.id ORDER BY bs.created_at DESC, bs.id DESC")
+SESSIONS_SEARCH_LIKE_QUERY = (f"SELECT {SESSION_LIST_SQL} FROM brewing_sessions bs "
+                         "JOIN coffee_beans cb ON bs.coffee_bean_id = cb.id "
+                         "WHERE cb.name LIKE ? OR bs.brew_method LIKE ? OR bs.notes LIKE ? ORDER BY bs.created_at DESC, bs.id DESC "
+                         "LIMIT ?")
+
+# full-text search: external-content FTS5 tables over the searchable text columns
+BEAN_FTS_COLUMNS = ("name", "roaster", "origin", "tasting_notes")
+SESSION_FTS_COLUMNS = ("brew_method", "notes")
+BEANS_SEARCH_QUERY = (f"SELECT {BEAN_LIST_SQL} FROM beans_fts f JOIN coffee_beans cb ON cb.id = f.rowid "
+                      "WHERE beans_fts MATCH ? ORDER BY f.rank LIMIT ?")
+# a session matches on its own text or on the name of its bean
+SESSIONS_SEARCH_QUERY = f'''
+    WITH hits(id, score) AS (
+        SELECT rowid, rank FROM sessions_fts WHERE sessions_fts MATCH ?
+        UNION ALL
+        SELECT bs.id, f.rank FROM beans_fts f JOIN brewing_sessions bs ON bs.coffee_bean_id = f.rowid
+        WHERE beans_fts MATCH ?
+    )
+    SELECT {SESSION_LIST_SQL} FROM (SELECT id, MIN(score) AS score FROM hits GROUP BY id) h
+    JOIN brewing_sessions bs ON bs.id = h.id JOIN coffee_beans cb ON cb.id = bs.coffee_bean_id
+    ORDER BY h.score, bs.created_at DESC, bs.id DESC LIMIT ?
+'''
+
+# keyset paging: sort key name -> SQL expression (NULLs folded so row-value comparison works)
+BEAN_SORT_SQL = {
+    "id": "cb.id", "created_at": "cb.created_at", "name": "cb.name",
+    "roaster": "IFNULL(cb.roaster, '')", "roast_level": "IFNULL(cb.roast_level, '')",
+    "origin": "IFNULL(cb.origin, '')", "rating": "IFNULL(cb.rating, 0)",
+}
+SESSION_SORT_SQL = {
+    "id": "bs.id", "created_at": "bs.created_at", "coffee_name": "cb.name", "brew_method": "bs.brew_method",
+    "water_temp": "IFNULL(bs.water_temp, 0)", "brew_time": "IFNULL(bs.brew_time, 0)", "rating": "IFNULL(bs.rating, 0)",
+}
+BEANS_PAGE_BASE = f"SELECT {BEAN_LIST_SQL}, {{key}} AS sort_key FROM coffee_beans cb"
+SESSIONS_PAGE_BASE = (f"SELECT {SESSION_LIST_SQL}, {{key}} AS sort_key FROM brewing_sessions bs "
+                      "JOIN coffee_beans cb ON bs.coffee_bean_id = cb.id")
+# sorted by bean name the beans drive the join (CROSS JOIN fixes the order whatever the
+# statistics say): idx_beans_name in order, then the sessions of each bean
+SESSIONS_BY_NAME_PAGE_BASE = (f"SELECT {SESSION_LIST_SQL}, {{key}} AS sort_key FROM coffee_beans cb "
+                              "CROSS JOIN brewing_sessions bs ON bs.coffee_bean_id = cb.id")
+
+
+def sessions_page_base(sort_key: str) -> str:
+    return SESSIONS_BY_NAME_PAGE_BASE if sort_key == "coffee_name" else SESSIONS_PAGE_BASE
+
+
+# bulk and single-row inserts share one statement; created_at may be given (historical rows)
+BEAN_INSERT_DEFAULTS = (("name", None), ("roaster", ""), ("roast_level", "Medium"), ("origin", ""),
+                        ("processing_method", ""), ("tasting_notes", ""), ("rating", 0.0), ("price", 0.0),
+                        ("purchase_date", ""), ("image_hash", None), ("created_at", None))
+SESSION_INSERT_DEFAULTS = (("coffee_bean_id", None), ("brew_method", None), ("grind_size", ""), ("water_temp", 0),
+                           ("brew_time", 0), ("coffee_weight", 0.0), ("water_weight", 0.0), ("rating", 0.0),
+                           ("notes", ""), ("created_at", None))
+BEAN_REQUIRED = ("name",)
+SESSION_REQUIRED = ("coffee_bean_id", "brew_method")
+
+
+def _insert_sql(table, defaults):
+    cols = [k for k, _ in defaults]
+    values = ["?"] * (len(cols) - 1) + ["COALESCE(?, CURRENT_TIMESTAMP)"]
+    return f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join(values)})"
+
+
+BEAN_INSERT_QUERY = _insert_sql("coffee_beans", BEAN_INSERT_DEFAULTS)
+SESSION_INSERT_QUERY = _insert_sql("brewing_sessions", SESSION_INSERT_DEFAULTS)
+BULK_CHUNK_SIZE = 500
+
+# content-addressed photo store: a bean row keeps image_key() of its photo, identical photos
+# share one row, and a photo (with its thumbnails, by cascade) goes once no bean points at it
+IMAGE_PUT_QUERY = "INSERT OR IGNORE INTO images (hash, data) VALUES (?, ?)"
+THUMBNAIL_PUT_QUERY = "INSERT OR IGNORE INTO image_thumbnails (hash, size, data) VALUES (?, ?, ?)"
+IMAGE_RELEASE_QUERY = "DELETE FROM images WHERE hash = ? AND NOT EXISTS (SELECT 1 FROM coffee_beans WHERE image_hash = ?)"
+IMAGE_GC_QUERY = "DELETE FROM images WHERE NOT EXISTS (SELECT 1 FROM coffee_beans WHERE image_hash = images.hash)"
+FTS_TABLES = ("beans_fts", "sessions_fts")
+FTS_OPTIMIZE_QUERY = "INSERT INTO {table}({table}) VALUES ('optimize')"  # merges the index b-trees
+
+# file exchange (CSV / JSON Lines): beans are matched across machines by name + roaster,
+# sessions carry their bean's natural key instead of a machine-local id; photos travel as bytes
+BEAN_EXPORT_FIELDS = tuple("image" if k == "image_hash" else k for k, _ in BEAN_INSERT_DEFAULTS)
+SESSION_EXPORT_FIELDS = ("bean_name", "bean_roaster") + tuple(k for k, _ in SESSION_INSERT_DEFAULTS[1:])
+BEANS_EXPORT_QUERY = ("SELECT " + ", ".join("i.data" if k == "image" else f"cb.{k}" for k in BEAN_EXPORT_FIELDS)
+                      + " FROM coffee_beans cb LEFT JOIN images i ON i.hash = cb.image_hash ORDER BY cb.id")
+SESSIONS_EXPORT_QUERY = (f"SELECT cb.name AS bean_name, cb.roaster AS bean_roaster, "
+                         f"{', '.join('bs.' + k for k in SESSION_EXPORT_FIELDS[2:])} "
+                         f"FROM brewing_sessions bs JOIN coffee_beans cb ON cb.id = bs.coffee_bean_id ORDER BY bs.id")
+# a missing roaster may be NULL or '' depending on where the bean came from: both are the same
+# key, compared through the expression idx_beans_natural is built on
+BEAN_NATURAL_KEY = "name, IFNULL(roaster, '')"
+
+
+def same_bean(a: str, b: str) -> str:
+    """SQL condition: rows `a` and `b` (aliases, or "?" for a parameter pair) have the same natural key."""
+    col = lambda t, c: "?" if t == "?" else f"{t}.{c}"
+    return f"{col(a, 'name')} = {col(b, 'name')} AND IFNULL({col(a, 'roaster')}, '') = IFNULL({col(b, 'roaster')}, '')"
+
+
+BEAN_BY_NATURAL_KEY_QUERY = f"SELECT id FROM coffee_beans cb WHERE {same_bean('cb', '?')} ORDER BY id LIMIT 1"
+
+# merge import from an ATTACHed journal ("src"), all set-based: beans matched by name + roaster,
+# sessions deduplicated by a hash of their content with the bean id remapped. {image} is the
+# source's photo key: its image_hash, or image_key(image) for journals from before the store
+BEAN_COLUMNS = tuple(k for k, _ in BEAN_INSERT_DEFAULTS)
+SESSION_CONTENT = tuple(k for k, _ in SESSION_INSERT_DEFAULTS[1:])  # everything but the bean id
+# local blanks a matched bean may take from the source; local values always win
+BEAN_FILL = {"roast_level": "''", "origin": "''", "processing_method": "''", "tasting_notes": "''",
+             "rating": "0", "price": "0", "purchase_date": "''", "image_hash": None}
+MERGE_SOURCE_BEANS = ("SELECT id, " + ", ".join("{image} AS image_hash" if c == "image_hash" else c for c in BEAN_COLUMNS)
+                      + f" FROM src.coffee_beans WHERE id IN (SELECT MIN(id) FROM src.coffee_beans GROUP BY {BEAN_NATURAL_KEY})")
+MERGE_IMAGES = {
+    "image_hash": "INSERT OR IGNORE INTO main.images (hash, data) SELECT hash, data FROM src.images",
+    "image_key(image)": ("INSERT OR IGNORE INTO main.images (hash, data) "
+                         "SELECT image_key(image), image FROM src.coffee_beans WHERE length(image) > 0"),
+}
+MERGE_STEPS = (
+    "CREATE TEMP TABLE merge_bean_map (src_id INTEGER PRIMARY KEY, dst_id INTEGER)",
+    "CREATE TEMP TABLE merge_hashes (h TEXT PRIMARY KEY) WITHOUT ROWID",
+)
+MERGE_INSERT_BEANS = (
+    f"INSERT INTO main.coffee_beans ({', '.join(BEAN_COLUMNS)}) "
+    f"SELECT {', '.join('s.' + c for c in BEAN_COLUMNS)} FROM ({MERGE_SOURCE_BEANS}) s "
+    f"WHERE NOT EXISTS (SELECT 1 FROM main.coffee_beans b WHERE {same_bean('b', 's')}) "
+    f"ORDER BY s.id")
+MERGE_FILL_BEANS = (
+    "UPDATE main.coffee_beans AS b SET "
+    + ", ".join(f"{c} = COALESCE(NULLIF(b.{c}, {blank}), s.{c})" if blank else f"{c} = COALESCE(b.{c}, s.{c})"
+                for c, blank in BEAN_FILL.items())
+    + f" FROM ({MERGE_SOURCE_BEANS}) AS s WHERE {same_bean('b', 's')} AND ("
+    + " OR ".join(f"(IFNULL(b.{c}, {blank}) = {blank} AND IFNULL(s.{c}, {blank}) <> {blank})" if blank
+                  else f"(b.{c} IS NULL AND s.{c} IS NOT NULL)" for c, blank in BEAN_FILL.items())
+    + ")")
+MERGE_MAP_BEANS = (
+    f"INSERT INTO temp.merge_bean_map SELECT s.id, (SELECT b.id FROM main.coffee_beans b "
+    f"WHERE {same_bean('b', 's')} ORDER BY b.id LIMIT 1) FROM src.coffee_beans s")
+MERGE_LOCAL_HASHES = (
+    f"INSERT OR IGNORE INTO temp.merge_hashes "
+    f"SELECT content_hash(coffee_bean_id, {', '.join(SESSION_CONTENT)}) FROM main.brewing_sessions")
+MERGE_INSERT_SESSIONS = (
+    f"INSERT INTO main.brewing_sessions (coffee_bean_id, {', '.join(SESSION_CONTENT)}) "
+    f"SELECT dst_id, {', '.join(SESSION_CONTENT)} FROM ("
+    # one row per hash (bare columns come from the MIN(id) row), none that exist locally
+    f"SELECT MIN(id) AS first_id, dst_id, {', '.join(SESSION_CONTENT)} FROM ("
+    f"SELECT m.dst_id, s.id, {', '.join('s.' + c for c in SESSION_CONTENT)}, "
+    f"content_hash(m.dst_id, {', '.join('s.' + c for c in SESSION_CONTENT)}) AS h "
+    f"FROM src.brewing_sessions s JOIN temp.merge_bean_map m ON m.src_id = s.coffee_bean_id "
+    f"WHERE m.dst_id IS NOT NULL) "
+    f"WHERE h NOT IN (SELECT h FROM temp.merge_hashes) GROUP BY h) ORDER BY first_id")
+
+
+# registered as SQL functions by the migration and the merge
+def image_key(data) -> Optional[str]:
+    return hashlib.sha256(data).hexdigest() if data else None
+
+
+def content_hash(*values) -> str:
+    """Stable digest of a row's values (registered as an SQL function for the merge)."""
+    return hashlib.blake2b(repr(values).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def page_query(base: str, key_sql: str, id_sql: str, descending: bool, after: bool) -> str:
+    """SELECT for one page ordered by (key, id); with `after` it starts past a (key, id) cursor."""
+    op, direction = ("<", "DESC") if descending else (">", "ASC")
+    # the planner ranges an index (expression indexes too) on the bare key term, not on the row value
+    where = f" WHERE {key_sql} {op}= ?1 AND ({key_sql}, {id_sql}) {op} (?1, ?2)" if after else ""
+    limit = "?3" if after else "?"
+    return f"{base.format(key=key_sql)}{where} ORDER BY {key_sql} {direction}, {id_sql} {direction} LIMIT {limit}"
+
+
+def _fts_text(expr: str) -> str:
+    # the index stores ё as е (unicode61 already folds case for Cyrillic)
+    return f"replace(replace({expr}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def fts_match_query(q: str, columns=None) -> Optional[str]:
+    """Turn user input into an FTS5 expression: every word must match as a prefix."""
+    words = [w for w in re.split(r"[\W_]+", q.replace("ё", "е").replace("Ё", "Е")) if w]
+    if not words:
+        return None
+    expr = " ".join(f'"{w}"*' for w in words)
+    if columns:
+        expr = "{%s} : (%s)" % (" ".join(columns), expr)
+    return expr
+
+
+# statistics: per-category groups with sums and non-null counts, so the same rows can be
+# added to or subtracted from a StatsCache. {where} narrows them to the rows being written.
+BEAN_SUM_FIELDS = ("price", "rating")
+SESSION_SUM_FIELDS = ("rating", "brew_time", "coffee_weight", "water_weight")
+
+BEAN_GROUPS_SQL = ("SELECT COALESCE(NULLIF(roast_level, ''), 'Unknown') AS k, COUNT(*), COUNT(image_hash), "
+                   + ", ".join(f"SUM(NULLIF({f}, '')), COUNT(NULLIF({f}, ''))" for f in BEAN_SUM_FIELDS)
+                   + " FROM coffee_beans {where} GROUP BY k")
+SESSION_GROUPS_SQL = ("SELECT COALESCE(NULLIF(brew_method, ''), 'Unknown') AS k, COUNT(*), "
+                      + ", ".join(f"SUM(NULLIF({f}, '')), COUNT(NULLIF({f}, ''))" for f in SESSION_SUM_FIELDS)
+                      + " FROM brewing_sessions {where} GROUP BY k")
+
+
+# every statement DatabaseManager runs on the journal, with sample parameters, for
+# check_query_plans(); the MERGE_* statements read an attached source journal and are not listed
+PLANNED_QUERIES = [
+    ("beans.list", BEANS_LIST_QUERY, ()),
+    ("beans.by_id", BEAN_BY_ID_QUERY, (1,)),
+    ("beans.choices", BEAN_CHOICES_QUERY, ()),
+    ("beans.image", BEAN_IMAGE_QUERY, (1,)),
+    ("beans.thumbnail", BEAN_THUMBNAIL_QUERY, (1, 200)),
+    ("beans.image_key", BEAN_IMAGE_KEY_QUERY, (1,)),
+    ("images.put", IMAGE_PUT_QUERY, ("a", b"")),
+    ("images.thumbnail_put", THUMBNAIL_PUT_QUERY, ("a", 200, b"")),
+    ("images.release", IMAGE_RELEASE_QUERY, ("a", "a")),
+    ("images.gc", IMAGE_GC_QUERY, ()),
+    # what ON DELETE CASCADE / the foreign key check look up for every removed photo
+    ("images.release.cascade", "DELETE FROM image_thumbnails WHERE hash = ?", ("a",)),
+    ("images.release.check", "SELECT 1 FROM coffee_beans WHERE image_hash = ?", ("a",)),
+    ("beans.search", BEANS_SEARCH_QUERY, ('"a"*', 50)),
+    ("beans.search_like", BEANS_SEARCH_LIKE_QUERY, ("%a%",) * 4 + (50,)),
+    ("beans.insert", BEAN_INSERT_QUERY, (None,) * len(BEAN_INSERT_DEFAULTS)),
+    ("beans.update", "UPDATE coffee_beans SET name = ? WHERE id = ?", ("a", 1)),
+    ("beans.delete", "DELETE FROM coffee_beans WHERE id = ?", (1,)),
+    # what ON DELETE CASCADE looks up for every deleted bean
+    ("beans.delete.cascade", "DELETE FROM brewing_sessions WHERE coffee_bean_id = ?", (1,)),
+    # the first page and every page after it, for each sort column and direction
+    *((f"beans.{'page' if after else 'first_page'}_by_{k}{'' if desc else '_asc'}",
+       page_query(BEANS_PAGE_BASE, key, "cb.id", desc, after), ("", 0, 200) if after else (200,))
+      for k, key in BEAN_SORT_SQL.items() for desc in (True, False) for after in (False, True)),
+    ("sessions.list", SESSIONS_LIST_QUERY, ()),
+    *((f"sessions.{'page' if after else 'first_page'}_by_{k}{'' if desc else '_asc'}",
+       page_query(sessions_page_base(k), key, "bs.id", desc, after), ("", 0, 200) if after else (200,))
+      for k, key in SESSION_SORT_SQL.items() for desc in (True, False) for after in (False, True)),
+    ("sessions.by_id", SESSION_BY_ID_QUERY, (1,)),
+    ("sessions.search", SESSIONS_SEARCH_QUERY, ('"a"*', '{name} : ("a"*)', 50)),
+    ("sessions.search_like", SESSIONS_SEARCH_LIKE_QUERY, ("%a%",) * 3 + (50,)),
+    ("sessions.insert", SESSION_INSERT_QUERY, (None,) * len(SESSION_INSERT_DEFAULTS)),
+    ("sessions.update", "UPDATE brewing_sessions SET notes = ? WHERE id = ?", ("a", 1)),
+    ("sessions.delete", "DELETE FROM brewing_sessions WHERE id = ?", (1,)),
+    ("stats.bean_row", BEAN_GROUPS_SQL.format(where="WHERE id = ?"), (1,)),
+    ("stats.session_row", SESSION_GROUPS_SQL.format(where="WHERE id = ?"), (1,)),
+    ("stats.bean_sessions", SESSION_GROUPS_SQL.format(where="WHERE coffee_bean_id = ?"), (1,)),
+    ("stats.beans_since", BEAN_GROUPS_SQL.format(where="WHERE id > ?"), (0,)),
+    ("stats.sessions_since", SESSION_GROUPS_SQL.format(where="WHERE id > ?"), (0,)),
+    ("stats.beans_all", BEAN_GROUPS_SQL.format(where=""), ()),
+    ("stats.sessions_all", SESSION_GROUPS_SQL.format(where=""), ()),
+    ("beans.by_natural_key", BEAN_BY_NATURAL_KEY_QUERY, ("a", "b")),
+    ("beans.export", BEANS_EXPORT_QUERY, ()),
+    ("sessions.export", SESSIONS_EXPORT_QUERY, ()),
+]
+# the full statistics recompute, the exports, the whole-table lists (the bean combo box too)
+# and the image sweep read every row by design; the LIKE searches only run without FTS5,
+# and a pattern starting with % cannot use an index
+FULL_SCAN_ALLOWED = {"stats.beans_all", "stats.sessions_all", "beans.export", "sessions.export", "images.gc",
+                     "beans.list", "sessions.list", "beans.choices", "beans.search_like", "sessions.search_like"}
+# a first page walks its sort index from the start and stops at LIMIT
+FULL_SCAN_ALLOWED |= {label for label, _, _ in PLANNED_QUERIES if ".first_page_by_" in label}
+# ranked search sorts only the matched rows; by bean name, only the sessions of one name are
+# sorted (by id) at a time
+SORT_ALLOWED = {"sessions.search"} | {label for label, _, _ in PLANNED_QUERIES if "page_by_coffee_name" in label}
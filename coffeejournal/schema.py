@@ -0,0 +1,165 @@
+# coffeejournal/schema.py
+"""Tables, per-connection pragmas and the migrations that bring older journals up to date."""
+import sqlite3
+import logging
+
+from .queries import BEAN_FTS_COLUMNS, BEAN_NATURAL_KEY, SESSION_FTS_COLUMNS, _fts_text, image_key
+
+logger = logging.getLogger(__name__)
+
+# per-connection settings; journal_mode = WAL is persistent and set once by the writer
+CONNECTION_PRAGMAS = (
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA synchronous = NORMAL",    # WAL stays consistent; only the last commits may be lost on power failure
+    "PRAGMA cache_size = -16384",     # KiB, per connection
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+)
+
+CREATE_TABLES = (
+    """CREATE TABLE IF NOT EXISTS coffee_beans (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        roaster TEXT,
+        roast_level TEXT,
+        origin TEXT,
+        processing_method TEXT,
+        tasting_notes TEXT,
+        rating REAL DEFAULT 0,
+        price REAL,
+        purchase_date TEXT,
+        image BLOB,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )""",
+    """CREATE TABLE IF NOT EXISTS brewing_sessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        coffee_bean_id INTEGER NOT NULL,
+        brew_method TEXT NOT NULL,
+        grind_size TEXT,
+        water_temp INTEGER,
+        brew_time INTEGER,
+        coffee_weight REAL,
+        water_weight REAL,
+        rating REAL,
+        notes TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (coffee_bean_id) REFERENCES coffee_beans(id) ON DELETE CASCADE
+    )""",
+)
+
+
+def _fts_table_sql(table, content, columns):
+    return [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(
+                {", ".join(columns)}, content='{content}', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON {content} BEGIN
+                INSERT INTO {table}(rowid, {", ".join(columns)})
+                VALUES (new.id, {", ".join(_fts_text("new." + c) for c in columns)});
+            END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON {content} BEGIN
+                INSERT INTO {table}({table}, rowid, {", ".join(columns)})
+                VALUES ('delete', old.id, {", ".join(_fts_text("old." + c) for c in columns)});
+            END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF {", ".join(columns)} ON {content} BEGIN
+                INSERT INTO {table}({table}, rowid, {", ".join(columns)})
+                VALUES ('delete', old.id, {", ".join(_fts_text("old." + c) for c in columns)});
+                INSERT INTO {table}(rowid, {", ".join(columns)})
+                VALUES (new.id, {", ".join(_fts_text("new." + c) for c in columns)});
+            END""",
+        # 'rebuild' would index the raw text, so fill from the normalised columns instead
+        f"""INSERT INTO {table}(rowid, {", ".join(columns)})
+            SELECT id, {", ".join(_fts_text(c) for c in columns)} FROM {content}""",
+    ]
+
+
+def _create_fts(conn):
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp._fts5_probe USING fts5(x)")
+        conn.execute("DROP TABLE temp._fts5_probe")
+    except sqlite3.OperationalError:
+        logger.warning("SQLite is built without FTS5, search falls back to LIKE")
+        return
+    for sql in _fts_table_sql("beans_fts", "coffee_beans", BEAN_FTS_COLUMNS) + \
+            _fts_table_sql("sessions_fts", "brewing_sessions", SESSION_FTS_COLUMNS):
+        conn.execute(sql)
+    # bm25 column weights: a hit in the name outranks one in the notes
+    conn.execute("INSERT INTO beans_fts(beans_fts, rank) VALUES ('rank', 'bm25(10.0, 5.0, 3.0, 1.0)')")
+    conn.execute("INSERT INTO sessions_fts(sessions_fts, rank) VALUES ('rank', 'bm25(3.0, 1.0)')")
+
+def _move_images_to_store(conn):
+    # photos leave the bean rows for the content-addressed store, thumbnails follow them
+    conn.create_function("image_key", 1, image_key, deterministic=True)
+    conn.execute("""CREATE TABLE IF NOT EXISTS images (
+        hash TEXT PRIMARY KEY,
+        data BLOB NOT NULL
+    )""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS image_thumbnails (
+        hash TEXT NOT NULL REFERENCES images(hash) ON DELETE CASCADE,
+        size INTEGER NOT NULL,
+        data BLOB NOT NULL,
+        PRIMARY KEY (hash, size)
+    ) WITHOUT ROWID""")
+    conn.execute("ALTER TABLE coffee_beans ADD COLUMN image_hash TEXT REFERENCES images(hash)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_beans_image ON coffee_beans(image_hash)")
+    conn.execute("INSERT OR IGNORE INTO images (hash, data) "
+                 "SELECT image_key(image), image FROM coffee_beans WHERE length(image) > 0")
+    conn.execute("UPDATE coffee_beans SET image_hash = image_key(image) WHERE length(image) > 0")
+    conn.execute("INSERT OR IGNORE INTO image_thumbnails (hash, size, data) "
+                 "SELECT cb.image_hash, t.size, t.data FROM bean_thumbnails t "
+                 "JOIN coffee_beans cb ON cb.id = t.bean_id WHERE cb.image_hash IS NOT NULL")
+    conn.execute("DROP TABLE bean_thumbnails")
+    try:
+        conn.execute("ALTER TABLE coffee_beans DROP COLUMN image")  # SQLite 3.35+
+    except sqlite3.OperationalError:
+        conn.execute("UPDATE coffee_beans SET image = NULL")
+
+
+# schema migrations, applied in order while PRAGMA user_version is below their number
+MIGRATIONS = [
+    (1, [
+        # list ordering / keyset paging
+        "CREATE INDEX IF NOT EXISTS idx_beans_created ON coffee_beans(created_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_created ON brewing_sessions(created_at, id)",
+        # session -> bean join and the ON DELETE CASCADE child lookup
+        "CREATE INDEX IF NOT EXISTS idx_sessions_bean ON brewing_sessions(coffee_bean_id)",
+        # filter columns
+        "CREATE INDEX IF NOT EXISTS idx_beans_roast ON coffee_beans(roast_level)",
+        "CREATE INDEX IF NOT EXISTS idx_beans_rating ON coffee_beans(rating)",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_method ON brewing_sessions(brew_method)",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_rating ON brewing_sessions(rating)",
+    ]),
+    (2, [_create_fts]),
+    (3, [
+        # natural key for upserting imported beans
+        "CREATE INDEX IF NOT EXISTS idx_beans_natural ON coffee_beans(name, roaster)",
+    ]),
+    (4, [
+        # the sizes dialogs display, rendered once (images.THUMB_SIZES)
+        """CREATE TABLE IF NOT EXISTS bean_thumbnails (
+            bean_id INTEGER NOT NULL REFERENCES coffee_beans(id) ON DELETE CASCADE,
+            size INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            PRIMARY KEY (bean_id, size)
+        ) WITHOUT ROWID""",
+    ]),
+    (5, [_move_images_to_store]),
+    (6, [
+        # keyset paging for every sortable column: (sort key, id) in index order, with the same
+        # expressions as BEAN_SORT_SQL / SESSION_SORT_SQL so the planner can match them
+        "CREATE INDEX IF NOT EXISTS idx_beans_name ON coffee_beans(name)",
+        "CREATE INDEX IF NOT EXISTS idx_beans_roaster_sort ON coffee_beans(IFNULL(roaster, ''))",
+        "CREATE INDEX IF NOT EXISTS idx_beans_roast_sort ON coffee_beans(IFNULL(roast_level, ''))",
+        "CREATE INDEX IF NOT EXISTS idx_beans_origin_sort ON coffee_beans(IFNULL(origin, ''))",
+        "CREATE INDEX IF NOT EXISTS idx_beans_rating_sort ON coffee_beans(IFNULL(rating, 0))",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_temp_sort ON brewing_sessions(IFNULL(water_temp, 0))",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_time_sort ON brewing_sessions(IFNULL(brew_time, 0))",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_rating_sort ON brewing_sessions(IFNULL(rating, 0))",
+    ]),
+    (7, [
+        # the natural key treats a NULL roaster as '' (queries.BEAN_NATURAL_KEY)
+        "DROP INDEX IF EXISTS idx_beans_natural",
+        f"CREATE INDEX idx_beans_natural ON coffee_beans({BEAN_NATURAL_KEY})",
+    ]),
+]
@@ -0,0 +1,219 @@
+# coffeejournal/tracing.py
+"""Per-statement timing of the journal's SQLite connections.
+
+Every connection DatabaseManager opens is a TracedConnection. While its QueryLog is enabled,
+each statement is timed from execute() until its rows have been fetched, and rows and bytes
+(BLOBs and text included, text counted in characters) are added to the counters of its call
+site: the DatabaseManager method (or StatsCache / ConnectionManager one) that ran it. A
+statement slower than QueryLog.slow_ms is logged with its EXPLAIN QUERY PLAN.
+
+Disabled, a statement costs one Python call more and rows are fetched by sqlite3 as usual.
+"""
+import collections
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = 100.0
+SLOW_KEEP = 50  # latest slow statements kept for the Performance tab
+# same form as the modules' co_filename: they are imported from this directory
+_DATA_FILES = {os.path.join(os.path.dirname(__file__), f) for f in ("journal.py", "schema.py")}
+
+
+def _row_bytes(row) -> int:
+    n = 0
+    for v in row:
+        n += len(v) if isinstance(v, (bytes, str)) else 8
+    return n
+
+
+def call_site() -> str:
+    """The innermost public function of the data layer on the stack (or the caller outside it)."""
+    f = sys._getframe(1)
+    while f is not None and f.f_code.co_filename == __file__:
+        f = f.f_back
+    outside = None
+    while f is not None:
+        code = f.f_code
+        if code.co_filename in _DATA_FILES:
+            if not code.co_name.startswith(("_", "<")):
+                return getattr(code, "co_qualname", code.co_name)
+        elif outside is None:
+            outside = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+        f = f.f_back
+    return outside or "?"
+
+
+class QueryStats:
+    __slots__ = ("site", "sql", "calls", "total_ms", "max_ms", "rows", "bytes", "slow")
+
+    def __init__(self, site, sql):
+        self.site = site
+        self.sql = sql
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.slow = 0
+
+    def as_dict(self):
+        d = {k: getattr(self, k) for k in self.__slots__}
+        d["avg_ms"] = self.total_ms / self.calls if self.calls else 0.0
+        return d
+
+
+class QueryLog:
+    """Counters per (call site, statement), shared by all connections of one DatabaseManager."""
+
+    def __init__(self, enabled=False, slow_ms=SLOW_QUERY_MS):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self._stats = {}
+        self.slow_queries = collections.deque(maxlen=SLOW_KEEP)
+
+    def record(self, conn, site, sql, params, ms, rows, nbytes):
+        slow = ms >= self.slow_ms
+        with self._lock:
+            s = self._stats.get((site, sql))
+            if s is None:
+                s = self._stats[(site, sql)] = QueryStats(site, sql)
+            s.calls += 1
+            s.total_ms += ms
+            s.max_ms = max(s.max_ms, ms)
+            s.rows += rows
+            s.bytes += nbytes
+            s.slow += slow
+        if slow:
+            plan = self._plan(conn, sql, params)
+            self.slow_queries.append({"time": time.strftime("%H:%M:%S"), "site": site, "sql": sql, "ms": ms,
+                                      "rows": rows, "plan": plan})
+            logger.warning("slow query: %.1f ms, %d rows, at %s\n  %s%s", ms, rows, site, " ".join(sql.split()),
+                           "".join(f"\n  plan: {p}" for p in plan))
+
+    @staticmethod
+    def _plan(conn, sql, params):
+        if params is None:  # executemany: the parameters were consumed
+            return []
+        try:
+            # a plain cursor, so the EXPLAIN itself is not traced
+            cur = sqlite3.Cursor(conn)
+            return [r[3] for r in cur.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+        except sqlite3.Error:
+            return []  # BEGIN, PRAGMA, VACUUM and the like have no plan
+
+    def snapshot(self):
+        """Counters as dicts, most total time first."""
+        with self._lock:
+            rows = [s.as_dict() for s in self._stats.values()]
+        rows.sort(key=lambda d: -d["total_ms"])
+        return rows
+
+    def totals(self):
+        with self._lock:
+            stats = list(self._stats.values())
+        return {"statements": sum(s.calls for s in stats), "total_ms": sum(s.total_ms for s in stats),
+                "rows": sum(s.rows for s in stats), "bytes": sum(s.bytes for s in stats),
+                "slow": sum(s.slow for s in stats)}
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+        self.slow_queries.clear()
+
+
+class TracedCursor(sqlite3.Cursor):
+    """Times the statement from execute() to its last fetched row; a statement whose rows are
+    not all read (fetchone() of one row) is recorded on the next execute, close or collection."""
+
+    _pending = None  # [site, sql, params, ms, rows, bytes] of the statement in flight
+
+    def _finish(self):
+        p = self._pending
+        if p is not None:
+            self._pending = None
+            self.connection.query_log.record(self.connection, *p)
+
+    def execute(self, sql, params=()):
+        self._finish()
+        site = call_site()
+        t = time.perf_counter()
+        super().execute(sql, params)
+        self._pending = [site, sql, params, (time.perf_counter() - t) * 1000, 0, 0]
+        if self.description is None:  # no result rows
+            self._pending[4] = max(self.rowcount, 0)
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq):
+        self._finish()
+        site = call_site()
+        t = time.perf_counter()
+        super().executemany(sql, seq)
+        self._pending = [site, sql, None, (time.perf_counter() - t) * 1000, max(self.rowcount, 0), 0]
+        self._finish()
+        return self
+
+    def _fetched(self, t, rows, done):
+        p = self._pending
+        if p is not None:
+            p[3] += (time.perf_counter() - t) * 1000
+            p[4] += len(rows)
+            p[5] += sum(map(_row_bytes, rows))
+            if done:
+                self._finish()
+
+    def fetchone(self):
+        t = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(t, () if row is None else (row,), row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        t = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(t, rows, not rows)
+        return rows
+
+    def fetchall(self):
+        t = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(t, rows, True)
+        return rows
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass  # collected at interpreter exit or after its connection closed
+
+
+class TracedConnection(sqlite3.Connection):
+    query_log = QueryLog()  # replaced per connection by ConnectionManager
+
+    def cursor(self, factory=None):
+        if factory is None:
+            factory = TracedCursor if self.query_log.enabled else sqlite3.Cursor
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq):
+        return self.cursor().executemany(sql, seq)
@@ -1,46 +1,71 @@
 # dialogs.py
-import os, sys
-from PyQt5 import uic
 from PyQt5.QtCore import Qt, QBuffer, QIODevice
-from PyQt5.QtGui import QPixmap
+from PyQt5.QtGui import QPixmap, QImageReader
 from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QPushButton, QFileDialog, QTextEdit, QLineEdit, QComboBox, QDoubleSpinBox, QSpinBox, QHBoxLayout, QMessageBox
 
-def resource_path(rel):
-    try:
-        base = sys._MEIPASS
-    except Exception:
-        base = os.path.abspath(".")
-    return os.path.join(base, rel)
+from pixmaps import pixmap_cache
+from ui.details_dialog_ui import Ui_DetailsDialog
 
-def load_pixmap_from_bytes(b):
-    if not b: return None
-    p = QPixmap(); p.loadFromData(b); return p if not p.isNull() else None
+def load_preview(path, side):
+    # decode the file straight at preview size instead of full resolution + scaled()
+    r = QImageReader(path); r.setAutoTransform(True)
+    size = r.size()
+    if size.isValid() and (size.width() > side or size.height() > side):
+        r.setScaledSize(size.scaled(side, side, Qt.KeepAspectRatio))
+    img = r.read()
+    return QPixmap.fromImage(img) if not img.isNull() else None
 
-class DetailsDialog(QDialog):
+class DetailsDialog(QDialog, Ui_DetailsDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
-        ui = resource_path("ui/details_dialog.ui")
-        if os.path.exists(ui):
-            uic.loadUi(ui, self)
-            try: self.closeButton.clicked.connect(self.accept)
-            except Exception: pass
-        else:
-            self.setWindowTitle("Детали"); self.resize(420,520)
-            l=QVBoxLayout(self); self.imageLabel=QLabel(alignment=Qt.AlignCenter); self.imageLabel.setMinimumSize(320,240); l.addWidget(self.imageLabel)
-            self.detailsText=QTextEdit(); self.detailsText.setReadOnly(True); l.addWidget(self.detailsText)
-            l.addWidget(QPushButton("Закрыть", clicked=self.accept))
-
-    def set_image_from_bytes(self, b):
-        p = load_pixmap_from_bytes(b)
-        if p: self.imageLabel.setPixmap(p.scaled(320,320,Qt.KeepAspectRatio,Qt.SmoothTransformation))
+        self.setupUi(self)  # pyuic5-generated from ui/details_dialog.ui
+        self.closeButton.clicked.connect(self.accept)
+
+    def set_image(self, p):
+        if p: self.imageLabel.setPixmap(p)
         else: self.imageLabel.setText("Изображение отсутствует")
 
+    def load_bean_image(self, io, bean_id):
+        # the stored 320px thumbnail, decoded on the worker and then served from the shared pixmap cache
+        io.cancel_key("details_image")
+        if bean_id is None: self.set_image(None); return
+        self.imageLabel.setText("Загрузка…")
+        pixmap_cache.load(io, bean_id, 320, self.set_image, key="details_image")
+
     def set_text(self, txt): self.detailsText.setPlainText(txt)
 
-class CoffeeDialog(QDialog):
-    def __init__(self, db_manager, coffee_data=None, parent=None):
+class _SavingDialog(QDialog):
+    """Saves through the DatabaseWorker: the dialog stays open, its buttons disabled, until the
+    write has landed; then saved_row holds the list row the database returned."""
+    def __init__(self, io, parent=None):
         super().__init__(parent)
-        self.db = db_manager; self.coffee_data = coffee_data or {}; self.selected_image_path=None
+        self.io = io; self.saved_row = None; self._saving = False
+
+    def _submit(self, job, what):
+        self._set_saving(True)
+        self.io.submit(job, on_done=lambda row: self._saved(row, what), on_error=self._save_failed)
+
+    def _set_saving(self, on):
+        self._saving = on; self.saveBtn.setEnabled(not on); self.cancelBtn.setEnabled(not on)
+
+    def _saved(self, row, what):
+        self._set_saving(False)
+        if row is None: QMessageBox.critical(self,"Ошибка при сохранении",f"Не удалось сохранить {what}"); return
+        self.saved_row = row
+        self.accept()
+
+    def _save_failed(self, e):
+        self._set_saving(False)
+        QMessageBox.critical(self,"Ошибка при сохранении", str(e))
+
+    def reject(self):
+        if not self._saving: super().reject()  # Esc and the close button wait for the write too
+
+class CoffeeDialog(_SavingDialog):
+    def __init__(self, io, coffee_data=None, parent=None):
+        super().__init__(io, parent)
+        self.coffee_data = coffee_data or {}; self.selected_image_path=None; self.image_cleared=False
+        self.finished.connect(lambda _: self.io.cancel_key("coffee_dialog_image"))
         self.setWindowTitle("Редактировать" if coffee_data else "Добавить сорт"); self.resize(600,700)
         l=QVBoxLayout(self)
         header=QLabel("Добавить/Редактировать сорт", alignment=Qt.AlignCenter); header.setStyleSheet("background:#2E8B57;color:white;padding:8px"); l.addWidget(header)
@@ -65,47 +90,45 @@ class CoffeeDialog(QDialog):
         self.origin.setText(d.get("origin","")); self.proc.setText(d.get("processing_method","")); self.notes.setPlainText(d.get("tasting_notes",""))
         try: self.price.setValue(float(d.get("price") or 0)); self.rating.setValue(float(d.get("rating") or 0))
         except Exception: pass
-        if d.get("image"):
-            p = load_pixmap_from_bytes(d["image"])
-            if p: self.imgLabel.setPixmap(p.scaled(200,200,Qt.KeepAspectRatio,Qt.SmoothTransformation))
+        if d.get("has_image") and d.get("id"):
+            pixmap_cache.load(self.io, d["id"], 200, self._show_stored_image, key="coffee_dialog_image")
+
+    def _show_stored_image(self, p):
+        # a photo picked or cleared meanwhile wins
+        if p and not self.selected_image_path and not self.image_cleared: self.imgLabel.setPixmap(p)
 
     def load_image(self):
-        p,_ = QFileDialog.getOpenFileName(self,"Выберите изображение","","Images (*.png *.jpg *.jpeg *.bmp *.gif)")
+        p,_ = QFileDialog.getOpenFileName(self,"Выберите изображение","","Images (*.png *.jpg *.jpeg *.webp *.bmp *.gif)")
         if not p: return
-        pix = QPixmap(p)
-        if pix.isNull(): QMessageBox.warning(self,"Ошибка","Не удалось загрузить"); return
-        self.selected_image_path = p
-        self.imgLabel.setPixmap(pix.scaled(200,200,Qt.KeepAspectRatio,Qt.SmoothTransformation))
+        pix = load_preview(p, 200)
+        if pix is None: QMessageBox.warning(self,"Ошибка","Не удалось загрузить"); return
+        self.selected_image_path = p; self.image_cleared = False
+        self.imgLabel.setPixmap(pix)
 
     def clear_image(self):
-        self.selected_image_path = None; self.imgLabel.setText("🖼 Нажмите загрузить")
+        self.selected_image_path = None; self.image_cleared = True; self.imgLabel.setText("🖼 Нажмите загрузить")
 
     def save(self):
         name = self.name.text().strip()
         if not name: QMessageBox.warning(self,"Ошибка","Название обязательно"); return
-        image_pix = None
-        if self.selected_image_path:
-            pp = QPixmap(self.selected_image_path); image_pix = pp if not pp.isNull() else None
-        try:
-            if self.coffee_data.get("id"):
-                self.db.update_coffee_bean(self.coffee_data["id"],
-                                           name=name, roaster=self.roaster.text().strip(),
-                                           roast_level=self.roast.currentText(), origin=self.origin.text().strip(),
-                                           processing_method=self.proc.text().strip(), tasting_notes=self.notes.toPlainText().strip(),
-                                           price=float(self.price.value()), rating=float(self.rating.value()), image=image_pix)
-            else:
-                self.db.add_coffee_bean(name=name, roaster=self.roaster.text().strip(),
-                                        roast_level=self.roast.currentText(), origin=self.origin.text().strip(),
-                                        processing_method=self.proc.text().strip(), tasting_notes=self.notes.toPlainText().strip(),
-                                        price=float(self.price.value()), rating=float(self.rating.value()), image=image_pix)
-            self.accept()
-        except Exception as e:
-            QMessageBox.critical(self,"Ошибка при сохранении", str(e))
-
-class BrewingDialog(QDialog):
-    def __init__(self, db_manager, coffee_beans=None, brewing_data=None, parent=None):
-        super().__init__(parent)
-        self.db = db_manager; self.coffee_beans = coffee_beans or []; self.data = brewing_data or {}
+        # the file is decoded once, by the database's image pipeline; an untouched photo is left as is
+        image = {"image": self.selected_image_path} if self.selected_image_path or self.image_cleared else {}
+        fields = dict(name=name, roaster=self.roaster.text().strip(), roast_level=self.roast.currentText(),
+                      origin=self.origin.text().strip(), processing_method=self.proc.text().strip(),
+                      tasting_notes=self.notes.toPlainText().strip(), price=float(self.price.value()),
+                      rating=float(self.rating.value()), **image)
+        bean_id = self.coffee_data.get("id")
+        if bean_id: self._submit(lambda db: db.update_coffee_bean(bean_id, **fields), "сорт")
+        else: self._submit(lambda db: db.add_coffee_bean(**fields), "сорт")
+
+    def _saved(self, row, what):
+        if row is not None: pixmap_cache.invalidate(row["id"])
+        super()._saved(row, what)
+
+class BrewingDialog(_SavingDialog):
+    def __init__(self, io, coffee_beans=None, brewing_data=None, parent=None):
+        super().__init__(io, parent)
+        self.coffee_beans = coffee_beans or []; self.data = brewing_data or {}
         self.setWindowTitle("Добавить/Редактировать сессию"); self.resize(520,520)
         l=QVBoxLayout(self)
         l.addWidget(QLabel("Сорт*:")); self.coffeeCombo = QComboBox(); 
@@ -136,11 +159,6 @@ class BrewingDialog(QDialog):
                        water_temp=int(self.temp.value()), brew_time=int(self.time.value()),
                        coffee_weight=float(self.cw.value()), water_weight=float(self.ww.value()),
                        rating=float(self.rating.value()), notes=self.notes.toPlainText().strip())
-        try:
-            if self.data.get("id"):
-                self.db.update_brewing_session(self.data["id"], **payload)
-            else:
-                self.db.add_brewing_session(**payload)
-            self.accept()
-        except Exception as e:
-            QMessageBox.critical(self,"Ошибка при сохранении", str(e))
+        session_id = self.data.get("id")
+        if session_id: self._submit(lambda db: db.update_brewing_session(session_id, **payload), "сессию")
+        else: self._submit(lambda db: db.add_brewing_session(**payload), "сессию")
@@ -1,27 +1,31 @@
 # main.py
 import os
 import sys
-import sqlite3
-import tempfile
-import shutil
-import gc
+import time
 import logging
 
-from PyQt5 import uic
-from PyQt5.QtCore import Qt, QSortFilterProxyModel
+_STARTED = time.perf_counter()  # taken before the Qt imports, which are part of startup too
+
+from PyQt5.QtCore import Qt, QTimer, QSize
 from PyQt5.QtWidgets import (
-    QApplication, QMainWindow, QMessageBox, QFileDialog, QTextEdit, QWidget, QVBoxLayout, QMenu, QAction, QDialog
+    QApplication, QMainWindow, QMessageBox, QFileDialog, QMenu, QAction, QDialog,
+    QProgressDialog
 )
 
-from database import DatabaseManager
-from models import CoffeeBeansTableModel, BrewingSessionsTableModel
+from database import DatabaseManager, default_db_path
+from workers import DatabaseWorker
+from models import PagedCoffeeBeansTableModel, PagedBrewingSessionsTableModel, SqlSortProxyModel
 from dialogs import CoffeeDialog, BrewingDialog, DetailsDialog
+from ui.main_window_ui import Ui_MainWindow
+from pixmaps import pixmap_cache, ThumbnailLoader, TABLE_ICON_SIDE
+from performance import PerformancePanel
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 logger = logging.getLogger(__name__)
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_FILENAME = "coffee_journal.db"
+SNAPSHOT_CHECK_MS = 60 * 60 * 1000
+SNAPSHOT_FIRST_CHECK_MS = 60 * 1000
+PREFETCH_DELAY_MS = 250  # photos of the beans in view are decoded once scrolling settles
 
 APP_STYLE = """
 QMainWindow { background: #121212; color: #eaeaea; }
@@ -35,26 +39,35 @@ QTabBar::tab:selected { background: #3b82f6; color: white; }
 """
 
 
-def resource_path(relative_path: str) -> str:
-    """Return path to resource, works for dev and PyInstaller (_MEIPASS)."""
-    try:
-        base = sys._MEIPASS  # type: ignore[attr-defined]
-    except Exception:
-        base = BASE_DIR
-    return os.path.join(base, relative_path)
+class StartupProfile:
+    """Wall-clock marks from process start (--profile-startup); disabled ones cost nothing."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.marks = []
+
+    def mark(self, label):
+        if self.enabled:
+            self.marks.append((label, time.perf_counter()))
 
+    def report(self) -> str:
+        lines = []
+        prev = _STARTED
+        for label, t in self.marks:
+            lines.append(f"{(t - _STARTED) * 1000:8.1f} ms  +{(t - prev) * 1000:7.1f} ms  {label}")
+            prev = t
+        return "\n".join(lines)
 
-class MainWindow(QMainWindow):
+
+class MainWindow(QMainWindow, Ui_MainWindow):
     """Main application window."""
 
-    def __init__(self):
+    def __init__(self, profile=None, db_path=None, trace_queries=False):
         super().__init__()
-        ui_file = resource_path(os.path.join("ui", "main_window.ui"))
-        if not os.path.exists(ui_file):
-            QMessageBox.critical(None, "Ошибка", f"UI не найден: {ui_file}")
-            raise SystemExit(1)
-
-        uic.loadUi(ui_file, self)
+        self.profile = profile or StartupProfile()
+        # built by the pyuic5-generated class instead of parsing ui/main_window.ui at startup
+        self.setupUi(self)
+        self.profile.mark("ui built")
 
         # apply style
         app = QApplication.instance()
@@ -62,20 +75,24 @@ class MainWindow(QMainWindow):
             app.setStyleSheet(APP_STYLE)
 
         # database and models
-        self.db_path = os.path.join(BASE_DIR, DB_FILENAME)
+        self.db_path = db_path or default_db_path()
         self.db = DatabaseManager(self.db_path)
-
-        self.coffee_model = CoffeeBeansTableModel()
-        self.brewing_model = BrewingSessionsTableModel()
-
-        # proxies (sorting & filtering)
-        self.coffee_proxy = QSortFilterProxyModel(self)
+        self.profile.mark("database opened")
+        # list loads, searches, statistics and backups run on a background thread
+        self.io = DatabaseWorker(self.db, self)
+
+        # rows are paged in from SQLite as the tables scroll
+        self.coffee_model = PagedCoffeeBeansTableModel(
+            lambda *a: self._fetch_page(DatabaseManager.get_coffee_beans_page, "coffee_page", self.coffee_model, *a))
+        self.brewing_model = PagedBrewingSessionsTableModel(
+            lambda *a: self._fetch_page(DatabaseManager.get_brewing_sessions_page, "brewing_page", self.brewing_model, *a))
+
+        # proxies hand sorting down to the models (ORDER BY in SQL)
+        self.coffee_proxy = SqlSortProxyModel(self)
         self.coffee_proxy.setSourceModel(self.coffee_model)
-        self.coffee_proxy.setFilterCaseSensitivity(Qt.CaseInsensitive)
 
-        self.brewing_proxy = QSortFilterProxyModel(self)
+        self.brewing_proxy = SqlSortProxyModel(self)
         self.brewing_proxy.setSourceModel(self.brewing_model)
-        self.brewing_proxy.setFilterCaseSensitivity(Qt.CaseInsensitive)
 
         # bind table views to proxies (safe)
         self._bind_table_safe("coffeeTable", self.coffee_proxy)
@@ -100,6 +117,9 @@ class MainWindow(QMainWindow):
         self._connect_return_safe("coffeeSearchEdit", self.search_coffee)
         self._connect_return_safe("coffeeSearchInput", self.search_coffee)
         self._connect_return_safe("brewingSearchEdit", self.search_brewing)
+        # prefix search is cheap enough to run as the user types
+        self._safe(lambda: self.coffeeSearchEdit.textEdited.connect(self.search_coffee))
+        self._safe(lambda: self.brewingSearchEdit.textEdited.connect(self.search_brewing))
 
         # selection and double click
         self._safe(lambda: self.coffeeTable.clicked.connect(lambda idx: self.coffeeTable.selectRow(idx.row())))
@@ -107,21 +127,51 @@ class MainWindow(QMainWindow):
         self._safe(lambda: self.coffeeTable.doubleClicked.connect(self.on_coffee_double_clicked))
         self._safe(lambda: self.brewingTable.doubleClicked.connect(self.on_brewing_double_clicked))
 
+        # photo column in the coffee table, decoded on a thread pool as rows come into view
+        self.thumbnails = ThumbnailLoader(self.db, parent=self)
+        self.set_thumbnails_shown(True)
+
+        # details-dialog photos of the visible beans are decoded ahead of a double click
+        self._prefetch_timer = QTimer(self, singleShot=True, interval=PREFETCH_DELAY_MS)
+        self._prefetch_timer.timeout.connect(self._prefetch_visible_images)
+        self._safe(lambda: self.coffeeTable.verticalScrollBar().valueChanged.connect(self._prefetch_timer.start))
+        self.coffee_model.modelReset.connect(self._prefetch_timer.start)
+        self.coffee_model.rowsInserted.connect(self._prefetch_timer.start)
+
         # context menus
         self._safe(lambda: self.coffeeTable.setContextMenuPolicy(Qt.CustomContextMenu))
         self._safe(lambda: self.coffeeTable.customContextMenuRequested.connect(self._coffee_context))
         self._safe(lambda: self.brewingTable.setContextMenuPolicy(Qt.CustomContextMenu))
         self._safe(lambda: self.brewingTable.customContextMenuRequested.connect(self._brewing_context))
 
-        # ensure stats text exists (fallback)
-        self._ensure_stats_text()
+        # statistics are computed the first time their tab is opened
+        self._stats_wanted = False
+        self.tabWidget.currentChanged.connect(self._tab_changed)
+
+        # query counters; collected from startup with --trace-queries, or once switched on in the tab
+        self.db.query_log.enabled = trace_queries
+        self.perfTab = PerformancePanel(self.db.query_log, self)
+        self.tabWidget.addTab(self.perfTab, "Производительность")
 
         # add import/export menu
         self._setup_db_menu()
 
-        # initial load
-        self.load_coffee_data()
-        self.load_brewing_data()
+        # the details dialog is built once and reused
+        self._details = None
+
+        # first load once the event loop runs, i.e. after the window is on screen
+        QTimer.singleShot(0, self.refresh_all)
+
+        # rolling snapshots in the app data dir: checked hourly, first check once startup settled
+        self._snapshot_timer = QTimer(self)
+        self._snapshot_timer.timeout.connect(self._snapshot_if_due)
+        self._snapshot_timer.start(SNAPSHOT_CHECK_MS)
+        QTimer.singleShot(SNAPSHOT_FIRST_CHECK_MS, self._snapshot_if_due)
+
+    def closeEvent(self, event):
+        self.thumbnails.stop()
+        self.io.stop()
+        super().closeEvent(event)
 
     # ---------- safe helpers ----------
     def _safe(self, fn):
@@ -162,9 +212,33 @@ class MainWindow(QMainWindow):
             import_action = QAction("Импорт БД...", self)
             import_action.triggered.connect(self.import_database)
             file_menu.addAction(import_action)
+            file_menu.addSeparator()
+            export_rows_action = QAction("Экспорт таблицы (CSV/JSONL)...", self)
+            export_rows_action.triggered.connect(self.export_rows)
+            file_menu.addAction(export_rows_action)
+            import_rows_action = QAction("Импорт в таблицу (CSV/JSONL)...", self)
+            import_rows_action.triggered.connect(self.import_rows)
+            file_menu.addAction(import_rows_action)
+            view_menu = menubar.addMenu("Вид")
+            thumbs_action = QAction("Фото в таблице сортов", self, checkable=True, checked=True)
+            thumbs_action.toggled.connect(self.set_thumbnails_shown)
+            view_menu.addAction(thumbs_action)
         except Exception:
             pass
 
+    def set_thumbnails_shown(self, shown):
+        self.coffee_model.set_thumbnail_loader(self.thumbnails if shown else None)
+        self._safe(lambda: self._size_coffee_rows(shown))
+
+    def _size_coffee_rows(self, shown):
+        view = self.coffeeTable
+        if shown:
+            view.setIconSize(QSize(TABLE_ICON_SIDE, TABLE_ICON_SIDE))
+            view.verticalHeader().setDefaultSectionSize(TABLE_ICON_SIDE + 4)
+            view.setColumnWidth(self.coffee_model.thumb_col, TABLE_ICON_SIDE + 12)
+        else:
+            view.verticalHeader().resetDefaultSectionSize()
+
     def export_database(self):
         """Export current DB to chosen file using sqlite backup (safe while DB opened)."""
         target, _ = QFileDialog.getSaveFileName(self, "Экспортировать базу", "", "SQLite DB (*.db);;All files (*)")
@@ -173,95 +247,173 @@ class MainWindow(QMainWindow):
         if not os.path.exists(self.db_path):
             QMessageBox.critical(self, "Ошибка", f"Файл БД не найден:\n{self.db_path}")
             return
-        try:
-            src_conn = sqlite3.connect(self.db_path)
-            try:
-                dest_conn = sqlite3.connect(target)
-                try:
-                    with dest_conn:
-                        src_conn.backup(dest_conn, pages=0)
-                finally:
-                    dest_conn.close()
-            finally:
-                src_conn.close()
-            QMessageBox.information(self, "Готово", f"Экспорт завершён:\n{target}")
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "Ошибка экспорта", str(e))
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка экспорта", str(e))
+        # copied a chunk of pages per step on the worker; the dialog shows up if it takes a while
+        dlg = QProgressDialog("Экспорт базы...", "Отмена", 0, 100, self)
+        dlg.setWindowModality(Qt.WindowModal)
+        dlg.setAutoClose(False)
+        ticket = self.io.submit(DatabaseManager.backup_to, target, key="backup",
+                                on_progress=lambda done, total: dlg.setValue(done * 100 // total if total else 100),
+                                on_done=lambda _: self._export_done(dlg, target),
+                                on_error=lambda e: self._export_failed(dlg, e))
+        dlg.canceled.connect(lambda: self.io.cancel(ticket))
+
+    def _export_done(self, dlg, target):
+        dlg.reset()
+        QMessageBox.information(self, "Готово", f"Экспорт завершён:\n{target}")
+
+    def _export_failed(self, dlg, e):
+        dlg.reset()
+        QMessageBox.critical(self, "Ошибка экспорта", str(e))
+
+    def _snapshot_if_due(self):
+        from coffeejournal import backup  # imported on first use, off the startup path
+        if backup.snapshot_due():
+            self.io.submit(backup.take_snapshot, key="snapshot",
+                           on_done=lambda path: logger.info("snapshot saved: %s", path),
+                           on_error=lambda e: logger.warning("snapshot failed: %s", e))
 
     def import_database(self):
-        """Import DB from file: backup chosen DB into temporary file and replace current DB safely."""
+        """Merge another journal file into the current DB (nothing local is replaced)."""
         src_file, _ = QFileDialog.getOpenFileName(self, "Импортировать базу", "", "SQLite DB (*.db);;All files (*)")
         if not src_file:
             return
-        confirm = QMessageBox.question(self, "Подтвердите", "Импорт заменит текущую базу. Продолжить?", QMessageBox.Yes | QMessageBox.No)
+        confirm = QMessageBox.question(self, "Подтвердите", "Записи из выбранной базы будут добавлены к текущей "
+                                       "(совпадающие пропускаются). Продолжить?", QMessageBox.Yes | QMessageBox.No)
         if confirm != QMessageBox.Yes:
             return
-        try:
-            # create temporary copy by backing up chosen DB into tmp file
-            tmp_fd, tmp_path = tempfile.mkstemp(suffix=".db")
-            os.close(tmp_fd)
-            src_conn = sqlite3.connect(src_file)
-            try:
-                dest_conn = sqlite3.connect(tmp_path)
-                try:
-                    with dest_conn:
-                        src_conn.backup(dest_conn, pages=0)
-                finally:
-                    dest_conn.close()
-            finally:
-                src_conn.close()
-
-            # try to close current db connections if possible
-            try:
-                if hasattr(self, "db") and hasattr(self.db, "close"):
-                    self.db.close()
-                gc.collect()
-            except Exception:
-                pass
+        self.statusBar().showMessage("Импорт базы...")
+        self.io.submit(DatabaseManager.merge_from, src_file, key="merge",
+                       on_done=self._import_done, on_error=self._import_failed)
+
+    def _import_done(self, counts):
+        self.statusBar().clearMessage()
+        pixmap_cache.clear()
+        self.refresh_all()
+        QMessageBox.information(self, "Готово", "\n".join([
+            "Импорт завершён.",
+            f"Добавлено сортов: {counts['beans_added']}, дополнено: {counts['beans_updated']}",
+            f"Добавлено сессий: {counts['sessions_added']}, совпадений пропущено: {counts['sessions_skipped']}",
+        ]))
 
-            # replace existing db file with tmp copy
-            shutil.copy2(tmp_path, self.db_path)
-            try:
-                os.remove(tmp_path)
-            except Exception:
-                pass
+    def _import_failed(self, e):
+        self.statusBar().clearMessage()
+        QMessageBox.critical(self, "Ошибка импорта", str(e))
 
-            # recreate db manager and reload UI
-            self.db = DatabaseManager(self.db_path)
-            self.load_coffee_data()
-            self.load_brewing_data()
-            QMessageBox.information(self, "Готово", "Импорт завершён.")
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "Ошибка импорта", str(e))
-        except PermissionError:
-            QMessageBox.critical(self, "Ошибка доступа", "Файл занят другим процессом — закройте программы, использующие базу и попробуйте снова.")
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка импорта", str(e))
+    def _current_table(self):
+        return "sessions" if self.tabWidget.currentWidget() is self.brewingTab else "beans"
+
+    def _show_progress(self, title, done, total):
+        pct = done * 100 // total if total else 100
+        self.statusBar().showMessage(f"{title}: {pct}%")
+
+    def export_rows(self):
+        """Stream the current tab's table (beans or sessions) into a CSV / JSON Lines file."""
+        from coffeejournal import exchange
+        table = self._current_table()
+        target, _ = QFileDialog.getSaveFileName(self, "Экспорт таблицы", f"{table}.csv", exchange.FILE_FILTER)
+        if not target:
+            return
+        self.io.submit(exchange.export_rows, table, target, key="rows_export",
+                       on_progress=lambda d, t: self._show_progress("Экспорт", d, t),
+                       on_done=lambda n: self._rows_export_done(target, n), on_error=self._rows_export_failed)
+
+    def _rows_export_done(self, target, n):
+        self.statusBar().clearMessage()
+        QMessageBox.information(self, "Готово", f"Выгружено строк: {n}\n{target}")
+
+    def _rows_export_failed(self, e):
+        self.statusBar().clearMessage()
+        QMessageBox.critical(self, "Ошибка экспорта", str(e))
+
+    def import_rows(self):
+        """Stream rows from a CSV / JSON Lines file into the current tab's table."""
+        from coffeejournal import exchange
+        table = self._current_table()
+        src, _ = QFileDialog.getOpenFileName(self, "Импорт в таблицу", "", exchange.FILE_FILTER)
+        if not src:
+            return
+        upsert = table == "beans" and QMessageBox.question(
+            self, "Импорт", "Обновлять сорта с тем же названием и обжарщиком вместо добавления копий?",
+            QMessageBox.Yes | QMessageBox.No) == QMessageBox.Yes
+        self.io.submit(exchange.import_rows, table, src, upsert, key="rows_import",
+                       on_progress=lambda d, t: self._show_progress("Импорт", d, t),
+                       on_done=self._rows_import_done, on_error=self._rows_import_failed)
+
+    def _rows_import_done(self, res):
+        self.statusBar().clearMessage()
+        pixmap_cache.clear()
+        self.refresh_all()
+        lines = [f"Добавлено: {res.inserted}", f"Обновлено: {res.updated}", f"Ошибок: {len(res.failed)}"]
+        lines += [f"  строка {i + 1}: {err}" for i, err in res.failed[:10]]
+        QMessageBox.information(self, "Импорт завершён", "\n".join(lines))
+
+    def _rows_import_failed(self, e):
+        self.statusBar().clearMessage()
+        self.refresh_all()  # chunks committed before the error stay
+        QMessageBox.critical(self, "Ошибка импорта", str(e))
 
     # ---------- load data ----------
-    def load_coffee_data(self):
+    def _fetch_page(self, fn, key, model, after, limit, sort_key, descending, done):
+        def failed(e):
+            if model.page_failed():  # retried already: report it once, not on every scroll
+                logger.error("%s: %s", key, e)
+                self.statusBar().showMessage(f"Не удалось загрузить список: {e}")
+        self.io.submit(fn, after, limit, sort_key, descending, key=key,
+                       on_done=lambda res: done(*res), on_error=failed)
+
+    def _load_coffee_rows(self):
         try:
-            beans = self.db.get_all_coffee_beans()
-            self.coffee_model.update_data(beans)
+            self.io.cancel_key("coffee_search")
+            self.coffee_model.reload()
         except Exception as e:
             logger.exception("load_coffee_data: %s", e)
-        self.update_stats()
 
-    def load_brewing_data(self):
+    def _load_brewing_rows(self):
         try:
-            sessions = self.db.get_all_brewing_sessions()
-            self.brewing_model.update_data(sessions)
+            self.io.cancel_key("brewing_search")
+            self.brewing_model.reload()
         except Exception as e:
             logger.exception("load_brewing_data: %s", e)
+
+    def load_coffee_data(self):
+        self._load_coffee_rows()
+        self.update_stats()
+
+    def load_brewing_data(self):
+        self._load_brewing_rows()
+        self.update_stats()
+
+    def refresh_all(self):
+        """Reload both tables and, once the statistics tab has been opened, recompute
+        statistics in the background."""
+        self._load_coffee_rows()
+        self._load_brewing_rows()
+        if self._stats_wanted:
+            self._recompute_stats()
+
+    def _tab_changed(self, i):
+        if self.tabWidget.widget(i) is self.statsTab and not self._stats_wanted:
+            self._stats_wanted = True
+            self._recompute_stats()
+
+    def _recompute_stats(self):
+        changes = self.db.conn.total_changes
+        self.io.submit(DatabaseManager.recompute_stats, key="stats",
+                       on_done=lambda fresh: self._stats_recomputed(fresh, changes))
+
+    def _stats_recomputed(self, fresh, changes):
+        if self.db.reconcile_stats(fresh, changes) is None:
+            # something was written while it ran: recompute again rather than on this thread
+            self._recompute_stats()
+            return
         self.update_stats()
 
     # ---------- CRUD coffee ----------
     def add_coffee(self):
-        dlg = CoffeeDialog(self.db, parent=self)
+        dlg = CoffeeDialog(self.io, parent=self)
         if dlg.exec_() == QDialog.Accepted:
-            self.load_coffee_data()
+            self.coffee_model.insert_row(dlg.saved_row)
+            self.update_stats()
 
     def edit_coffee(self):
         try:
@@ -271,10 +423,14 @@ class MainWindow(QMainWindow):
                 return
             proxy_index = sel[0]
             src_index = self.coffee_proxy.mapToSource(proxy_index)
-            bean = self.coffee_model.coffee_beans[src_index.row()]
-            dlg = CoffeeDialog(self.db, coffee_data=bean, parent=self)
+            bean = self.coffee_model.row(src_index.row())
+            dlg = CoffeeDialog(self.io, coffee_data=bean, parent=self)
             if dlg.exec_() == QDialog.Accepted:
-                self.load_coffee_data()
+                row = dlg.saved_row
+                self.thumbnails.forget(row["id"])
+                self.coffee_model.update_row(row)
+                self.brewing_model.set_where("coffee_bean_id", row["id"], "coffee_name", row["name"])
+                self.update_stats()
         except Exception as e:
             logger.exception("edit_coffee: %s", e)
             QMessageBox.information(self, "Инфо", "Ошибка выбора записи")
@@ -287,27 +443,40 @@ class MainWindow(QMainWindow):
                 return
             proxy_index = sel[0]
             src_index = self.coffee_proxy.mapToSource(proxy_index)
-            bean = self.coffee_model.coffee_beans[src_index.row()]
+            bean = self.coffee_model.row(src_index.row())
             if QMessageBox.question(self, "Удалить", f"Удалить '{bean.get('name')}'?", QMessageBox.Yes | QMessageBox.No) == QMessageBox.Yes:
-                ok = self.db.delete_coffee_bean(bean["id"])
-                if ok:
-                    self.load_coffee_data()
-                    self.load_brewing_data()
-                else:
-                    QMessageBox.critical(self, "Ошибка", "Не удалось удалить")
+                self.io.submit(DatabaseManager.delete_coffee_bean, bean["id"],
+                               on_done=lambda ok: self._coffee_deleted(bean["id"], ok), on_error=self._delete_failed)
         except Exception as e:
             logger.exception("delete_coffee: %s", e)
             QMessageBox.critical(self, "Ошибка", "Ошибка при удалении")
 
+    def _coffee_deleted(self, bean_id, ok):
+        if not ok:
+            QMessageBox.critical(self, "Ошибка", "Не удалось удалить")
+            return
+        pixmap_cache.invalidate(bean_id)
+        self.coffee_model.remove_row(bean_id)
+        # its sessions went with it (ON DELETE CASCADE)
+        self.brewing_model.remove_where("coffee_bean_id", bean_id)
+        self.update_stats()
+
+    def _delete_failed(self, e):
+        logger.error("delete failed: %s", e)
+        QMessageBox.critical(self, "Ошибка", "Ошибка при удалении")
+
     # ---------- CRUD brewing ----------
     def add_brewing(self):
-        beans = self.db.get_all_coffee_beans()
+        self.io.submit(DatabaseManager.get_coffee_bean_choices, key="bean_choices", on_done=self._add_brewing_with)
+
+    def _add_brewing_with(self, beans):
         if not beans:
             QMessageBox.information(self, "Инфо", "Сначала добавьте сорт кофе")
             return
-        dlg = BrewingDialog(self.db, coffee_beans=beans, parent=self)
+        dlg = BrewingDialog(self.io, coffee_beans=beans, parent=self)
         if dlg.exec_() == QDialog.Accepted:
-            self.load_brewing_data()
+            self.brewing_model.insert_row(dlg.saved_row)
+            self.update_stats()
 
     def edit_brewing(self):
         try:
@@ -317,14 +486,19 @@ class MainWindow(QMainWindow):
                 return
             proxy_index = sel[0]
             src_index = self.brewing_proxy.mapToSource(proxy_index)
-            sess = self.brewing_model.brewing_sessions[src_index.row()]
-            dlg = BrewingDialog(self.db, coffee_beans=self.db.get_all_coffee_beans(), brewing_data=sess, parent=self)
-            if dlg.exec_() == QDialog.Accepted:
-                self.load_brewing_data()
+            sess = self.brewing_model.row(src_index.row())
+            self.io.submit(DatabaseManager.get_coffee_bean_choices, key="bean_choices",
+                           on_done=lambda beans: self._edit_brewing_with(sess, beans))
         except Exception as e:
             logger.exception("edit_brewing: %s", e)
             QMessageBox.critical(self, "Ошибка", "Ошибка при редактировании")
 
+    def _edit_brewing_with(self, sess, beans):
+        dlg = BrewingDialog(self.io, coffee_beans=beans, brewing_data=sess, parent=self)
+        if dlg.exec_() == QDialog.Accepted:
+            self.brewing_model.update_row(dlg.saved_row)
+            self.update_stats()
+
     def delete_brewing(self):
         try:
             sel = self.brewingTable.selectionModel().selectedRows()
@@ -333,17 +507,21 @@ class MainWindow(QMainWindow):
                 return
             proxy_index = sel[0]
             src_index = self.brewing_proxy.mapToSource(proxy_index)
-            s = self.brewing_model.brewing_sessions[src_index.row()]
+            s = self.brewing_model.row(src_index.row())
             if QMessageBox.question(self, "Удалить", "Удалить сессию?", QMessageBox.Yes | QMessageBox.No) == QMessageBox.Yes:
-                ok = self.db.delete_brewing_session(s["id"])
-                if ok:
-                    self.load_brewing_data()
-                else:
-                    QMessageBox.critical(self, "Ошибка", "Не удалось удалить")
+                self.io.submit(DatabaseManager.delete_brewing_session, s["id"],
+                               on_done=lambda ok: self._brewing_deleted(s["id"], ok), on_error=self._delete_failed)
         except Exception as e:
             logger.exception("delete_brewing: %s", e)
             QMessageBox.critical(self, "Ошибка", "Ошибка при удалении")
 
+    def _brewing_deleted(self, session_id, ok):
+        if not ok:
+            QMessageBox.critical(self, "Ошибка", "Не удалось удалить")
+            return
+        self.brewing_model.remove_row(session_id)
+        self.update_stats()
+
     # ---------- search ----------
     def search_coffee(self):
         q = ""
@@ -355,17 +533,16 @@ class MainWindow(QMainWindow):
         except Exception:
             q = ""
         if not q:
-            self.coffee_proxy.setFilterRegExp("")
             self.load_coffee_data()
             return
+        # each keystroke supersedes the previous query (dropped or interrupted on the worker)
+        self.io.cancel_key("coffee_page")
         if q.isdigit():
-            beans = self.db.get_all_coffee_beans()
-            matched = [b for b in beans if str(b.get("id")) == q]
-            self.coffee_model.update_data(matched)
-            self.coffee_proxy.setFilterRegExp("")
+            self.io.submit(DatabaseManager.get_coffee_bean, int(q), key="coffee_search",
+                           on_done=lambda bean: self.coffee_model.update_data([bean] if bean else []))
             return
-        self.coffee_proxy.setFilterKeyColumn(1)
-        self.coffee_proxy.setFilterRegExp(q)
+        self.io.submit(DatabaseManager.search_coffee_beans, q, key="coffee_search",
+                       on_done=self.coffee_model.update_data)
 
     def clear_coffee_search(self):
         try:
@@ -375,7 +552,6 @@ class MainWindow(QMainWindow):
                 self.coffeeSearchInput.clear()
         except Exception:
             pass
-        self.coffee_proxy.setFilterRegExp("")
         self.load_coffee_data()
 
     def search_brewing(self):
@@ -388,8 +564,9 @@ class MainWindow(QMainWindow):
         if not q:
             self.load_brewing_data()
             return
-        res = self.db.search_brewing_sessions(q)
-        self.brewing_model.update_data(res)
+        self.io.cancel_key("brewing_page")
+        self.io.submit(DatabaseManager.search_brewing_sessions, q, key="brewing_search",
+                       on_done=self.brewing_model.update_data)
 
     def clear_brewing_search(self):
         try:
@@ -424,14 +601,30 @@ class MainWindow(QMainWindow):
         if not sel:
             return
         src_index = self.coffee_proxy.mapToSource(sel[0])
-        bean = self.coffee_model.coffee_beans[src_index.row()]
+        bean = self.coffee_model.row(src_index.row())
         self._show_coffee_details(bean)
 
     # ---------- details (double click handlers) ----------
+    def _prefetch_visible_images(self):
+        view = getattr(self, "coffeeTable", None)
+        if view is None or not view.isVisible():
+            return
+        first = view.rowAt(0)
+        if first < 0:
+            return
+        last = view.rowAt(view.viewport().height() - 1)
+        last = self.coffee_proxy.rowCount() - 1 if last < 0 else last
+        ids = []
+        for r in range(first, last + 1):
+            bean = self.coffee_model.row(self.coffee_proxy.mapToSource(self.coffee_proxy.index(r, 0)).row())
+            if bean.get("has_image"):
+                ids.append(bean["id"])
+        pixmap_cache.prefetch(self.io, ids, 320)
+
     def on_coffee_double_clicked(self, proxy_index):
         try:
             src_index = self.coffee_proxy.mapToSource(proxy_index)
-            bean = self.coffee_model.coffee_beans[src_index.row()]
+            bean = self.coffee_model.row(src_index.row())
             self._show_coffee_details(bean)
         except Exception as e:
             logger.debug(e)
@@ -439,10 +632,9 @@ class MainWindow(QMainWindow):
     def on_brewing_double_clicked(self, proxy_index):
         try:
             src_index = self.brewing_proxy.mapToSource(proxy_index)
-            s = self.brewing_model.brewing_sessions[src_index.row()]
-            bean = next((b for b in self.db.get_all_coffee_beans() if b["id"] == s.get("coffee_bean_id")), None)
-            dlg = DetailsDialog(self)
-            dlg.set_image_from_bytes(bean.get("image") if bean else None)
+            s = self.brewing_model.row(src_index.row())
+            dlg = self._details_dialog()
+            dlg.load_bean_image(self.io, s.get("coffee_bean_id"))
             dlg.set_text("\n".join([
                 f"Кофе: {s.get('coffee_name') or '-'}",
                 f"Метод: {s.get('brew_method') or '-'}",
@@ -456,9 +648,14 @@ class MainWindow(QMainWindow):
         except Exception as e:
             logger.debug(e)
 
+    def _details_dialog(self) -> DetailsDialog:
+        if self._details is None:
+            self._details = DetailsDialog(self)
+        return self._details
+
     def _show_coffee_details(self, bean):
-        dlg = DetailsDialog(self)
-        dlg.set_image_from_bytes(bean.get("image"))
+        dlg = self._details_dialog()
+        dlg.load_bean_image(self.io, bean.get("id") if bean.get("has_image") else None)
         dlg.set_text("\n".join([
             f"Название: {bean.get('name')}",
             f"Обжарщик: {bean.get('roaster') or '-'}",
@@ -473,76 +670,30 @@ class MainWindow(QMainWindow):
         dlg.exec_()
 
     # ---------- statistics ----------
-    def _ensure_stats_text(self):
-        try:
-            if not hasattr(self, "statsText") or self.statsText is None:
-                tab_widget = getattr(self, "tabs", None) or getattr(self, "tabWidget", None)
-                if tab_widget:
-                    last_index = tab_widget.count() - 1
-                    w = tab_widget.widget(last_index)
-                    te = QTextEdit()
-                    te.setReadOnly(True)
-                    layout = w.layout()
-                    if layout:
-                        layout.addWidget(te)
-                    else:
-                        container = QWidget()
-                        v = QVBoxLayout(container)
-                        v.addWidget(te)
-                        tab_widget.removeTab(last_index)
-                        tab_widget.insertTab(last_index, container, tab_widget.tabText(last_index))
-                    self.statsText = te
-        except Exception:
-            pass
-
     def update_stats(self):
+        if not self.db.stats_ready:
+            return  # the background recompute renders them when it lands
         try:
-            beans = self.db.get_all_coffee_beans()
-            sessions = self.db.get_all_brewing_sessions()
-
-            total_beans = len(beans)
-            total_sessions = len(sessions)
-            roast_counts = {}
-            for b in beans:
-                lvl = b.get("roast_level") or "Unknown"
-                roast_counts[lvl] = roast_counts.get(lvl, 0) + 1
-
-            with_images = sum(1 for b in beans if b.get("image"))
+            st = self.db.stats.snapshot()
+            total_beans = st["total_beans"]
+            with_images = st["beans_with_images"]
             images_pct = (with_images / total_beans * 100) if total_beans else 0
-            prices = [float(b.get("price")) for b in beans if b.get("price") not in (None, "")]
-            avg_price = (sum(prices) / len(prices)) if prices else 0
-            ratings = [float(b.get("rating")) for b in beans if b.get("rating") not in (None, "")]
-            avg_rating = (sum(ratings) / len(ratings)) if ratings else 0
-
-            method_counts = {}
-            for s in sessions:
-                m = s.get("brew_method") or "Unknown"
-                method_counts[m] = method_counts.get(m, 0) + 1
-            top_methods = sorted(method_counts.items(), key=lambda x: -x[1])[:5]
-
-            brew_times = [int(s.get("brew_time")) for s in sessions if s.get("brew_time") not in (None, "")]
-            avg_brew = (sum(brew_times) / len(brew_times)) if brew_times else 0
-
-            coffee_weights = [float(s.get("coffee_weight")) for s in sessions if s.get("coffee_weight") not in (None, "")]
-            water_weights = [float(s.get("water_weight")) for s in sessions if s.get("water_weight") not in (None, "")]
-            avg_cw = (sum(coffee_weights) / len(coffee_weights)) if coffee_weights else 0
-            avg_ww = (sum(water_weights) / len(water_weights)) if water_weights else 0
 
             lines = [
                 f"Всего сортов: {total_beans}",
-                f"Всего сессий: {total_sessions}",
+                f"Всего сессий: {st['total_sessions']}",
                 f"С изображениями: {with_images} ({images_pct:.1f}%)",
-                f"Средняя цена: {avg_price:.2f} руб | Средний рейтинг сортов: {avg_rating:.2f}",
+                f"Средняя цена: {st['avg_price']:.2f} руб | Средний рейтинг сортов: {st['avg_bean_rating']:.2f}",
                 "",
                 "Распределение по уровню обжарки:",
             ]
-            for k, v in roast_counts.items():
+            for k, v in st["roast_levels"]:
                 lines.append(f"  • {k}: {v}")
             lines += ["", "Топ-5 методов заваривания:"]
-            for m, c in top_methods:
+            for m, c in st["top_methods"]:
                 lines.append(f"  • {m}: {c}")
-            lines += ["", f"Среднее время заваривания: {avg_brew:.1f} сек",
-                      f"Средний вес кофе: {avg_cw:.1f} г | воды: {avg_ww:.1f} г"]
+            lines += ["", f"Среднее время заваривания: {st['avg_brew_time']:.1f} сек",
+                      f"Средний вес кофе: {st['avg_coffee_weight']:.1f} г | воды: {st['avg_water_weight']:.1f} г"]
 
             stats_text = "\n".join(lines)
             if hasattr(self, "statsText") and self.statsText:
@@ -553,7 +704,7 @@ class MainWindow(QMainWindow):
     # ---------- keyboard ----------
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_F5:
-            self.load_coffee_data(); self.load_brewing_data()
+            self.refresh_all()
         elif event.key() == Qt.Key_Delete:
             try:
                 cur = self.tabs.currentIndex()
@@ -564,10 +715,22 @@ class MainWindow(QMainWindow):
 
 
 def main():
+    profile = StartupProfile("--profile-startup" in sys.argv)
+    profile.mark("imports")
     app = QApplication(sys.argv)
     app.setApplicationName("Coffee Journal")
-    win = MainWindow()
+    profile.mark("QApplication")
+    win = MainWindow(profile, trace_queries="--trace-queries" in sys.argv)
     win.show()
+    profile.mark("window shown")
+    if profile.enabled:
+        # report once the first page of beans is in the table, then quit
+        def first_page():
+            profile.mark("first beans page")
+            print(profile.report())
+            win.close()  # stops the decode threads before the window is deleted
+            app.quit()
+        win.coffee_model.modelReset.connect(first_page)
     sys.exit(app.exec_())
 
 
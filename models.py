@@ -1,14 +1,122 @@
-from PyQt5.QtCore import QAbstractTableModel, Qt, QModelIndex
+from array import array
+from operator import itemgetter
+
+from PyQt5.QtCore import QAbstractTableModel, Qt, QModelIndex, QSortFilterProxyModel
 from PyQt5.QtGui import QColor
 
-class CoffeeBeansTableModel(QAbstractTableModel):
+from coffeejournal import BEAN_ROW_FIELDS, SESSION_ROW_FIELDS
+
+GOOD_RATING_BG = QColor(144, 238, 144)
+OK_RATING_BG = QColor(255, 255, 224)
+PAGE_RETRIES = 1  # a failed page request is repeated this many times before paging stops
+
+_rating_text_cache = {}
+
+
+def _rating_text(r):
+    # few distinct ratings exist, so the formatted strings are shared between rows
+    if not r:
+        return "-"
+    try:
+        return _rating_text_cache[r]
+    except KeyError:
+        return _rating_text_cache.setdefault(r, f"{r:.1f}")
+
+
+def _rating_background(r):
+    r = r or 0
+    if r >= 4.5: return GOOD_RATING_BG
+    if r >= 4.0: return OK_RATING_BG
+    return None
+
+
+class RowView:
+    """Read-only dict-like view of one stored row (what dialogs and handlers receive)."""
+    __slots__ = ("_fields", "_values")
+
+    def __init__(self, fields, values):
+        self._fields = fields
+        self._values = values
+
+    def get(self, key, default=None):
+        i = self._fields.get(key)
+        return default if i is None else self._values[i]
+
+    def __getitem__(self, key):
+        return self._values[self._fields[key]]
+
+    def __contains__(self, key):
+        return key in self._fields
+
+    def keys(self):
+        return self._fields.keys()
+
+    def to_dict(self):
+        return dict(zip(self._fields, self._values))
+
+
+class _RowStoreModel(QAbstractTableModel):
+    """Rows are kept as tuples in `fields` order next to their precomputed display tuple and
+    rating background, so data() is an index lookup instead of formatting on every paint.
+
+    Row lookups go through dicts: id -> position (rebuilt after an insert or removal shifts the
+    rows below it) and, for the `indexed` fields, value -> {ids of the rows holding it}."""
+    fields = ()
+    headers = []
+    centered = ()
+    rating_col = 5
+    indexed = ()  # fields remove_where / set_where look up without a scan
+
     def __init__(self, data=None):
         super().__init__()
-        self.coffee_beans = data or []
-        self.headers = ["ID", "Название", "Обжарщик", "Уровень обжарки", "Происхождение", "Рейтинг"]
+        self._field_index = {f: i for i, f in enumerate(self.fields)}
+        self._clear()
+        if data:
+            self._append(self._as_tuples(data))
+
+    def _format(self, v):
+        raise NotImplementedError
+
+    def _as_tuples(self, rows):
+        # accepts dict rows (search results, callers outside the models) or projection tuples
+        if rows and isinstance(rows[0], dict):
+            return [tuple(r.get(f) for f in self.fields) for r in rows]
+        return rows
+
+    def _append(self, rows):
+        fmt = self._format; rating = self._field_index["rating"]
+        row_of = self._row_of
+        for v in rows:
+            if row_of is not None:
+                row_of[v[0]] = len(self._values)
+            self._ids.append(v[0])
+            self._values.append(v)
+            self._display.append(fmt(v))
+            self._background.append(_rating_background(v[rating]))
+            self._index(v)
+
+    def _clear(self):
+        self._ids = array("q"); self._values = []; self._display = []; self._background = []
+        self._row_of = {}  # id -> position; None until rebuilt after rows shifted
+        self._by_value = {self._field_index[f]: {} for f in self.indexed}
+
+    def _index(self, v):
+        for f, ids in self._by_value.items():
+            ids.setdefault(v[f], set()).add(v[0])
+
+    def _unindex(self, v):
+        for f, ids in self._by_value.items():
+            same = ids.get(v[f])
+            if same is not None:
+                same.discard(v[0])
+                if not same:
+                    del ids[v[f]]
+
+    def row(self, i) -> RowView:
+        return RowView(self._field_index, self._values[i])
 
     def rowCount(self, parent=QModelIndex()):
-        return len(self.coffee_beans)
+        return 0 if parent.isValid() else len(self._values)
 
     def columnCount(self, parent=QModelIndex()):
         return len(self.headers)
@@ -16,22 +124,9 @@ class CoffeeBeansTableModel(QAbstractTableModel):
     def data(self, index, role=Qt.DisplayRole):
         if not index.isValid(): return None
         row = index.row(); col = index.column()
-        if not (0 <= row < len(self.coffee_beans)): return None
-        bean = self.coffee_beans[row]
-        if role == Qt.DisplayRole:
-            if col == 0: return bean.get("id")
-            if col == 1: return bean.get("name", "")
-            if col == 2: return bean.get("roaster") or "-"
-            if col == 3: return bean.get("roast_level") or "-"
-            if col == 4: return bean.get("origin") or "-"
-            if col == 5:
-                r = bean.get("rating")
-                return f"{r:.1f}" if r else "-"
-        if role == Qt.BackgroundRole and col == 5:
-            rating = bean.get("rating") or 0
-            if rating >= 4.5: return QColor(144,238,144)
-            if rating >= 4.0: return QColor(255,255,224)
-        if role == Qt.TextAlignmentRole and col in (0,5): return Qt.AlignCenter
+        if role == Qt.DisplayRole: return self._display[row][col]
+        if role == Qt.BackgroundRole and col == self.rating_col: return self._background[row]
+        if role == Qt.TextAlignmentRole and col in self.centered: return Qt.AlignCenter
         return None
 
     def headerData(self, section, orientation, role=Qt.DisplayRole):
@@ -41,45 +136,293 @@ class CoffeeBeansTableModel(QAbstractTableModel):
 
     def update_data(self, new_data):
         self.beginResetModel()
-        self.coffee_beans = new_data or []
+        self._clear()
+        self._append(self._as_tuples(new_data or []))
         self.endResetModel()
 
-class BrewingSessionsTableModel(QAbstractTableModel):
-    def __init__(self, data=None):
+    # ---------- single-row edits (no reset: selection, scroll and sort survive) ----------
+    def find_row(self, row_id) -> int:
+        if self._row_of is None:
+            self._row_of = dict(zip(self._ids, range(len(self._ids))))
+        return self._row_of.get(row_id, -1)
+
+    def _rows_where(self, field, value):
+        """Positions of the loaded rows whose `field` equals value, top to bottom."""
+        f = self._field_index[field]
+        ids = self._by_value.get(f)
+        if ids is not None:
+            return sorted(map(self.find_row, ids.get(value, ())))
+        return [i for i, v in enumerate(self._values) if v[f] == value]
+
+    def _set(self, i, v):
+        old = self._values[i]
+        self._unindex(old)
+        if self._row_of is not None and old[0] != v[0]:
+            self._row_of.pop(old[0], None)
+            self._row_of[v[0]] = i
+        self._ids[i] = v[0]
+        self._values[i] = v
+        self._display[i] = self._format(v)
+        self._background[i] = _rating_background(v[self._field_index["rating"]])
+        self._index(v)
+
+    def _remove(self, i):
+        self.beginRemoveRows(QModelIndex(), i, i)
+        self._unindex(self._values[i])
+        del self._ids[i]; del self._values[i]; del self._display[i]; del self._background[i]
+        self._row_of = None
+        self.endRemoveRows()
+
+    def insert_row(self, row, at=0):
+        if not row:
+            return
+        v, = self._as_tuples([row])
+        self.beginInsertRows(QModelIndex(), at, at)
+        self._ids.insert(at, v[0]); self._values.insert(at, v)
+        self._display.insert(at, self._format(v)); self._background.insert(at, None)
+        self._row_of = None
+        self._set(at, v)
+        self.endInsertRows()
+
+    def update_row(self, row):
+        if not row:
+            return
+        v, = self._as_tuples([row])
+        i = self.find_row(v[0])
+        if i < 0:
+            return
+        self._set(i, v)
+        self.dataChanged.emit(self.index(i, 0), self.index(i, self.columnCount() - 1))
+
+    def remove_row(self, row_id):
+        i = self.find_row(row_id)
+        if i >= 0:
+            self._remove(i)
+
+    def remove_where(self, field, value):
+        """Drop every loaded row whose `field` equals value (e.g. sessions of a deleted bean)."""
+        for i in reversed(self._rows_where(field, value)):
+            self._remove(i)
+
+    def set_where(self, field, value, target, new_value):
+        """Set `target` on every loaded row whose `field` equals value (e.g. a renamed bean)."""
+        t = self._field_index[target]
+        for i in self._rows_where(field, value):
+            v = self._values[i]
+            if v[t] != new_value:
+                self._set(i, v[:t] + (new_value,) + v[t + 1:])
+                self.dataChanged.emit(self.index(i, 0), self.index(i, self.columnCount() - 1))
+
+
+class CoffeeBeansTableModel(_RowStoreModel):
+    """With a thumbnail loader set, a trailing photo column shows each bean's photo through
+    Qt.DecorationRole; icons are requested as rows are painted, i.e. only for visible rows."""
+    fields = BEAN_ROW_FIELDS
+    headers = ["ID", "Название", "Обжарщик", "Уровень обжарки", "Происхождение", "Рейтинг"]
+    centered = (0, 5)
+    thumb_col = len(headers)
+    thumb_header = "Фото"
+
+    _shown = itemgetter(*(BEAN_ROW_FIELDS.index(f) for f in ("id", "name", "roaster", "roast_level", "origin", "rating")))
+    _has_image = BEAN_ROW_FIELDS.index("has_image")
+
+    _thumbs = None
+
+    def _format(self, v):
+        id_, name, roaster, roast_level, origin, rating = self._shown(v)
+        return (id_, name or "", roaster or "-", roast_level or "-", origin or "-", _rating_text(rating))
+
+    def set_thumbnail_loader(self, loader):
+        """Show the photo column fed by a pixmaps.ThumbnailLoader, or hide it with None."""
+        if loader is self._thumbs:
+            return
+        if self._thumbs is not None:
+            self._thumbs.ready.disconnect(self._thumbnail_ready)
+        self.beginResetModel()
+        self._thumbs = loader
+        self.endResetModel()
+        if loader is not None:
+            loader.ready.connect(self._thumbnail_ready)
+
+    def _thumbnail_ready(self, bean_id):
+        i = self.find_row(bean_id)
+        if i >= 0:
+            idx = self.index(i, self.thumb_col)
+            self.dataChanged.emit(idx, idx, [Qt.DecorationRole])
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.headers) + (self._thumbs is not None)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if index.isValid() and index.column() == self.thumb_col:
+            row = index.row()
+            if role == Qt.DecorationRole and self._values[row][self._has_image]:
+                return self._thumbs.pixmap(self._ids[row])
+            return None
+        return super().data(index, role)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole and section == self.thumb_col:
+            return self.thumb_header
+        return super().headerData(section, orientation, role)
+
+
+class BrewingSessionsTableModel(_RowStoreModel):
+    fields = SESSION_ROW_FIELDS
+    headers = ["ID", "Кофе", "Метод", "Температура", "Время", "Оценка", "Дата"]
+    centered = (0, 3, 4, 5)
+    indexed = ("coffee_bean_id",)  # a bean's sessions, when it is renamed or deleted
+
+    _shown = itemgetter(*(SESSION_ROW_FIELDS.index(f) for f in
+                          ("id", "coffee_name", "brew_method", "water_temp", "brew_time", "rating", "created_at")))
+
+    def _format(self, v):
+        id_, coffee_name, method, temp, brew_time, rating, created = self._shown(v)
+        return (id_, coffee_name or "-", method or "-",
+                f"{temp}°C" if temp else "-", f"{brew_time}с" if brew_time else "-",
+                _rating_text(rating), created[:10] if created else "-")
+
+
+def _sort_value(v):
+    # NULLs first, then numbers, then text, as SQLite orders them
+    if v is None: return (0, 0)
+    if isinstance(v, (int, float)): return (1, v)
+    return (2, str(v))
+
+
+class _PagedMixin:
+    """Rows are pulled from SQLite one keyset page at a time as the view scrolls.
+
+    fetch_page(after, limit, sort_key, descending, done) requests a DatabaseManager page and
+    calls done(rows, cursor), possibly later from a background query. sort() re-queries in
+    the new order instead of sorting in a proxy. Pages that arrive after a reload, sort or
+    update_data() started a new generation are dropped.
+    """
+    sort_keys = ()  # column -> sort key understood by fetch_page, None = not sortable
+
+    def _init_paging(self, fetch_page, page_size):
+        self._fetch_page = fetch_page
+        self._page_size = page_size
+        self._order = ("created_at", True)
+        self._cursor = None
+        self._exhausted = True
+        self._static = False
+        self._generation = 0
+        self._loading = False
+        self._replacing = False
+        self._failures = 0
+
+    def _request(self, replace):
+        self._loading = True
+        self._replacing = replace
+        gen = self._generation
+        self._fetch_page(None if replace else self._cursor, self._page_size, *self._order,
+                         lambda rows, cursor: self._on_page(gen, replace, rows, cursor))
+
+    def _on_page(self, gen, replace, rows, cursor):
+        if gen != self._generation:
+            return
+        self._loading = False
+        self._failures = 0
+        self._cursor = cursor
+        self._exhausted = len(rows) < self._page_size
+        if replace:
+            # the old rows stay visible until the first page of the new order is in
+            self.beginResetModel()
+            self._clear()
+            self._append(rows)
+            self.endResetModel()
+        elif rows:
+            n = len(self._values)
+            self.beginInsertRows(QModelIndex(), n, n + len(rows) - 1)
+            self._append(rows)
+            self.endInsertRows()
+
+    def reload(self):
+        self._generation += 1
+        self._static = False
+        self._exhausted = False
+        self._failures = 0
+        self._request(replace=True)
+
+    def page_failed(self) -> bool:
+        """A page request failed: repeat it up to PAGE_RETRIES times, then stop paging until the
+        next reload. Returns True once it has given up, for the caller to report the error."""
+        self._loading = False
+        self._failures += 1
+        if self._failures > PAGE_RETRIES:
+            self._exhausted = True
+            return True
+        self._request(self._replacing)
+        return False
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted and not self._loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        self._request(replace=False)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        key = self.sort_keys[column] if 0 <= column < len(self.sort_keys) else None
+        if key is None:
+            return
+        self._order = (key, order == Qt.DescendingOrder)
+        if self._static:
+            # a search result is small enough to sort here
+            i = self._field_index[key]
+            rows = sorted(self._values, key=lambda v: _sort_value(v[i]), reverse=self._order[1])
+            self.beginResetModel()
+            self._clear()
+            self._append(rows)
+            self.endResetModel()
+        else:
+            self.reload()
+
+    def insert_row(self, row, at=0):
+        # a row that sorts past the cursor arrives with a later page; inserting it now would duplicate it
+        if row and not self._exhausted and self._cursor is not None:
+            v, = self._as_tuples([row])
+            key, descending = self._order
+            k = v[self._field_index[key]]
+            if k is None:
+                k = "" if isinstance(self._cursor[0], str) else 0
+            try:
+                if ((k, v[0]) < self._cursor) if descending else ((k, v[0]) > self._cursor):
+                    return
+            except TypeError:
+                pass
+        super().insert_row(row, at)
+
+    def update_data(self, new_data):
+        # a fixed result set (search), nothing more to page in
+        self._generation += 1
+        self._loading = False
+        self._cursor = None
+        self._exhausted = True
+        self._static = True
+        super().update_data(new_data)
+
+
+class PagedCoffeeBeansTableModel(_PagedMixin, CoffeeBeansTableModel):
+    sort_keys = ("id", "name", "roaster", "roast_level", "origin", "rating")
+
+    def __init__(self, fetch_page, page_size=200):
         super().__init__()
-        self.brewing_sessions = data or []
-        self.headers = ["ID", "Кофе", "Метод", "Температура", "Время", "Оценка", "Дата"]
+        self._init_paging(fetch_page, page_size)
 
-    def rowCount(self,parent=QModelIndex()): return len(self.brewing_sessions)
-    def columnCount(self,parent=QModelIndex()): return len(self.headers)
 
-    def data(self,index,role=Qt.DisplayRole):
-        if not index.isValid(): return None
-        row=index.row(); col=index.column()
-        if not (0<=row<len(self.brewing_sessions)): return None
-        s=self.brewing_sessions[row]
-        if role==Qt.DisplayRole:
-            if col==0: return s.get("id")
-            if col==1: return s.get("coffee_name") or "-"
-            if col==2: return s.get("brew_method") or "-"
-            if col==3: return f"{s.get('water_temp')}°C" if s.get('water_temp') else "-"
-            if col==4: return f"{s.get('brew_time')}с" if s.get('brew_time') else "-"
-            if col==5:
-                r=s.get("rating")
-                return f"{r:.1f}" if r else "-"
-            if col==6:
-                cdate=s.get("created_at")
-                return cdate[:10] if cdate else "-"
-        if role==Qt.BackgroundRole and col==5:
-            rating = s.get("rating") or 0
-            if rating >= 4.5: return QColor(144,238,144)
-            if rating >= 4.0: return QColor(255,255,224)
-        if role==Qt.TextAlignmentRole and col in (0,3,4,5): return Qt.AlignCenter
-        return None
+class PagedBrewingSessionsTableModel(_PagedMixin, BrewingSessionsTableModel):
+    sort_keys = ("id", "coffee_name", "brew_method", "water_temp", "brew_time", "rating", "created_at")
 
-    def headerData(self,section,orientation,role=Qt.DisplayRole):
-        if orientation==Qt.Horizontal and role==Qt.DisplayRole: return self.headers[section]
-        return None
+    def __init__(self, fetch_page, page_size=200):
+        super().__init__()
+        self._init_paging(fetch_page, page_size)
+
+
+class SqlSortProxyModel(QSortFilterProxyModel):
+    """Pass-through proxy that hands sort() to the source model, which sorts in SQL."""
 
-    def update_data(self,new_data):
-        self.beginResetModel(); self.brewing_sessions=new_data or []; self.endResetModel()
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sourceModel().sort(column, order)
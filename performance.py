@@ -0,0 +1,120 @@
+# performance.py
+"""The "Производительность" tab: the DatabaseManager's query counters, refreshed live.
+
+Rows are (call site, statement) pairs from db.query_log, most total time first; below them
+are the latest slow statements with their query plans. The tab only polls while it is shown.
+"""
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QCheckBox, QDoubleSpinBox, QPushButton,
+    QTableWidget, QTableWidgetItem, QPlainTextEdit, QHeaderView, QSplitter
+)
+
+REFRESH_MS = 1000
+SQL_SHOWN = 120  # characters of a statement in the table; the tooltip has all of it
+COLUMNS = ("Место вызова", "Запрос", "Вызовы", "Всего, мс", "Среднее, мс", "Макс, мс", "Строк", "Байт", "Медленных")
+NUMERIC = ("calls", "total_ms", "avg_ms", "max_ms", "rows", "bytes", "slow")
+
+
+def _one_line(sql):
+    return " ".join(sql.split())
+
+
+def _number(v):
+    return f"{v:.1f}" if isinstance(v, float) else f"{v:,}".replace(",", " ")
+
+
+class PerformancePanel(QWidget):
+    def __init__(self, query_log, parent=None):
+        super().__init__(parent)
+        self.log = query_log
+        self._shown_slow = None
+
+        top = QHBoxLayout()
+        self.enabled = QCheckBox("Собирать статистику запросов")
+        self.enabled.setChecked(query_log.enabled)
+        self.enabled.toggled.connect(self._set_enabled)
+        top.addWidget(self.enabled)
+        top.addWidget(QLabel("Медленный запрос от, мс:"))
+        self.threshold = QDoubleSpinBox()
+        self.threshold.setRange(0.1, 60000)
+        self.threshold.setDecimals(1)
+        self.threshold.setValue(query_log.slow_ms)
+        self.threshold.valueChanged.connect(self._set_threshold)
+        top.addWidget(self.threshold)
+        self.reset_btn = QPushButton("Сбросить")
+        self.reset_btn.clicked.connect(self._reset)
+        top.addWidget(self.reset_btn)
+        top.addStretch()
+
+        self.totals = QLabel()
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        self.slow = QPlainTextEdit(readOnly=True)
+        self.slow.setPlaceholderText("Медленных запросов нет")
+
+        split = QSplitter(Qt.Vertical)
+        split.addWidget(self.table)
+        split.addWidget(self.slow)
+        split.setStretchFactor(0, 3)
+        split.setStretchFactor(1, 1)
+
+        layout = QVBoxLayout(self)
+        layout.addLayout(top)
+        layout.addWidget(self.totals)
+        layout.addWidget(split)
+
+        self._timer = QTimer(self, interval=REFRESH_MS)
+        self._timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self._timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self._timer.stop()
+        super().hideEvent(event)
+
+    def _set_enabled(self, on):
+        self.log.enabled = on
+
+    def _set_threshold(self, ms):
+        self.log.slow_ms = ms
+
+    def _reset(self):
+        self.log.reset()
+        self.refresh()
+
+    def refresh(self):
+        t = self.log.totals()
+        self.totals.setText(f"Запросов: {_number(t['statements'])}   время: {t['total_ms']:.1f} мс   "
+                            f"строк: {_number(t['rows'])}   байт: {_number(t['bytes'])}   медленных: {t['slow']}")
+        rows = self.log.snapshot()
+        self.table.setUpdatesEnabled(False)
+        self.table.setRowCount(len(rows))
+        for r, d in enumerate(rows):
+            sql = _one_line(d["sql"])
+            cells = [d["site"], sql[:SQL_SHOWN]] + [_number(d[k]) for k in NUMERIC]
+            for c, text in enumerate(cells):
+                item = self.table.item(r, c)
+                if item is None:
+                    item = QTableWidgetItem()
+                    if c >= 2:
+                        item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                    self.table.setItem(r, c, item)
+                item.setText(text)
+            self.table.item(r, 1).setToolTip(sql)
+        self.table.setUpdatesEnabled(True)
+
+        slow = list(self.log.slow_queries)
+        key = (len(slow), slow[-1]["time"] if slow else None, slow[-1]["ms"] if slow else None)
+        if key != self._shown_slow:  # the text box keeps its scroll position between refreshes
+            self._shown_slow = key
+            self.slow.setPlainText("\n\n".join(
+                f"{q['time']}  {q['ms']:.1f} мс, строк: {q['rows']}, {q['site']}\n{_one_line(q['sql'])}"
+                + "".join(f"\n  план: {p}" for p in q["plan"]) for q in reversed(slow)))
@@ -0,0 +1,239 @@
+# pixmaps.py
+"""Decoded bean photos shared by the dialogs.
+
+PixmapCache keeps QPixmaps keyed by (bean id, image hash, size) and drops the least recently
+used ones once their pixel data passes `max_bytes`. A replaced photo has a new hash, so a stale
+entry is never hit; invalidate(bean_id) frees a written bean's entries right away. load() and
+prefetch() read and decode thumbnails on the DatabaseWorker thread (into QImages, QPixmap is
+GUI-thread only), so a dialog never waits for the database.
+
+ThumbnailLoader feeds the coffee table's photo column from a small QThreadPool: rows ask for
+their icon as they are painted, and the most recently painted rows are decoded first.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, QBuffer, QByteArray, QIODevice, pyqtSignal
+from PyQt5.QtGui import QPixmap, QImage, QImageReader
+
+logger = logging.getLogger(__name__)
+
+CACHE_BYTES = 48 * 1024 * 1024
+TABLE_ICON_SIDE = 48      # photo column icons, decoded from the smallest stored thumbnail
+TABLE_ICON_SOURCE = 200
+DECODE_THREADS = 2
+MAX_PENDING = 128         # rows scrolled past longer ago than this are not decoded
+
+
+def _cost(pix) -> int:
+    return pix.width() * pix.height() * max(pix.depth(), 8) // 8
+
+
+class PixmapCache:
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self._items = OrderedDict()  # (bean_id, hash, size) -> QPixmap, least recent first
+        self._sizes = {}             # (bean_id, size) -> hash cached for it
+
+    def get(self, key) -> Optional[QPixmap]:
+        pix = self._items.get(key)
+        if pix is not None:
+            self._items.move_to_end(key)
+        return pix
+
+    def put(self, key, pix):
+        bean_id, h, size = key
+        old = self._sizes.get((bean_id, size))
+        if old is not None:
+            self._drop((bean_id, old, size))
+        if _cost(pix) > self.max_bytes:
+            return
+        self._items[key] = pix
+        self._sizes[(bean_id, size)] = h
+        self.used += _cost(pix)
+        while self.used > self.max_bytes:
+            self._drop(next(iter(self._items)))
+
+    def _drop(self, key):
+        pix = self._items.pop(key, None)
+        if pix is not None:
+            self.used -= _cost(pix)
+            del self._sizes[(key[0], key[2])]
+
+    def has_bean(self, bean_id, size) -> bool:
+        return (bean_id, size) in self._sizes
+
+    def current(self, bean_id, size) -> Optional[QPixmap]:
+        """Whatever is cached for the bean at `size`, without looking its image hash up."""
+        h = self._sizes.get((bean_id, size))
+        return None if h is None else self.get((bean_id, h, size))
+
+    def invalidate(self, bean_id):
+        for key in [k for k in self._items if k[0] == bean_id]:
+            self._drop(key)
+
+    def clear(self):
+        self._items.clear(); self._sizes.clear(); self.used = 0
+
+    def load(self, io, bean_id, size, on_done, key):
+        """Call on_done(pixmap or None) with the bean's photo at one of images.THUMB_SIZES: right
+        away when cached, otherwise once the worker has read and decoded it. A newer load with
+        the same `key` supersedes a pending one."""
+        pix = self.current(bean_id, size)
+        if pix is not None:
+            on_done(pix)
+            return
+        io.submit(decode_thumbnails, [bean_id], size, key=key, on_done=lambda decoded: on_done(self._store(decoded)))
+
+    def prefetch(self, io, bean_ids, size):
+        """Decode the thumbnails of beans not cached yet on the worker; a newer prefetch
+        supersedes a pending one."""
+        ids = [i for i in bean_ids if not self.has_bean(i, size)]
+        if ids:
+            io.submit(decode_thumbnails, ids, size, key="pixmap_prefetch", on_done=self._prefetched)
+
+    def _store(self, decoded) -> Optional[QPixmap]:
+        pix = None
+        for key, img in decoded:
+            pix = self._items.get(key)
+            if pix is None:
+                pix = QPixmap.fromImage(img)
+                self.put(key, pix)
+        return pix
+
+    def _prefetched(self, decoded):
+        self._store(decoded)
+
+
+def decode_thumbnails(db, bean_ids, size):
+    """[(cache key, QImage)] for the beans that have a photo; runs off the GUI thread."""
+    out = []
+    for bean_id in bean_ids:
+        # the key is read first: a photo replaced in between lands under the old, unused key
+        h = db.get_bean_image_key(bean_id)
+        if h is None:
+            continue
+        img = QImage.fromData(db.get_bean_thumbnail(bean_id, size) or b"")
+        if not img.isNull():
+            out.append(((bean_id, h, size), img))
+    return out
+
+
+def decode_scaled(data, side) -> Optional[QImage]:
+    """Decode encoded image bytes straight to fit a side x side box; safe off the GUI thread."""
+    buf = QBuffer()
+    buf.setData(QByteArray(data))
+    buf.open(QIODevice.ReadOnly)
+    r = QImageReader(buf)
+    size = r.size()
+    if size.isValid() and (size.width() > side or size.height() > side):
+        r.setScaledSize(size.scaled(side, side, Qt.KeepAspectRatio))
+    img = r.read()
+    return None if img.isNull() else img
+
+
+class _DecodeTask(QRunnable):
+    def __init__(self, loader):
+        super().__init__()
+        self.loader = loader
+
+    def run(self):
+        loader = self.loader
+        while True:
+            bean_id = loader._next()
+            if bean_id is None:
+                return
+            result = None
+            try:
+                h = loader.db.get_bean_image_key(bean_id)
+                data = loader.db.get_bean_thumbnail(bean_id, loader.source) if h else None
+                img = decode_scaled(data, loader.side) if data else None
+                if img is not None:
+                    result = ((bean_id, h, loader.side), img)
+            except Exception as e:
+                logger.warning("bean %s: thumbnail not decoded: %s", bean_id, e)
+            loader._decoded.emit(bean_id, result)
+
+
+class ThumbnailLoader(QObject):
+    """Decodes table icons on a thread pool into pixmap_cache.
+
+    pixmap(bean_id) returns the cached icon or None and queues the decode; `ready(bean_id)`
+    is emitted on the GUI thread once it is cached (or turned out to have no usable photo).
+    """
+    ready = pyqtSignal(int)
+    _decoded = pyqtSignal(int, object)
+
+    def __init__(self, db, side=TABLE_ICON_SIDE, source=TABLE_ICON_SOURCE, parent=None):
+        super().__init__(parent)
+        self.db = db; self.side = side; self.source = source
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(DECODE_THREADS)
+        self._lock = threading.Lock()
+        self._pending = OrderedDict()  # bean ids, most recently requested last; guarded by _lock
+        self._inflight = set()
+        self._running = 0
+        self._failed = set()           # beans without a decodable photo, not retried until forget()
+        self._stale = set()            # rewritten while their decode was running
+        self._decoded.connect(self._on_decoded)
+
+    def pixmap(self, bean_id) -> Optional[QPixmap]:
+        pix = pixmap_cache.current(bean_id, self.side)
+        if pix is None and bean_id not in self._failed:
+            self.request(bean_id)
+        return pix
+
+    def request(self, bean_id):
+        with self._lock:
+            if bean_id in self._inflight:
+                return
+            self._pending[bean_id] = None
+            self._pending.move_to_end(bean_id)
+            while len(self._pending) > MAX_PENDING:
+                self._pending.popitem(last=False)
+            start = self._running < DECODE_THREADS
+            if start:
+                self._running += 1
+        if start:
+            self.pool.start(_DecodeTask(self))
+
+    def _next(self):
+        with self._lock:
+            if not self._pending:
+                self._running -= 1
+                return None
+            bean_id, _ = self._pending.popitem()  # what was painted last is on screen now
+            self._inflight.add(bean_id)
+            return bean_id
+
+    def _on_decoded(self, bean_id, result):
+        with self._lock:
+            self._inflight.discard(bean_id)
+        if bean_id in self._stale:
+            self._stale.discard(bean_id)
+            self.request(bean_id)
+            return
+        if result is None:
+            self._failed.add(bean_id)
+        else:
+            pixmap_cache.put(result[0], QPixmap.fromImage(result[1]))
+        self.ready.emit(bean_id)
+
+    def forget(self, bean_id):
+        """Let a rewritten bean be decoded again."""
+        self._failed.discard(bean_id)
+        pixmap_cache.invalidate(bean_id)
+        with self._lock:
+            if bean_id in self._inflight:
+                self._stale.add(bean_id)
+
+    def stop(self):
+        with self._lock:
+            self._pending.clear()
+        self.pool.waitForDone()
+
+
+pixmap_cache = PixmapCache()
@@ -0,0 +1,30 @@
+# tests/conftest.py
+import io
+import os
+import sys
+
+import pytest
+
+# the repo is run from its directory, not installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from coffeejournal import DatabaseManager  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path):
+    d = DatabaseManager(str(tmp_path / "journal.db"))
+    yield d
+    d.close()
+
+
+@pytest.fixture
+def photo():
+    """photo(color) -> PNG bytes of a small image; different colors give different photos."""
+    from PIL import Image
+
+    def make(color="red"):
+        buf = io.BytesIO()
+        Image.new("RGB", (64, 48), color).save(buf, "PNG")
+        return buf.getvalue()
+    return make
@@ -0,0 +1,66 @@
+# tests/test_bulk.py
+"""Bulk inserts and upserts: a bad row is reported by its index and never takes its chunk down."""
+
+
+def _count(db, table):
+    return db.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def _names(db):
+    return [r[0] for r in db.conn.execute("SELECT name FROM coffee_beans ORDER BY id")]
+
+
+def test_bean_rows_failing_validation(db, photo):
+    rows = [{"name": f"Лот {i}", "price": str(i)} for i in range(10)]
+    rows[2] = {"roaster": "без названия", "image": photo("red")}  # its photo must not stay behind
+    rows[5] = {"name": "Лот 5", "rating": "отлично"}
+    rows[9] = {"name": ""}
+    res = db.add_coffee_beans_bulk(rows, chunk_size=3)
+    assert (res.inserted, res.updated) == (7, 0)
+    assert [i for i, _ in res.failed] == [2, 5, 9]
+    assert "missing name" in res.failed[0][1]
+    assert _names(db) == [f"Лот {i}" for i in (0, 1, 3, 4, 6, 7, 8)]
+    assert _count(db, "images") == 0
+
+
+def test_session_rows_rejected_by_sqlite(db):
+    bean = db.add_coffee_bean("Сидамо")
+    # a missing bean only fails in SQLite (foreign key), so its chunk is redone row by row
+    rows = [{"coffee_bean_id": bean["id"], "brew_method": "V60", "brew_time": str(60 + i)} for i in range(8)]
+    rows[1]["coffee_bean_id"] = 10 ** 6
+    rows[6]["coffee_bean_id"] = 10 ** 6
+    rows[4]["brew_method"] = None
+    res = db.add_brewing_sessions_bulk(iter(rows), chunk_size=4)
+    assert res.inserted == 5
+    assert [i for i, _ in res.failed] == [1, 4, 6]
+    assert "FOREIGN KEY" in res.failed[0][1]
+    times = [r[0] for r in db.conn.execute("SELECT brew_time FROM brewing_sessions ORDER BY id")]
+    assert times == [60, 62, 63, 65, 67]
+
+
+def test_upsert(db, photo):
+    kept = db.add_coffee_bean("Сидамо", "A", "Light", origin="Эфиопия", image=photo("red"))
+    created = kept["created_at"]
+    res = db.add_coffee_beans_bulk([
+        {"name": "Сидамо", "roaster": "A", "roast_level": "Dark"},   # updates the existing bean
+        {"name": "Новый", "roaster": "B", "price": "1"},
+        {"name": "Новый", "roaster": "B", "price": "2"},              # same chunk: the last one wins
+        {"name": "Новый", "roaster": "C"},                            # another roaster, another bean
+        {"roaster": "A"},
+        {"name": "Сидамо", "roaster": "A", "rating": "плохо"},
+    ], chunk_size=10, upsert=True)
+    assert (res.inserted, res.updated) == (2, 2)
+    assert [i for i, _ in res.failed] == [4, 5]
+    assert db.count_rows("beans") == 3
+    bean = db.get_coffee_bean(kept["id"])
+    assert (bean["roast_level"], bean["created_at"], bean["has_image"]) == ("Dark", created, 1)
+    price = db.conn.execute("SELECT price FROM coffee_beans WHERE name = 'Новый' AND roaster = 'B'").fetchall()
+    assert price == [(2.0,)]
+
+
+def test_upsert_across_chunks(db):
+    rows = [{"name": f"Лот {i % 4}", "rating": str(i)} for i in range(10)]
+    res = db.add_coffee_beans_bulk(rows, chunk_size=3, upsert=True)
+    assert (res.inserted, res.updated, res.failed) == (4, 6, [])
+    ratings = dict(db.conn.execute("SELECT name, rating FROM coffee_beans"))
+    assert ratings == {"Лот 0": 8.0, "Лот 1": 9.0, "Лот 2": 6.0, "Лот 3": 7.0}
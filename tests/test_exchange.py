@@ -0,0 +1,49 @@
+# tests/test_exchange.py
+"""Export -> import round trips: beans come back once, sessions find their bean by name + roaster."""
+import pytest
+
+from coffeejournal import DatabaseManager
+from coffeejournal.exchange import export_rows, import_rows
+
+
+@pytest.fixture
+def source(db):
+    a = db.add_coffee_bean("Сидамо", "A", "Light", rating=4.5)
+    b = db.add_coffee_bean("Безымянный", "", "Dark")
+    db.conn.execute("UPDATE coffee_beans SET roaster = NULL WHERE id = ?", (b["id"],))
+    db.conn.commit()
+    db.add_brewing_session(a["id"], "V60", rating=4.0)
+    db.add_brewing_session(b["id"], "Эспрессо", rating=3.0)
+    db.add_brewing_session(b["id"], "V60", rating=5.0)
+    return db
+
+
+def _sessions_by_bean(db):
+    return sorted((s["coffee_name"], s["brew_method"], s["rating"]) for s in db.get_all_brewing_sessions())
+
+
+@pytest.mark.parametrize("ext", [".csv", ".jsonl"])
+def test_round_trip_with_null_roaster(source, tmp_path, ext):
+    beans, sessions = tmp_path / f"beans{ext}", tmp_path / f"sessions{ext}"
+    assert export_rows(source, "beans", str(beans)) == 2
+    assert export_rows(source, "sessions", str(sessions)) == 3
+    target = DatabaseManager(str(tmp_path / "target.db"))
+    try:
+        assert import_rows(target, "beans", str(beans)).inserted == 2
+        res = import_rows(target, "sessions", str(sessions))
+        assert (res.inserted, res.failed) == (3, [])
+        assert _sessions_by_bean(target) == _sessions_by_bean(source)
+        # importing the beans again matches every one of them, the roasterless one included
+        res = import_rows(target, "beans", str(beans), upsert=True)
+        assert (res.inserted, res.updated) == (0, 2)
+        assert target.count_rows("beans") == 2
+    finally:
+        target.close()
+
+
+def test_upsert_into_the_source_matches_null_roaster(source, tmp_path):
+    path = tmp_path / "beans.jsonl"
+    export_rows(source, "beans", str(path))
+    res = import_rows(source, "beans", str(path), upsert=True)
+    assert (res.inserted, res.updated, res.failed) == (0, 2, [])
+    assert source.find_coffee_bean_id("Безымянный") == source.find_coffee_bean_id("Безымянный", None) is not None
@@ -0,0 +1,80 @@
+# tests/test_images.py
+"""The content-addressed image store: migration 5 moving photos out of the bean rows, photos
+shared between beans, released with their last bean, and collected by vacuum."""
+import sqlite3
+
+from coffeejournal import DatabaseManager
+from coffeejournal.queries import image_key
+from coffeejournal.schema import CREATE_TABLES, MIGRATIONS
+
+
+def _count(db, table):
+    return db.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def _journal_v4(path, photo):
+    # a journal as version 4 left it: photos in coffee_beans.image, thumbnails per bean
+    conn = sqlite3.connect(path)
+    for sql in CREATE_TABLES:
+        conn.execute(sql)
+    for target, steps in MIGRATIONS:
+        if target < 5:
+            for step in steps:
+                step(conn) if callable(step) else conn.execute(step)
+    conn.execute("PRAGMA user_version = 4")
+    red, blue = photo("red"), photo("blue")
+    conn.executemany("INSERT INTO coffee_beans (name, roaster, image) VALUES (?, 'A', ?)",
+                     [("Сидамо", red), ("Сидамо 2", red), ("Супремо", blue), ("Без фото", None), ("Пустое", b"")])
+    conn.executemany("INSERT INTO bean_thumbnails (bean_id, size, data) VALUES (?, ?, ?)",
+                     [(1, 200, b"thumb-red"), (2, 200, b"thumb-red"), (3, 320, b"thumb-blue")])
+    conn.commit()
+    conn.close()
+    return red, blue
+
+
+def test_migration_5(tmp_path, photo):
+    path = str(tmp_path / "journal.db")
+    red, blue = _journal_v4(path, photo)
+    db = DatabaseManager(path)
+    try:
+        assert db.schema_version() == MIGRATIONS[-1][0]
+        tables = {r[0] for r in db.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert "bean_thumbnails" not in tables
+        columns = {r[1] for r in db.conn.execute("PRAGMA table_info(coffee_beans)")}
+        assert "image" not in columns and "image_hash" in columns
+        # the same photo is stored once
+        keys = [r[0] for r in db.conn.execute("SELECT image_hash FROM coffee_beans ORDER BY id")]
+        assert keys == [image_key(red), image_key(red), image_key(blue), None, None]
+        assert _count(db, "images") == 2
+        assert db.get_bean_image(2) == red and db.get_bean_image(3) == blue
+        assert db.get_bean_thumbnail(1, 200) == b"thumb-red" and db.get_bean_thumbnail(3, 320) == b"thumb-blue"
+        assert db.get_bean_image(4) is None
+        assert db.stats.beans_with_images == 3
+    finally:
+        db.close()
+
+
+def test_shared_photo_is_released_with_its_last_bean(db, photo):
+    a = db.add_coffee_bean("Сидамо", image=photo("red"))
+    b = db.add_coffee_bean("Сидамо 2", image=photo("red"))
+    key = db.get_bean_image_key(a["id"])
+    assert key == db.get_bean_image_key(b["id"])
+    assert _count(db, "images") == 1 and _count(db, "image_thumbnails") > 0
+    db.delete_coffee_bean(a["id"])
+    assert db.get_bean_image(b["id"]) is not None
+    db.update_coffee_bean(b["id"], image=photo("blue"))  # replacing the last user's photo frees it
+    assert db.conn.execute("SELECT 1 FROM images WHERE hash = ?", (key,)).fetchone() is None
+    assert db.conn.execute("SELECT 1 FROM image_thumbnails WHERE hash = ?", (key,)).fetchone() is None
+    db.update_coffee_bean(b["id"], image=None)
+    assert _count(db, "images") == 0 and _count(db, "image_thumbnails") == 0
+    assert not db.get_coffee_bean(b["id"])["has_image"]
+
+
+def test_vacuum_collects_unused_photos(db, photo):
+    db.add_coffee_bean("Сидамо", image=photo("red"))
+    db.conn.execute("INSERT INTO images (hash, data) VALUES ('orphan', x'00')")
+    db.conn.execute("INSERT INTO image_thumbnails (hash, size, data) VALUES ('orphan', 200, x'00')")
+    db.conn.commit()
+    assert db.vacuum()["images_removed"] == 1
+    assert _count(db, "images") == 1
+    assert db.conn.execute("SELECT 1 FROM image_thumbnails WHERE hash = 'orphan'").fetchone() is None
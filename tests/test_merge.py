@@ -0,0 +1,83 @@
+# tests/test_merge.py
+"""Merging another journal: beans matched by name + roaster, sessions remapped to local ids,
+and a second merge of the same file adds nothing."""
+import pytest
+
+from coffeejournal import DatabaseManager
+
+# created_at is part of a session's content: the same session logged in both journals has it equal
+STAMP = "UPDATE brewing_sessions SET created_at = '2024-03-01 08:00:00'"
+
+
+@pytest.fixture
+def source(tmp_path, photo):
+    src = DatabaseManager(str(tmp_path / "source.db"))
+    shared = src.add_coffee_bean("Сидамо", "A", "Light", origin="Эфиопия", rating=4.5, image=photo("red"))
+    own = src.add_coffee_bean("Супремо", "B", "Dark", image=photo("blue"))
+    nameless = src.add_coffee_bean("Без обжарщика", "", "Medium", origin="Перу")
+    src.conn.execute("UPDATE coffee_beans SET roaster = NULL WHERE id = ?", (nameless["id"],))
+    src.conn.commit()
+    for bean, method, rating in ((shared, "V60", 4.0), (own, "Эспрессо", 3.5), (own, "V60", 5.0),
+                                 (nameless, "Аэропресс", 4.5)):
+        src.add_brewing_session(bean["id"], method, brew_time=180, rating=rating)
+    src.conn.execute(STAMP)
+    src.conn.commit()
+    src.close()
+    return str(tmp_path / "source.db")
+
+
+@pytest.fixture
+def journal(db):
+    # different local ids: source bean 1 is local bean 3 here
+    db.add_coffee_bean("Местный", "C")
+    db.add_coffee_bean("Без обжарщика", "", "Medium", origin="Колумбия")
+    local = db.add_coffee_bean("Сидамо", "A", "Light", origin="")
+    db.add_brewing_session(local["id"], "V60", brew_time=180, rating=4.0)  # same as the source's one
+    db.conn.execute(STAMP)
+    db.conn.commit()
+    db.stats
+    return db
+
+
+def _sessions(db):
+    return sorted((s["coffee_name"], s["brew_method"], s["rating"]) for s in db.get_all_brewing_sessions())
+
+
+def test_merge_remaps_ids(journal, source):
+    counts = journal.merge_from(source)
+    assert counts == {"beans_added": 1, "beans_updated": 1, "sessions_added": 3, "sessions_skipped": 1}
+    assert journal.count_rows("beans") == 4
+    assert _sessions(journal) == [("Без обжарщика", "Аэропресс", 4.5), ("Сидамо", "V60", 4.0),
+                                  ("Супремо", "V60", 5.0), ("Супремо", "Эспрессо", 3.5)]
+    by_name = {b["name"]: b for b in journal.get_all_coffee_beans()}
+    # blanks are filled from the source, local values win
+    assert journal.get_coffee_bean(by_name["Сидамо"]["id"])["origin"] == "Эфиопия"
+    assert by_name["Без обжарщика"]["origin"] == "Колумбия"
+    assert by_name["Сидамо"]["has_image"] and by_name["Супремо"]["has_image"]
+    assert journal.stats.matches(journal.recompute_stats())
+
+
+def test_merge_twice_adds_nothing(journal, source):
+    journal.merge_from(source)
+    beans, sessions = journal.get_all_coffee_beans(), _sessions(journal)
+    images = journal.conn.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+    counts = journal.merge_from(source)
+    assert counts == {"beans_added": 0, "beans_updated": 0, "sessions_added": 0, "sessions_skipped": 4}
+    assert journal.get_all_coffee_beans() == beans and _sessions(journal) == sessions
+    assert journal.conn.execute("SELECT COUNT(*) FROM images").fetchone()[0] == images
+
+
+def test_merge_into_itself_adds_nothing(journal, tmp_path):
+    journal.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    journal.backup_to(str(tmp_path / "copy.db"))
+    counts = journal.merge_from(str(tmp_path / "copy.db"))
+    assert counts == {"beans_added": 0, "beans_updated": 0, "sessions_added": 0, "sessions_skipped": 1}
+
+
+def test_merge_rejects_other_files(journal, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        journal.merge_from(str(tmp_path / "missing.db"))
+    (tmp_path / "other.db").write_bytes(b"")
+    with pytest.raises(ValueError):
+        journal.merge_from(str(tmp_path / "other.db"))
+    assert journal.count_rows("beans") == 3
@@ -0,0 +1,67 @@
+# tests/test_models.py
+"""Table models: the id -> row and bean -> sessions lookups stay in step with the rows, and paging
+gives up on a page that keeps failing."""
+import random
+
+from coffeejournal import SESSION_ROW_FIELDS
+from models import PAGE_RETRIES, BrewingSessionsTableModel, PagedBrewingSessionsTableModel
+
+BEAN, NAME = SESSION_ROW_FIELDS.index("coffee_bean_id"), SESSION_ROW_FIELDS.index("coffee_name")
+
+
+def _row(session_id, bean_id):
+    values = {"id": session_id, "coffee_bean_id": bean_id, "coffee_name": f"Лот {bean_id}", "rating": 4.0}
+    return tuple(values.get(f) for f in SESSION_ROW_FIELDS)
+
+
+def _assert_indexed(model):
+    rows = [model.row(i) for i in range(model.rowCount())]
+    assert [model.find_row(r["id"]) for r in rows] == list(range(len(rows)))
+    for bean in {r["coffee_bean_id"] for r in rows} | {-1}:
+        assert model._rows_where("coffee_bean_id", bean) == \
+            [i for i, r in enumerate(rows) if r["coffee_bean_id"] == bean]
+
+
+def test_lookups_follow_edits():
+    rng = random.Random(0)
+    model = BrewingSessionsTableModel([_row(i, rng.randrange(10)) for i in range(1, 301)])
+    _assert_indexed(model)
+    for n in range(100):
+        op = n % 4
+        if op == 0:
+            model.insert_row(dict(zip(SESSION_ROW_FIELDS, _row(1000 + n, rng.randrange(10)))),
+                             at=rng.randrange(model.rowCount() + 1))
+        elif op == 1:
+            model.remove_row(model.row(rng.randrange(model.rowCount()))["id"])
+        elif op == 2:
+            model.update_row(dict(zip(SESSION_ROW_FIELDS, _row(model.row(0)["id"], rng.randrange(10)))))
+        else:
+            model.remove_where("coffee_bean_id", rng.randrange(10))
+        _assert_indexed(model)
+    assert model.find_row(10 ** 6) == -1
+
+
+def test_set_where_renames_a_beans_sessions():
+    model = BrewingSessionsTableModel([_row(i, i % 3) for i in range(1, 31)])
+    model.set_where("coffee_bean_id", 1, "coffee_name", "Новое имя")
+    assert all((r[NAME] == "Новое имя") == (r[BEAN] == 1) for r in model._values)
+    model.remove_where("coffee_bean_id", 1)
+    assert model.rowCount() == 20 and model._rows_where("coffee_bean_id", 1) == []
+    _assert_indexed(model)
+
+
+def test_failing_page_is_retried_then_given_up():
+    requests = []
+    model = PagedBrewingSessionsTableModel(lambda *args: requests.append(args), page_size=10)
+    model.reload()
+    for _ in range(PAGE_RETRIES):
+        assert model.page_failed() is False  # asked again right away
+    assert len(requests) == PAGE_RETRIES + 1
+    assert model.page_failed() is True
+    assert not model.canFetchMore() and len(requests) == PAGE_RETRIES + 1
+    # a reload starts over, and a page that arrives resets the count
+    model.reload()
+    requests[-1][-1]([_row(i, 1) for i in range(1, 11)], (None, 10))
+    assert model.canFetchMore() and model.rowCount() == 10
+    model.fetchMore()
+    assert model.page_failed() is False
@@ -0,0 +1,97 @@
+# tests/test_query_plans.py
+"""Every registered statement plans as an index search (or is allow-listed, for a reason).
+
+    python -m pytest tests
+"""
+import random
+
+import pytest
+
+from coffeejournal import DatabaseManager, journal, queries
+from coffeejournal.queries import BEAN_SORT_SQL, SESSION_SORT_SQL, PLANNED_QUERIES
+
+BEANS = 300
+SESSIONS = 6000
+# statements that are not in PLANNED_QUERIES: the merge reads an attached source journal,
+# FTS optimize is an FTS5 command without a plan
+UNPLANNED = {"FTS_OPTIMIZE_QUERY"} | {n for n in dir(queries) if n.startswith("MERGE_")}
+
+
+def _journal(path, beans, sessions, analyze):
+    rng = random.Random(0)
+    db = DatabaseManager(str(path))
+    db.add_coffee_beans_bulk({
+        "name": f"Лот {rng.randrange(beans // 3)}", "roaster": rng.choice(("A", "B", "")),
+        "roast_level": rng.choice(("Light", "Medium", "Dark")), "origin": rng.choice(("Кения", "Перу")),
+        "rating": rng.randint(0, 50) / 10, "created_at": f"2024-01-01 00:{i // 60 % 60:02}:{i % 60:02}",
+    } for i in range(beans))
+    if sessions:
+        db.add_brewing_sessions_bulk({
+            "coffee_bean_id": rng.randint(1, beans), "brew_method": rng.choice(("V60", "Эспрессо")),
+            "water_temp": rng.randint(85, 96), "brew_time": rng.randint(20, 300), "rating": rng.randint(0, 50) / 10,
+        } for _ in range(sessions))
+    # NULL sort keys are folded by IFNULL() and must page like any other value
+    db.conn.execute("UPDATE coffee_beans SET roaster = NULL, rating = NULL WHERE id % 5 = 0")
+    db.conn.execute("UPDATE brewing_sessions SET rating = NULL, brew_time = NULL WHERE id % 7 = 0")
+    db.conn.commit()
+    if analyze:
+        db.conn.execute("ANALYZE")
+    return db
+
+
+@pytest.fixture(scope="module", params=["empty", "filled", "analyzed"])
+def db(request, tmp_path_factory):
+    size = (BEANS, SESSIONS) if request.param != "empty" else (0, 0)
+    d = _journal(tmp_path_factory.mktemp(request.param) / "journal.db", *size, request.param == "analyzed")
+    yield d
+    d.close()
+
+
+def test_query_plans(db):
+    assert db.check_query_plans() == []
+
+
+@pytest.mark.parametrize("table, sorts", [("beans", BEAN_SORT_SQL), ("sessions", SESSION_SORT_SQL)])
+def test_every_sort_key_is_planned(table, sorts):
+    labels = {label for label, _, _ in PLANNED_QUERIES}
+    for key in sorts:
+        for page in ("first_page", "page"):
+            for suffix in ("", "_asc"):
+                assert f"{table}.{page}_by_{key}{suffix}" in labels
+
+
+def test_every_statement_is_planned():
+    planned = {sql for _, sql, _ in PLANNED_QUERIES}
+    missing = [n for n in dir(queries) if n.endswith("_QUERY") and n not in UNPLANNED
+               and getattr(queries, n) not in planned]
+    assert missing == []
+
+
+def test_index_scans_are_flagged(db, monkeypatch):
+    # walking a whole index is still a walk over every row
+    probe = ("probe", "SELECT id FROM coffee_beans WHERE name LIKE ? ORDER BY created_at", ("%a%",))
+    monkeypatch.setattr(journal, "PLANNED_QUERIES", [probe])
+    assert [label for label, _ in db.check_query_plans()] == ["probe"]
+
+
+def test_missing_sort_index_is_flagged(tmp_path):
+    d = _journal(tmp_path / "journal.db", 30, 300, analyze=False)
+    try:
+        d.conn.execute("DROP INDEX idx_sessions_rating_sort")
+        assert {label for label, _ in d.check_query_plans()} >= {"sessions.page_by_rating", "sessions.page_by_rating_asc"}
+    finally:
+        d.close()
+
+
+@pytest.mark.parametrize("descending", [True, False])
+def test_pages_return_every_row_once(db, descending):
+    for fetch, sorts, table in ((db.get_coffee_beans_page, BEAN_SORT_SQL, "beans"),
+                                (db.get_brewing_sessions_page, SESSION_SORT_SQL, "sessions")):
+        for key in sorts:
+            ids, after = [], None
+            while True:
+                rows, after = fetch(after, 97, key, descending)
+                if not rows:
+                    break
+                ids += [r[0] for r in rows]
+            assert sorted(ids) == list(range(1, db.count_rows(table) + 1)), (table, key)
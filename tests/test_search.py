@@ -0,0 +1,74 @@
+# tests/test_search.py
+"""Search over beans and sessions, with FTS5 and through the LIKE fallback."""
+import pytest
+
+from coffeejournal import cli
+
+
+@pytest.fixture(params=["fts", "like"])
+def journal(request, db):
+    for i in range(10):
+        bean = db.add_coffee_bean(f"Кения {i}", "A", tasting_notes="смородина")
+        db.add_brewing_session(bean["id"], "V60", notes="кислотность")
+    db.has_fts = request.param == "fts"
+    return db
+
+
+def test_limit(journal):
+    for search in (journal.search_coffee_beans, journal.search_brewing_sessions):
+        assert len(search("Кения")) == 10
+        assert len(search("Кения", 3)) == 3
+
+
+def test_cli_limit(journal, tmp_path, capsys):
+    path = str(tmp_path / "journal.db")
+    assert cli.main(["--db", path, "search", "кения", "--sessions", "--limit", "2", "--json"]) == 0
+    assert len(capsys.readouterr().out.splitlines()) == 2
+
+
+def _names(rows):
+    return [r["name"] for r in rows]
+
+
+def test_yo_matches_ye(db):
+    db.add_coffee_bean("Тёмная обжарка", tasting_notes="мёд, орех")
+    db.add_coffee_bean("Светлая", tasting_notes="черника")
+    for q in ("темная", "Тёмная", "ТЕМН", "мед", "МЁД"):
+        assert _names(db.search_coffee_beans(q)) == ["Тёмная обжарка"], q
+    assert _names(db.search_coffee_beans("чёрника")) == ["Светлая"]
+
+
+def test_every_word_matches_as_a_prefix(db):
+    db.add_coffee_bean("Кения Ньери", "A", tasting_notes="смородина, томат")
+    db.add_coffee_bean("Смородиновый лот", "B", tasting_notes="ягоды")
+    assert _names(db.search_coffee_beans("сморо")) == ["Смородиновый лот", "Кения Ньери"]  # the name ranks first
+    assert _names(db.search_coffee_beans("кен смор")) == ["Кения Ньери"]
+    assert db.search_coffee_beans("кен малина") == []
+    assert db.search_coffee_beans("к") and db.search_coffee_beans("?!") == []
+
+
+def test_sessions_match_their_bean_name(db):
+    bean = db.add_coffee_bean("Сидамо")
+    db.add_brewing_session(bean["id"], "V60", notes="цитрус")
+    db.add_brewing_session(db.add_coffee_bean("Супремо")["id"], "Аэропресс", notes="сидр")
+    assert [s["brew_method"] for s in db.search_brewing_sessions("сид")] == ["V60", "Аэропресс"]
+    assert [s["notes"] for s in db.search_brewing_sessions("цитр")] == ["цитрус"]
+
+
+def _indexed(db, table, word):
+    # rowids straight from the index: the searches join the content table and would hide stale entries
+    return [r[0] for r in db.conn.execute(f"SELECT rowid FROM {table} WHERE {table} MATCH ?", (f'"{word}"*',))]
+
+
+def test_index_follows_updates_and_deletes(db):
+    bean = db.add_coffee_bean("Сидамо", tasting_notes="жасмин")
+    session = db.add_brewing_session(bean["id"], "V60", notes="ёмкий вкус")
+    db.update_coffee_bean(bean["id"], name="Гуджи", tasting_notes="бергамот")
+    assert _indexed(db, "beans_fts", "сидамо") == [] and _indexed(db, "beans_fts", "жасмин") == []
+    assert _names(db.search_coffee_beans("гуджи берг")) == ["Гуджи"]
+    assert [s["id"] for s in db.search_brewing_sessions("гуджи")] == [session["id"]]  # by the new bean name
+    db.update_brewing_session(session["id"], notes="сладкий")
+    assert _indexed(db, "sessions_fts", "емкий") == []
+    assert [s["id"] for s in db.search_brewing_sessions("сладк")] == [session["id"]]
+    db.delete_coffee_bean(bean["id"])  # the session goes by cascade, and out of its index too
+    assert _indexed(db, "beans_fts", "гуджи") == [] and _indexed(db, "sessions_fts", "сладк") == []
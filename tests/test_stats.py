@@ -0,0 +1,76 @@
+# tests/test_stats.py
+"""The statistics cache, kept current by per-write deltas, always equals a full recompute."""
+import pytest
+
+
+def _assert_in_step(db):
+    fresh = db.recompute_stats()
+    assert db.stats.snapshot() == fresh.snapshot()
+    assert db.stats.matches(fresh)
+
+
+@pytest.fixture
+def journal(db, photo):
+    db.stats  # build the cache first so every write below goes through the deltas
+    a = db.add_coffee_bean("Сидамо", "A", "Light", price=10.5, rating=4.5, image=photo("red"))
+    b = db.add_coffee_bean("Супремо", "B", "Dark", price=8.0)
+    for bean, method, rating in ((a, "V60", 4.0), (a, "Эспрессо", 3.5), (b, "V60", 5.0)):
+        db.add_brewing_session(bean["id"], method, brew_time=180, coffee_weight=15, water_weight=250, rating=rating)
+    _assert_in_step(db)
+    return db, a, b
+
+
+def test_updates(journal, photo):
+    db, a, b = journal
+    db.update_coffee_bean(a["id"], roast_level="Medium", price=12.0, rating=None)
+    _assert_in_step(db)
+    db.update_coffee_bean(b["id"], image=photo("blue"))
+    db.update_coffee_bean(a["id"], image=None)
+    _assert_in_step(db)
+    session = db.get_all_brewing_sessions()[0]
+    db.update_brewing_session(session["id"], brew_method="Аэропресс", rating=2.0, brew_time=None)
+    _assert_in_step(db)
+
+
+def test_deletes(journal):
+    db, a, b = journal
+    db.delete_brewing_session(db.get_all_brewing_sessions()[0]["id"])
+    _assert_in_step(db)
+    db.delete_coffee_bean(a["id"])  # its sessions go by cascade
+    _assert_in_step(db)
+    db.delete_coffee_bean(b["id"])
+    _assert_in_step(db)
+    assert db.stats.total_beans == db.stats.total_sessions == 0
+
+
+def test_bulk(journal):
+    db, a, b = journal
+    db.add_coffee_beans_bulk([{"name": f"Лот {i}", "roast_level": ("Light", "Dark")[i % 2], "price": i}
+                              for i in range(50)] + [{"roaster": "no name"}])
+    _assert_in_step(db)
+    db.add_coffee_beans_bulk([{"name": "Сидамо", "roaster": "A", "roast_level": "Dark", "price": 1},
+                              {"name": "Новый", "price": 3}], upsert=True)
+    _assert_in_step(db)
+    db.add_brewing_sessions_bulk([{"coffee_bean_id": b["id"], "brew_method": "V60", "rating": i % 5}
+                                  for i in range(50)] + [{"coffee_bean_id": 10 ** 6, "brew_method": "V60"}])
+    _assert_in_step(db)
+
+
+def test_rolled_back_transaction(journal):
+    db, a, b = journal
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.add_brewing_session(a["id"], "V60", rating=1.0)
+            db.update_coffee_bean(b["id"], roast_level="Light")
+            raise RuntimeError
+    _assert_in_step(db)
+
+
+def test_stale_recompute_is_dropped(journal):
+    db, a, b = journal
+    changes = db.conn.total_changes
+    fresh = db.recompute_stats()
+    db.delete_coffee_bean(b["id"])
+    assert db.reconcile_stats(fresh, changes) is None
+    _assert_in_step(db)
+    assert db.reconcile_stats(db.recompute_stats(), db.conn.total_changes) is True
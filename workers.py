@@ -0,0 +1,160 @@
+# workers.py
+import logging
+import queue
+import threading
+import itertools
+
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    """Raised from a job's progress callback once the job has been cancelled."""
+
+
+class _Job:
+    __slots__ = ("ticket", "fn", "args", "progress")
+
+    def __init__(self, ticket, fn, args, progress):
+        self.ticket = ticket; self.fn = fn; self.args = args; self.progress = progress
+
+
+class _DbThread(QThread):
+    done = pyqtSignal(int, object)
+    failed = pyqtSignal(int, object)
+    progress = pyqtSignal(int, object, object)
+
+    def __init__(self, db):
+        super().__init__()
+        self.db = db
+        self.ident = None
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        self.pending = set()    # queued or running tickets, guarded by `lock`
+        self.cancelled = set()  # subset of pending
+        self.current = None
+
+    def run(self):
+        self.ident = threading.get_ident()
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            with self.lock:
+                if job.ticket in self.cancelled:
+                    self.cancelled.discard(job.ticket)
+                    self.pending.discard(job.ticket)
+                    continue
+                self.current = job.ticket
+            try:
+                if job.progress:
+                    result = job.fn(self.db, *job.args, progress=self._reporter(job.ticket))
+                else:
+                    result = job.fn(self.db, *job.args)
+                self.done.emit(job.ticket, result)
+            except Exception as e:
+                self.failed.emit(job.ticket, e)
+            finally:
+                with self.lock:
+                    self.current = None
+                    self.pending.discard(job.ticket)
+                    self.cancelled.discard(job.ticket)
+
+    def _reporter(self, ticket):
+        # long jobs check for cancellation whenever they report progress
+        def report(done, total):
+            if ticket in self.cancelled:
+                raise JobCancelled()
+            self.progress.emit(ticket, done, total)
+        return report
+
+    def enqueue(self, job):
+        with self.lock:
+            self.pending.add(job.ticket)
+        self.jobs.put(job)
+
+    def cancel(self, ticket):
+        with self.lock:
+            if ticket not in self.pending:
+                return
+            self.cancelled.add(ticket)
+            if self.current == ticket:
+                self.db.pool.interrupt(self.ident)
+
+
+class DatabaseWorker(QObject):
+    """Runs DatabaseManager calls on a background thread; its reads borrow pooled connections.
+
+    submit(fn, *args) queues fn(db, *args) and calls on_done(result) / on_error(exc) back on the
+    GUI thread. With on_progress, fn also gets a progress(done, total) keyword callback whose
+    reports reach on_progress(done, total) on the GUI thread; once the job is cancelled the
+    callback raises JobCancelled, which is how long jobs (backups, imports) stop early.
+
+    Jobs submitted with the same `key` supersede each other: the older one is dropped if still
+    queued, interrupted if running, and its result is never delivered.
+    """
+
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self._tickets = itertools.count(1)
+        self._callbacks = {}   # ticket -> (on_done, on_error, on_progress)
+        self._by_key = {}      # key -> latest ticket
+        self._thread = _DbThread(db)
+        self._thread.done.connect(self._on_done)
+        self._thread.failed.connect(self._on_failed)
+        self._thread.progress.connect(self._on_progress)
+        self._thread.start()
+
+    def submit(self, fn, *args, key=None, on_done=None, on_error=None, on_progress=None) -> int:
+        ticket = next(self._tickets)
+        if key is not None:
+            self.cancel_key(key)
+            self._by_key[key] = ticket
+        self._callbacks[ticket] = (on_done, on_error, on_progress)
+        self._thread.enqueue(_Job(ticket, fn, args, on_progress is not None))
+        return ticket
+
+    def cancel(self, ticket):
+        if self._callbacks.pop(ticket, None) is not None:
+            self._thread.cancel(ticket)
+
+    def cancel_key(self, key):
+        ticket = self._by_key.pop(key, None)
+        if ticket is not None:
+            self.cancel(ticket)
+
+    def _finish(self, ticket):
+        for k, t in list(self._by_key.items()):
+            if t == ticket:
+                del self._by_key[k]
+        return self._callbacks.pop(ticket, (None, None, None))
+
+    def _on_progress(self, ticket, done, total):
+        callbacks = self._callbacks.get(ticket)
+        if callbacks and callbacks[2]:
+            callbacks[2](done, total)
+
+    def _on_done(self, ticket, result):
+        on_done, _, _ = self._finish(ticket)
+        if on_done:
+            on_done(result)
+
+    def _on_failed(self, ticket, exc):
+        if ticket not in self._callbacks:
+            return  # cancelled: the interrupt error is expected
+        _, on_error, _ = self._finish(ticket)
+        if on_error:
+            on_error(exc)
+        else:
+            logger.error("background query failed: %s", exc)
+
+    def stop(self):
+        # keyed jobs (reads, backups, imports, merges) may be dropped: the running one is
+        # interrupted instead of waited for; unkeyed writes still complete
+        for ticket in list(self._by_key.values()):
+            self._thread.cancel(ticket)
+        self._by_key.clear()
+        self._callbacks.clear()
+        self._thread.jobs.put(None)
+        self._thread.wait()